@@ -1,18 +1,36 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from app.core.pdf_utils import extract_text_from_pdf, extract_zip_pdfs
-from app.core.llm_utils import analyze_invoice_with_policy
-from app.core.vector_store import VectorStore
+from app.core.pdf_utils import extract_text_from_pdf, extract_zip_pdfs_parallel, iter_zip_pdfs, get_pdf_text_cache, ExtractionStats
+from app.core.llm_utils import analyze_invoice_tiered_async, analyze_invoice_pack_async, plan_invoice_packs, get_verdict_cache, TIER_LARGE, TIER_NONE
+from app.core.tokens import estimate_tokens
+from app.core.cache import content_hash
+from app.core.vector_store import get_vector_store, vector_store_status
+from app.core.embedding_cache import embedding_cache_stats
+from app.core.answer_cache import answer_cache
+from app.core.pipeline import run_ingestion_pipeline
+from app.core.scheduler import call_with_retries, run_scheduled
+from app.core.policy_index import PolicyIndex
+from app.core.policy_rules import PolicyRules, compile_policy_rules, extract_invoice_fields
+from app.core.groq_client import governor
+from app.core.rate_limiter import rate_limiter_stats
+from app.core import config
 import logging
 import re
 import asyncio
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from collections import Counter
 import time
-from functools import partial
+from itertools import islice
 import threading
 
 router = APIRouter()
 
+# Tier recorded for invoices decided by the rule pre-screen
+TIER_RULES = "rules"
+
+class ZipExtractionError(Exception):
+    """The invoice ZIP could not be read"""
+
 def extract_employee_name_from_path(file_path: str) -> str:
     """
     Extract employee name from file path structure.
@@ -42,169 +60,306 @@ def extract_employee_name_from_path(file_path: str) -> str:
         logging.warning(f"Error extracting employee name from path {file_path}: {str(e)}")
         return "employee_unknown"
 
-def process_single_invoice_sync(file_path: str, invoice_text: str, policy_text: str, employee_name_fallback: str) -> Dict:
+def prescreen_invoice(invoice_text: str, policy_rules: Optional[PolicyRules]) -> Optional[Tuple[str, str, str]]:
     """
-    Process a single invoice synchronously.
+    Run the deterministic rule pre-screen.
+    Returns (status, reason, tier) when a rule is conclusive, otherwise None.
+    """
+    if policy_rules is None or not config.RULE_PRESCREEN_ENABLED:
+        return None
+    try:
+        verdict = policy_rules.evaluate(invoice_text)
+    except Exception as e:
+        logging.warning(f"Rule pre-screen failed, falling back to LLM: {e}")
+        return None
+    return verdict + (TIER_RULES,) if verdict else None
+
+def invoice_document_id(file_path: str, invoice_text: str) -> str:
+    """Stable vector-store id for an invoice: its path plus a hash of its content"""
+    return f"{file_path}#{content_hash(invoice_text)[:16]}"
+
+def with_invoice_amounts(metadata: Dict, invoice_text: str) -> Dict:
+    """
+    Add the invoice total (and, where the status implies it, the reimbursable
+    amount) to result metadata, so stored analyses can be filtered by amount.
+    """
+    if "amount" in metadata:
+        return metadata
+    total = extract_invoice_fields(invoice_text).total
+    if total is None:
+        return metadata
+    amounts = {"amount": total}
+    if metadata.get("status") == "Fully Reimbursed":
+        amounts["reimbursable_amount"] = total
+    elif metadata.get("status") == "Declined":
+        amounts["reimbursable_amount"] = 0.0
+    return dict(metadata, **amounts)
+
+def store_invoice_results(batch: List[Tuple[Dict, str]]) -> None:
+    """
+    Write analyzed invoices to the vector store in one bulk write.
+    Each batch entry is (result metadata, invoice text). Failed analyses
+    (status "error": unreadable or empty invoices, LLM/API failures) are
+    skipped, so they never reach the store or its statistics. Store
+    failures are logged and never abort processing.
+    """
+    records = [
+        {
+            "document_id": invoice_document_id(metadata["file_path"], invoice_text),
+            "invoice_content": invoice_text,
+            "analysis_result": with_invoice_amounts(metadata, invoice_text),
+            "employee_name": metadata["employee_name"],
+            "filename": metadata["file_path"],
+        }
+        for metadata, invoice_text in batch
+        if metadata.get("status") != "error"
+    ]
+    if not records:
+        return
+    
+    try:
+        stored = get_vector_store().store_analyses_bulk(records)
+    except Exception as store_error:
+        logging.warning(f"Failed to store {len(records)} analyses: {store_error}")
+        return
+    if stored < len(records):
+        logging.warning(f"Stored {stored} of {len(records)} analyses")
+
+def build_result_metadata(file_path: str, status: str, reason: str, employee_name_fallback: str, tier: str = TIER_LARGE) -> Dict:
+    """Result metadata returned to the client and stored alongside the invoice"""
+    dynamic_employee_name = extract_employee_name_from_path(file_path)
+    final_employee_name = dynamic_employee_name if dynamic_employee_name != "employee_unknown" else (employee_name_fallback or "employee_unknown")
+    
+    return {
+        "invoice_id": Path(file_path).name,
+        "file_path": file_path,
+        "status": status,
+        "reason": reason,
+        "employee_name": final_employee_name,
+        "folder_name": Path(file_path).parent.name,
+        "model_tier": tier,
+    }
+
+def collapse_duplicate_invoices(invoice_data: Dict[str, str], digests: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    """
+    Keep one path per distinct PDF file.
+    
+    Files are compared by the digest of their bytes, not by their text:
+    unrelated scans all extract to the same placeholder text. Files without
+    a digest (unreadable members) are never collapsed.
+    
+    Returns:
+        The invoices to analyze, and for each of them the paths of its identical copies
+    """
+    unique, copies, first_path = {}, {}, {}
+    for file_path, invoice_text in invoice_data.items():
+        key = digests.get(file_path)
+        if key is not None and key in first_path:
+            copies[first_path[key]].append(file_path)
+            continue
+        unique[file_path] = invoice_text
+        if key is not None:
+            first_path[key] = file_path
+            copies[file_path] = []
+    return unique, {path: paths for path, paths in copies.items() if paths}
+
+def result_for_copy(result: Dict, file_path: str, employee_name_fallback: str) -> Dict:
+    """The verdict of one invoice, re-addressed to an identical invoice at another path"""
+    if result.get("model_tier") is None:
+        # Failed analysis, nothing to store
+        copy = dict(result, invoice_id=Path(file_path).name, file_path=file_path,
+                    employee_name=extract_employee_name_from_path(file_path), folder_name=Path(file_path).parent.name)
+    else:
+        copy = build_result_metadata(file_path, result["status"], result["reason"], employee_name_fallback, result["model_tier"])
+    copy["duplicate_of"] = result["file_path"]
+    return copy
+
+def fan_out_duplicates(results: List[Dict], copies: Dict[str, List[str]], invoice_data: Dict[str, str], employee_name_fallback: str) -> List[Dict]:
+    """
+    Add results for the copies collapsed by collapse_duplicate_invoices.
+    Results are returned in the original invoice order.
+    """
+    if not copies:
+        return results
+    
+    extra = [
+        result_for_copy(result, file_path, employee_name_fallback)
+        for result in results
+        for file_path in copies.get(result["file_path"], [])
+    ]
+    order = {file_path: i for i, file_path in enumerate(invoice_data)}
+    return sorted(results + extra, key=lambda r: order.get(r["file_path"], len(order)))
+
+async def analyze_single_invoice(file_path: str, invoice_text: str, policy_index: PolicyIndex, employee_name_fallback: str, policy_rules: Optional[PolicyRules] = None) -> Dict:
+    """
+    Analyze a single invoice on the event loop, without storing it.
+    The LLM call goes through the shared async Groq client, so no worker thread
+    is held while waiting on the network.
     """
     try:
-        # Extract employee name from file path
-        dynamic_employee_name = extract_employee_name_from_path(file_path)
-        
-        # Use provided employee_name as fallback if extraction fails
-        final_employee_name = dynamic_employee_name if dynamic_employee_name != "employee_unknown" else (employee_name_fallback or "employee_unknown")
-        
         if not invoice_text.strip():
             logging.warning(f"Invoice {file_path} appears to be empty")
-            status, reason = "error", "Invoice text is empty or unreadable"
+            status, reason, tier = "error", "Invoice text is empty or unreadable", TIER_NONE
+        elif (prescreened := prescreen_invoice(invoice_text, policy_rules)):
+            status, reason, tier = prescreened
         else:
-            # This is the potentially time-consuming operation
-            status, reason = analyze_invoice_with_policy(invoice_text, policy_text)
-        
-        metadata = {
-            "invoice_id": Path(file_path).name,
-            "file_path": file_path,
-            "status": status,
-            "reason": reason,
-            "employee_name": final_employee_name,
-            "folder_name": Path(file_path).parent.name,
-        }
-        
-        # Store analysis results
-        try:
-            VectorStore.store_analysis(invoice_text, status, reason, metadata)
-        except Exception as store_error:
-            logging.warning(f"Failed to store analysis for {file_path}: {store_error}")
-            # Continue processing even if storage fails
+            policy_context = policy_index.policy_text
+            if policy_index.uses_retrieval:
+                # Embedding the invoice is CPU work, keep it off the event loop
+                policy_context = await asyncio.to_thread(policy_index.select, invoice_text)
+            status, reason, tier = await analyze_invoice_tiered_async(invoice_text, policy_context)
         
-        return metadata
+        return build_result_metadata(file_path, status, reason, employee_name_fallback, tier)
         
     except Exception as e:
         logging.error(f"Error analyzing invoice {file_path}: {str(e)}")
-        error_metadata = {
-            "invoice_id": Path(file_path).name,
-            "file_path": file_path,
-            "status": "error",
-            "reason": f"Analysis failed: {str(e)}",
-            "employee_name": extract_employee_name_from_path(file_path),
-            "folder_name": Path(file_path).parent.name,
-        }
-        return error_metadata
+        return invoice_error_result(file_path, f"Analysis failed: {str(e)}")
 
-async def process_invoices_sequential(invoice_data: Dict[str, str], policy_text: str, employee_name: str) -> List[Dict]:
+def invoice_error_result(file_path: str, reason: str) -> Dict:
+    """Result of an invoice that could not be analyzed"""
+    return {
+        "invoice_id": Path(file_path).name,
+        "file_path": file_path,
+        "status": "error",
+        "reason": reason,
+        "employee_name": extract_employee_name_from_path(file_path),
+        "folder_name": Path(file_path).parent.name,
+    }
+
+def is_transient_failure(result: Dict) -> bool:
     """
-    Process invoices sequentially with async/await to prevent blocking.
-    This is more reliable than threading for I/O bound operations.
+    Whether a failed analysis is worth retrying: failed LLM calls and
+    unexpected errors are, unreadable invoices (no model involved) are not.
     """
-    results = []
-    total_invoices = len(invoice_data)
+    return result.get("status") == "error" and result.get("model_tier") != TIER_NONE
+
+async def analyze_invoice_with_retries(file_path: str, invoice_text: str, policy_index: PolicyIndex, employee_name_fallback: str, policy_rules: Optional[PolicyRules] = None, slot: Optional[asyncio.Semaphore] = None) -> Dict:
+    """
+    analyze_single_invoice with a per-invoice timeout (INVOICE_TIMEOUT_SECONDS)
+    and up to INVOICE_MAX_RETRIES jittered retries of transient failures.
+    The scheduler passes its ``slot``, held only while an attempt runs.
+    """
+    return await call_with_retries(
+        lambda: analyze_single_invoice(file_path, invoice_text, policy_index, employee_name_fallback, policy_rules),
+        lambda reason: invoice_error_result(file_path, f"Processing failed: {reason}"),
+        timeout=config.INVOICE_TIMEOUT_SECONDS or None,
+        retries=config.INVOICE_MAX_RETRIES,
+        backoff_seconds=config.INVOICE_RETRY_BACKOFF_SECONDS,
+        should_retry=is_transient_failure,
+        slot=slot,
+        label=file_path,
+    )
+
+async def process_invoices_scheduled(invoice_data: Dict[str, str], policy_index: PolicyIndex, employee_name: str, concurrency: int, policy_rules: Optional[PolicyRules] = None) -> List[Dict]:
+    """
+    Analyze invoices with at most ``concurrency`` in flight, without batches or pauses.
+    A freed slot goes to the next invoice straight away, each invoice has
+    its own timeout and jittered retries, and results are returned in
+    completion order. The LLM calls themselves are still capped process-wide
+    by LLM_MAX_CONCURRENCY and the rate limiter.
+    Results are not stored here, the caller writes them in bulk.
+    """
+    return await run_scheduled(
+        invoice_data.items(),
+        lambda file_path, invoice_text, slot: analyze_invoice_with_retries(file_path, invoice_text, policy_index, employee_name, policy_rules, slot),
+        concurrency=concurrency,
+    )
+
+async def process_invoices_packed(invoice_data: Dict[str, str], policy_index: PolicyIndex, employee_name: str, policy_rules: Optional[PolicyRules] = None) -> List[Dict]:
+    """
+    Analyze several short invoices per LLM call.
+    Invoices are grouped to fit the model's token budget and each pack shares
+    one policy context; invoices the model misses are retried individually.
+    Invoices settled by the policy rules are not packed at all.
+    """
+    prescreened = {}
+    for path, text in invoice_data.items():
+        if text.strip() and (verdict := prescreen_invoice(text, policy_rules)):
+            prescreened[path] = verdict
+    readable = {path: text for path, text in invoice_data.items() if text.strip() and path not in prescreened}
+    packs = plan_invoice_packs(readable, estimate_tokens("x" * policy_index.context_chars))
+    logging.info(f"Packed {len(readable)} invoices into {len(packs)} requests")
     
-    for i, (file_path, invoice_text) in enumerate(invoice_data.items(), 1):
+    async def run_pack(pack: List[str]) -> Dict[str, tuple]:
+        texts = {path: readable[path] for path in pack}
+        policy_context = policy_index.policy_text
+        if policy_index.uses_retrieval:
+            policy_context = await asyncio.to_thread(policy_index.select_many, list(texts.values()))
         try:
-            logging.info(f"Processing invoice {i}/{total_invoices}: {file_path}")
-            
-            # Run the synchronous processing function in a thread pool
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,  # Use default thread pool
-                process_single_invoice_sync,
-                file_path,
-                invoice_text,
-                policy_text,
-                employee_name
-            )
-            
-            results.append(result)
-            
-            # Small delay to prevent overwhelming the system
-            if i % 5 == 0:  # Every 5 invoices
-                await asyncio.sleep(0.1)
-                
+            return await analyze_invoice_pack_async(texts, policy_context)
         except Exception as e:
-            logging.error(f"Error processing invoice {file_path}: {str(e)}")
-            error_metadata = {
-                "invoice_id": Path(file_path).name,
-                "file_path": file_path,
-                "status": "error",
-                "reason": f"Processing error: {str(e)}",
-                "employee_name": extract_employee_name_from_path(file_path),
-                "folder_name": Path(file_path).parent.name,
-            }
-            results.append(error_metadata)
+            logging.error(f"Packed analysis failed for {len(pack)} invoices: {e}")
+            return {path: ("error", f"Analysis failed: {str(e)}") for path in pack}
+    
+    verdicts = {}
+    for pack_verdicts in await asyncio.gather(*[run_pack(pack) for pack in packs]):
+        verdicts.update(pack_verdicts)
     
+    results = []
+    for file_path, invoice_text in invoice_data.items():
+        tier = TIER_LARGE
+        if file_path in prescreened:
+            status, reason, tier = prescreened[file_path]
+        elif file_path in verdicts:
+            status, reason = verdicts[file_path]
+        else:
+            logging.warning(f"Invoice {file_path} appears to be empty")
+            status, reason, tier = "error", "Invoice text is empty or unreadable", TIER_NONE
+        results.append(build_result_metadata(file_path, status, reason, employee_name, tier))
     return results
 
-async def process_invoices_batch_safe(invoice_data: Dict[str, str], policy_text: str, employee_name: str, batch_size: int = 3) -> List[Dict]:
+async def process_invoices_pipeline(zip_file, policy_index: PolicyIndex, employee_name: str, max_invoices: Optional[int], policy_rules: Optional[PolicyRules] = None, extraction_stats: Optional[ExtractionStats] = None, skip: Optional[Set[str]] = None, on_stored: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
     """
-    Process invoices in small batches with proper error handling and timeouts.
+    Extract, analyze and store invoices as overlapping stages.
+    The first verdicts are ready while later PDFs are still being parsed, and
+    vector-store writes are batched behind the analysis. Identical invoices
+    are analyzed once and share the verdict.
+    
+    ``max_invoices`` of None processes the whole archive. Files in ``skip``
+    are not extracted, and ``on_stored`` is called (on a worker thread) with
+    each batch of results once it has been written to the vector store.
     """
-    results = []
-    invoice_items = list(invoice_data.items())
-    total_batches = (len(invoice_items) + batch_size - 1) // batch_size
+    analyses: Dict[str, asyncio.Future] = {}  # PDF digest -> result of its first analysis
+    digests: Dict[str, str] = {}  # file path -> PDF digest, recorded before the file is queued
     
-    for batch_idx in range(0, len(invoice_items), batch_size):
-        batch = invoice_items[batch_idx:batch_idx + batch_size]
-        batch_num = batch_idx // batch_size + 1
-        
-        logging.info(f"Processing batch {batch_num}/{total_batches} with {len(batch)} invoices")
-        
-        # Process each invoice in the batch
-        batch_tasks = []
-        for file_path, invoice_text in batch:
-            # Create a task for each invoice
-            loop = asyncio.get_event_loop()
-            task = loop.run_in_executor(
-                None,
-                process_single_invoice_sync,
-                file_path,
-                invoice_text,
-                policy_text,
-                employee_name
-            )
-            batch_tasks.append(task)
-        
+    def extracted():
         try:
-            # Wait for all tasks in the batch to complete with timeout
-            batch_results = await asyncio.wait_for(
-                asyncio.gather(*batch_tasks, return_exceptions=True),
-                timeout=120  # 2 minutes per batch
-            )
-            
-            # Process results
-            for i, result in enumerate(batch_results):
-                if isinstance(result, Exception):
-                    file_path = batch[i][0]
-                    logging.error(f"Task failed for {file_path}: {result}")
-                    error_metadata = {
-                        "invoice_id": Path(file_path).name,
-                        "file_path": file_path,
-                        "status": "error",
-                        "reason": f"Task failed: {str(result)}",
-                        "employee_name": extract_employee_name_from_path(file_path),
-                        "folder_name": Path(file_path).parent.name,
-                    }
-                    results.append(error_metadata)
-                else:
-                    results.append(result)
-                    
-        except asyncio.TimeoutError:
-            logging.error(f"Batch {batch_num} timed out")
-            # Add error entries for all invoices in the timed-out batch
-            for file_path, _ in batch:
-                error_metadata = {
-                    "invoice_id": Path(file_path).name,
-                    "file_path": file_path,
-                    "status": "error",
-                    "reason": "Processing timed out",
-                    "employee_name": extract_employee_name_from_path(file_path),
-                    "folder_name": Path(file_path).parent.name,
-                }
-                results.append(error_metadata)
+            for file_path, invoice_text, digest in islice(iter_zip_pdfs(zip_file, stats=extraction_stats, skip=skip), max_invoices):
+                if digest is not None:
+                    digests[file_path] = digest
+                yield file_path, invoice_text
+        except Exception as e:
+            raise ZipExtractionError(str(e)) from e
+    
+    def store(batch: List[Tuple[Dict, str]]) -> None:
+        store_invoice_results(batch)
+        if on_stored:
+            on_stored([result for result, _ in batch])
+    
+    async def analyze(file_path: str, invoice_text: str) -> Dict:
+        key = digests.get(file_path)
+        if key is not None and key in analyses:
+            return result_for_copy(await analyses[key], file_path, employee_name)
         
-        # Small delay between batches
-        if batch_num < total_batches:
-            await asyncio.sleep(0.5)
+        shared = asyncio.get_running_loop().create_future()
+        if key is not None:
+            analyses[key] = shared
+        try:
+            result = await analyze_invoice_with_retries(file_path, invoice_text, policy_index, employee_name, policy_rules)
+        except BaseException:
+            shared.cancel()
+            raise
+        shared.set_result(result)
+        return result
     
-    return results
+    return await run_ingestion_pipeline(
+        extracted(),
+        analyze,
+        store,
+        concurrency=config.PIPELINE_CONCURRENCY,
+        queue_size=config.PIPELINE_QUEUE_SIZE,
+        store_batch_size=config.PIPELINE_STORE_BATCH_SIZE,
+    )
 
 @router.post("/analyze")
 async def analyze_invoices(
@@ -212,7 +367,7 @@ async def analyze_invoices(
     invoice_zip: UploadFile = File(...),
     employee_name: str = Form(None),
     batch_size: int = Form(3),  # Reduced default batch size
-    processing_mode: str = Form("batch")  # "batch" or "sequential"
+    processing_mode: str = Form("pipeline")  # "pipeline", "batch", "sequential" or "packed"
 ):
     start_time = time.time()
     
@@ -224,8 +379,8 @@ async def analyze_invoices(
         if not invoice_zip.filename.lower().endswith('.zip'):
             raise HTTPException(status_code=400, detail="Invoice file must be a ZIP archive")
         
-        # Limit batch size to prevent system overload
-        batch_size = min(max(batch_size, 1), 5)  # Max 5 for safety
+        # Limit batch size to the process-wide LLM concurrency limit
+        batch_size = min(max(batch_size, 1), config.LLM_MAX_CONCURRENCY)
         
         # 1. Extract HR policy text from PDF
         try:
@@ -237,32 +392,64 @@ async def analyze_invoices(
             logging.error(f"Error extracting HR policy: {str(e)}")
             raise HTTPException(status_code=400, detail="Failed to extract text from HR policy PDF")
 
-        # 2. Extract invoice PDFs and their text
-        try:
-            invoice_data = extract_zip_pdfs(invoice_zip.file)
-            if not invoice_data:
-                raise HTTPException(status_code=400, detail="No valid PDF files found in the ZIP archive")
-            logging.info(f"Extracted {len(invoice_data)} invoices from ZIP file")
-        except Exception as e:
-            logging.error(f"Error extracting invoices: {str(e)}")
-            raise HTTPException(status_code=400, detail="Failed to extract PDFs from ZIP file")
+        # 2. Index the policy once so every invoice only carries its relevant sections,
+        #    and compile its limits/exclusions for the rule pre-screen
+        policy_index = await asyncio.to_thread(PolicyIndex.build, policy_text)
+        policy_rules = compile_policy_rules(policy_text) if config.RULE_PRESCREEN_ENABLED else None
+        if policy_index.uses_retrieval:
+            logging.info(f"Using policy retrieval over {len(policy_index.sections)} sections")
 
         # Limit the number of invoices to prevent timeout
         max_invoices = 30  # Reduced for better reliability
-        if len(invoice_data) > max_invoices:
-            logging.warning(f"Too many invoices ({len(invoice_data)}). Processing first {max_invoices} only.")
-            invoice_data = dict(list(invoice_data.items())[:max_invoices])
 
-        # 3. Process invoices based on selected mode
+        # 3. Extract invoice PDFs and their text (the pipeline extracts while it analyzes)
+        extraction_stats = ExtractionStats()
+        if processing_mode != "pipeline":
+            try:
+                # PDFs are parsed across a process pool; wait for it off the event loop
+                digests: Dict[str, str] = {}
+                invoice_data = await asyncio.to_thread(extract_zip_pdfs_parallel, invoice_zip.file, stats=extraction_stats, digests=digests)
+                if not invoice_data:
+                    raise HTTPException(status_code=400, detail="No valid PDF files found in the ZIP archive")
+                logging.info(f"Extracted {len(invoice_data)} invoices from ZIP file")
+            except Exception as e:
+                logging.error(f"Error extracting invoices: {str(e)}")
+                raise HTTPException(status_code=400, detail="Failed to extract PDFs from ZIP file")
+
+            if len(invoice_data) > max_invoices:
+                logging.warning(f"Too many invoices ({len(invoice_data)}). Processing first {max_invoices} only.")
+                invoice_data = dict(list(invoice_data.items())[:max_invoices])
+            
+            # Identical invoices are analyzed once, their copies share the verdict
+            all_invoice_data = invoice_data
+            invoice_data, copies = collapse_duplicate_invoices(all_invoice_data, digests)
+            if copies:
+                logging.info(f"Collapsed {len(all_invoice_data) - len(invoice_data)} duplicate invoices")
+
+        # 4. Process invoices based on selected mode
         try:
-            if processing_mode == "sequential" or len(invoice_data) <= 5:
-                # Use sequential processing for small numbers or when requested
-                logging.info("Using sequential processing mode")
-                results = await process_invoices_sequential(invoice_data, policy_text, employee_name)
+            if processing_mode == "pipeline":
+                logging.info(f"Using pipelined processing mode with {config.PIPELINE_CONCURRENCY} analysis workers")
+                try:
+                    results = await process_invoices_pipeline(invoice_zip.file, policy_index, employee_name, max_invoices, policy_rules, extraction_stats)
+                except ZipExtractionError as e:
+                    logging.error(f"Error extracting invoices: {str(e)}")
+                    raise HTTPException(status_code=400, detail="Failed to extract PDFs from ZIP file")
+                if not results:
+                    raise HTTPException(status_code=400, detail="No valid PDF files found in the ZIP archive")
+            elif processing_mode == "packed":
+                logging.info("Using packed processing mode")
+                results = await process_invoices_packed(invoice_data, policy_index, employee_name, policy_rules)
             else:
-                # Use batch processing for larger numbers
-                logging.info(f"Using batch processing mode with batch size {batch_size}")
-                results = await process_invoices_batch_safe(invoice_data, policy_text, employee_name, batch_size)
+                # "sequential" keeps one invoice in flight, "batch" keeps batch_size in flight
+                concurrency = 1 if processing_mode == "sequential" else batch_size
+                logging.info(f"Using {processing_mode} processing mode with {concurrency} invoices in flight")
+                results = await process_invoices_scheduled(invoice_data, policy_index, employee_name, concurrency, policy_rules)
+            
+            if processing_mode != "pipeline":
+                results = fan_out_duplicates(results, copies, all_invoice_data, employee_name)
+                # One embedding pass and one vector-store write for the whole upload
+                await asyncio.to_thread(store_invoice_results, [(r, all_invoice_data[r["file_path"]]) for r in results])
             
             processing_time = time.time() - start_time
             logging.info(f"Processing completed in {processing_time:.2f} seconds")
@@ -275,9 +462,19 @@ async def analyze_invoices(
                 "employee_names_generated": list(set([r["employee_name"] for r in results])),
                 "processing_time_seconds": round(processing_time, 2),
                 "batch_size_used": batch_size if processing_mode == "batch" else 1,
-                "processing_mode": processing_mode
+                "processing_mode": processing_mode,
+                "policy_sections_indexed": len(policy_index.sections) if policy_index.uses_retrieval else 0,
+                "verdicts_by_tier": dict(Counter(r.get("model_tier", TIER_NONE) for r in results)),
+                "duplicate_invoices": len([r for r in results if "duplicate_of" in r]),
+                "pdf_text_cache": {
+                    "hits": extraction_stats.cache_hits,
+                    "misses": extraction_stats.cache_misses,
+                    "duplicate_files": extraction_stats.duplicate_files
+                }
             }
             
+        except HTTPException:
+            raise
         except Exception as e:
             logging.error(f"Error during processing: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
@@ -291,20 +488,49 @@ async def analyze_invoices(
 # Health check endpoint
 @router.get("/health")
 async def health_check():
+    vector_store = vector_store_status()
     return {
         "status": "healthy", 
+        "ready": vector_store["ready"],
+        "vector_store": vector_store,
         "timestamp": time.time(),
-        "thread_count": threading.active_count()
+        "thread_count": threading.active_count(),
+        "llm_calls_in_flight": governor.in_flight,
+        "llm_calls_waiting": governor.waiting
     }
 
 # System info endpoint
 @router.get("/system-info")
 async def get_system_info():
+    verdict_cache = get_verdict_cache()
+    pdf_text_cache = get_pdf_text_cache()
     return {
-        "max_batch_size": 5,
+        "max_batch_size": config.LLM_MAX_CONCURRENCY,
+        "max_concurrent_llm_calls": config.LLM_MAX_CONCURRENCY,
         "recommended_batch_size": 3,
-        "max_invoices_per_request": 30,
-        "timeout_per_batch_seconds": 120,
-        "processing_modes": ["sequential", "batch"],
-        "recommended_mode": "sequential for ≤5 invoices, batch for >5 invoices"
-    }
\ No newline at end of file
+        "max_invoices_per_request": 30,  # POST /api/jobs has no limit
+        "timeout_per_invoice_seconds": config.INVOICE_TIMEOUT_SECONDS,
+        "max_retries_per_invoice": config.INVOICE_MAX_RETRIES,
+        "processing_modes": ["pipeline", "sequential", "batch", "packed"],
+        "max_invoices_per_pack": config.PACK_MAX_INVOICES,
+        "recommended_mode": "pipeline; batch keeps batch_size invoices in flight, sequential one",
+        "verdict_cache": verdict_cache.stats() if verdict_cache is not None else None,
+        "pdf_text_cache": pdf_text_cache.stats() if pdf_text_cache is not None else None,
+        "embedding_cache": embedding_cache_stats(),
+        "chat_answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "rate_limits": rate_limiter_stats(),
+        "cascade_enabled": config.CASCADE_ENABLED,
+        "cascade_small_model": config.CASCADE_SMALL_MODEL,
+        "pdf_extract_workers": config.PDF_EXTRACT_WORKERS,
+        "pipeline_concurrency": config.PIPELINE_CONCURRENCY
+    }
+
+# Collection statistics endpoint (read from counters maintained on every write)
+@router.get("/stats")
+async def get_stats():
+    try:
+        store = await asyncio.to_thread(get_vector_store)
+    except Exception as e:
+        logging.error(f"Vector store unavailable: {str(e)}")
+        raise HTTPException(status_code=503, detail="Vector store unavailable")
+    return await asyncio.to_thread(store.get_collection_stats)
@@ -1,13 +1,23 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
-from app.core.vector_store import query_vector_store
-from app.core.rag_utils import answer_query_with_context
+from typing import Dict, Any, Optional, List, Tuple
+from app.core.vector_store import get_vector_store, query_vector_store, build_where_clause
+from app.core.rag_utils import answer_query_with_context_async, stream_answer_with_context, pack_context, AnswerStreamError, ContextPack, CHAT_ERROR_MESSAGE
+from app.core.query_router import route_query
+from app.core.answer_cache import answer_cache, answer_scope, CachedAnswer
+from app.core import config
+import asyncio
+import json
+import logging
 
 router = APIRouter()
 
 class ChatQuery(BaseModel):
     question: str
+    # Metadata filter pushed down into the vector store, e.g.
+    # {"status": "Declined", "amount": {"$gt": 500}, "timestamp": {"$gte": "2024-05-01"},
+    #  "employee_name": {"$in": ["asha", "ravi"]}}; see build_where_clause
     filters: Optional[Dict[str, Any]] = None
     max_docs: Optional[int] = 5
 
@@ -16,13 +26,111 @@ class ChatResponse(BaseModel):
     answer: str
     sources: List[Dict[str, Any]]
     num_sources: int
+    # "metadata" when answered from the collection statistics, "rag" otherwise
+    route: str = "rag"
+    aggregate: Optional[Dict[str, Any]] = None
+    # True when a previous answer to a near-identical question was reused
+    cached: bool = False
+    # Tokens and documents of the packed prompt context
+    context: Optional[Dict[str, Any]] = None
+
+def check_filters(filters: Optional[Dict[str, Any]]) -> None:
+    """Reject malformed filters with a 400 instead of an empty search result"""
+    try:
+        build_where_clause(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {e}")
+
+async def routed_answer(query: ChatQuery) -> Optional[Dict[str, Any]]:
+    """
+    Exact answer to a count / total / average question from the collection
+    statistics, or None when the question needs retrieval and generation.
+    """
+    if not config.QUERY_ROUTER_ENABLED:
+        return None
+    try:
+        store = await asyncio.to_thread(get_vector_store)
+        return await asyncio.to_thread(route_query, query.question, query.filters, store.stats)
+    except Exception as e:
+        logging.warning(f"Query routing failed, using RAG: {str(e)}")
+        return None
+
+async def cached_answer(query: ChatQuery) -> Tuple[Optional[List[float]], Optional[CachedAnswer]]:
+    """
+    Embed the question and look it up in the semantic answer cache.
+    The embedding is kept by the embedding cache, so retrieval does not recompute it.
+
+    Returns:
+        Tuple of the question embedding (None when caching is off) and the cached answer, if any
+    """
+    if answer_cache is None:
+        return None, None
+    try:
+        store = await asyncio.to_thread(get_vector_store)
+        embedding = await asyncio.to_thread(store.generate_embedding, query.question)
+    except Exception as e:
+        logging.warning(f"Answer cache lookup failed: {str(e)}")
+        return None, None
+    return embedding, answer_cache.get(embedding, answer_scope(query.filters, query.max_docs or 5))
+
+def remember_answer(query: ChatQuery, embedding: Optional[List[float]], answer: str, docs: List[Dict[str, Any]]) -> None:
+    """Cache a generated answer with its sources; failed generations are not cached"""
+    if answer_cache is None or embedding is None or not docs or answer == CHAT_ERROR_MESSAGE:
+        return
+    answer_cache.set(
+        embedding,
+        answer_scope(query.filters, query.max_docs or 5),
+        answer,
+        [doc["metadata"] for doc in docs],
+        [doc["id"] for doc in docs]
+    )
+
+async def retrieve_context(query: ChatQuery, embedding: Optional[List[float]]) -> ContextPack:
+    """
+    Over-fetch candidates (with their stored embeddings) and pack the most
+    relevant, mutually distinct ones into the prompt token budget.
+    """
+    top_k = query.max_docs or 5
+    # Retrieval embeds the question and queries Chroma, keep it off the event loop
+    docs = await asyncio.to_thread(
+        query_vector_store, query.question, filters=query.filters,
+        top_k=top_k * max(1, config.CHAT_RETRIEVAL_OVERFETCH), include_embeddings=True
+    )
+    return pack_context(query.question, docs, query_embedding=embedding, max_docs=top_k)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @router.post("/chat", response_model=ChatResponse)
 async def rag_chat(query: ChatQuery):
     if not query.question:
         raise HTTPException(status_code=400, detail="Empty question")
+    check_filters(query.filters)
+    
+    routed = await routed_answer(query)
+    if routed is not None:
+        return ChatResponse(
+            question=query.question,
+            answer=routed["answer"],
+            sources=[],
+            num_sources=0,
+            route="metadata",
+            aggregate=routed["aggregate"]
+        )
+    
+    embedding, cached = await cached_answer(query)
+    if cached is not None:
+        return ChatResponse(
+            question=query.question,
+            answer=cached.answer,
+            sources=cached.sources,
+            num_sources=len(cached.sources),
+            cached=True
+        )
     
-    docs = query_vector_store(query.question, filters=query.filters, top_k=query.max_docs or 5)
+    context = await retrieve_context(query, embedding)
+    docs = context.docs
     
     if not docs:
         return ChatResponse(
@@ -32,10 +140,80 @@ async def rag_chat(query: ChatQuery):
             num_sources=0
         )
     
-    answer = answer_query_with_context(query.question, docs)
+    answer = await answer_query_with_context_async(query.question, docs, context)
+    remember_answer(query, embedding, answer, docs)
     return ChatResponse(
         question=query.question,
         answer=answer,
         sources=[doc["metadata"] for doc in docs],
-        num_sources=len(docs)
+        num_sources=len(docs),
+        context=context.report()
+    )
+
+@router.post("/chat/stream")
+async def rag_chat_stream(query: ChatQuery):
+    """
+    Streaming variant of /chat over Server-Sent Events.
+    Emits a `sources` event first, then one `token` event per generated
+    fragment, and finally `done`.
+    """
+    if not query.question:
+        raise HTTPException(status_code=400, detail="Empty question")
+    check_filters(query.filters)
+    
+    async def events():
+        routed = await routed_answer(query)
+        if routed is not None:
+            yield sse_event("sources", {
+                "question": query.question,
+                "sources": [],
+                "num_sources": 0,
+                "route": "metadata",
+                "aggregate": routed["aggregate"]
+            })
+            yield sse_event("token", {"text": routed["answer"]})
+            yield sse_event("done", {})
+            return
+        
+        embedding, cached = await cached_answer(query)
+        if cached is not None:
+            yield sse_event("sources", {
+                "question": query.question,
+                "sources": cached.sources,
+                "num_sources": len(cached.sources),
+                "cached": True
+            })
+            yield sse_event("token", {"text": cached.answer})
+            yield sse_event("done", {})
+            return
+        
+        context = await retrieve_context(query, embedding)
+        docs = context.docs
+        yield sse_event("sources", {
+            "question": query.question,
+            "sources": [doc["metadata"] for doc in docs],
+            "num_sources": len(docs),
+            "context": context.report()
+        })
+        
+        if not docs:
+            yield sse_event("token", {"text": "No relevant information found."})
+        else:
+            fragments = []
+            try:
+                async for text in stream_answer_with_context(query.question, docs, context):
+                    fragments.append(text)
+                    yield sse_event("token", {"text": text})
+            except AnswerStreamError:
+                # The partial answer is shown with the error but never cached
+                yield sse_event("token", {"text": CHAT_ERROR_MESSAGE})
+            else:
+                remember_answer(query, embedding, "".join(fragments), docs)
+        
+        yield sse_event("done", {})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
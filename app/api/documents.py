@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Iterator, Optional
+from app.core.vector_store import get_vector_store
+import asyncio
+import csv
+import io
+import json
+import logging
+
+router = APIRouter()
+
+# Metadata columns of the CSV export, in order
+CSV_FIELDS = [
+    "employee_name", "filename", "invoice_id", "status", "model_tier", "amount",
+    "reimbursable_amount", "timestamp", "reason", "policy_violations", "compliant_items",
+]
+
+def ndjson_lines(docs: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    for doc in docs:
+        yield json.dumps(doc) + "\n"
+
+def csv_lines(docs: Iterator[Dict[str, Any]], include_content: bool) -> Iterator[str]:
+    header = ["id"] + CSV_FIELDS + (["document"] if include_content else [])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for doc in docs:
+        metadata = doc["metadata"] or {}
+        row = [doc["id"]] + [metadata.get(field, "") for field in CSV_FIELDS]
+        if include_content:
+            row.append(doc.get("document", ""))
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header of an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/documents")
+async def export_documents(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    employee_name: Optional[str] = None,
+    status: Optional[str] = None,
+    include_content: bool = False,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    page_size: int = Query(500, ge=1, le=5000)
+):
+    """
+    Export stored invoice analyses as NDJSON (one document per line) or CSV.
+    Documents are read from the vector store page by page while the response
+    is streamed, so memory use does not depend on the number of documents.
+    Invoice bodies are only included with include_content=true.
+    """
+    try:
+        store = await asyncio.to_thread(get_vector_store)
+    except Exception as e:
+        logging.error(f"Vector store unavailable: {str(e)}")
+        raise HTTPException(status_code=503, detail="Vector store unavailable")
+
+    docs = store.iter_documents(
+        metadata_filter={"employee_name": employee_name, "status": status},
+        include_documents=include_content,
+        page_size=page_size,
+        offset=offset,
+        limit=limit
+    )
+
+    # Sync iterators are consumed on the thread pool by StreamingResponse
+    if format == "csv":
+        return StreamingResponse(
+            csv_lines(docs, include_content),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=invoice_analyses.csv"}
+        )
+    return StreamingResponse(ndjson_lines(docs), media_type="application/x-ndjson")
@@ -0,0 +1,195 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query
+from app.api.analyze import process_invoices_pipeline, ZipExtractionError
+from app.core.pdf_utils import extract_text_from_pdf, count_zip_pdfs
+from app.core.policy_index import PolicyIndex
+from app.core.policy_rules import compile_policy_rules
+from app.core.job_store import JobStore, JOB_COMPLETED, JOB_FAILED
+from app.core import config
+from typing import List, Optional
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import uuid
+
+router = APIRouter()
+
+_job_store: Optional[JobStore] = None
+_job_store_lock = threading.Lock()
+
+_job_queue: Optional[asyncio.Queue] = None
+_job_workers: List[asyncio.Task] = []
+
+
+def get_job_store() -> JobStore:
+    """Return the shared job store, opening its file under JOBS_DIR on first use"""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = JobStore(os.path.join(config.JOBS_DIR, "jobs.sqlite3"))
+    return _job_store
+
+
+def _save_upload(upload, path: str) -> None:
+    upload.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload, f, 1024 * 1024)
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def run_job(job_id: str) -> None:
+    """Process the invoices of a job that do not have a result yet, recording each batch as it is stored"""
+    store = await asyncio.to_thread(get_job_store)
+    job = await asyncio.to_thread(store.get, job_id, True)
+    if job is None or job["status"] in (JOB_COMPLETED, JOB_FAILED):
+        return
+    await asyncio.to_thread(store.mark_running, job_id)
+    done = await asyncio.to_thread(store.processed_files, job_id)
+    if done:
+        logging.info(f"Resuming job {job_id}: {len(done)} of {job['total']} invoices already processed")
+
+    try:
+        policy_index = await asyncio.to_thread(PolicyIndex.build, job["policy_text"])
+        policy_rules = compile_policy_rules(job["policy_text"]) if config.RULE_PRESCREEN_ENABLED else None
+        await process_invoices_pipeline(
+            job["zip_path"], policy_index, job["employee_name"], None, policy_rules,
+            skip=done, on_stored=lambda results: store.record_results(job_id, results)
+        )
+    except asyncio.CancelledError:
+        # Shutdown: the job stays "running" and is resumed on the next start
+        raise
+    except ZipExtractionError as e:
+        logging.error(f"Job {job_id} failed to extract invoices: {str(e)}")
+        await asyncio.to_thread(store.finish, job_id, f"Failed to extract PDFs from ZIP file: {str(e)}")
+    except Exception as e:
+        logging.error(f"Job {job_id} failed: {str(e)}")
+        await asyncio.to_thread(store.finish, job_id, f"Processing failed: {str(e)}")
+    else:
+        await asyncio.to_thread(store.finish, job_id)
+        logging.info(f"Job {job_id} completed")
+    # Results are kept in the job store, the uploaded archive is no longer needed
+    await asyncio.to_thread(_remove_file, job["zip_path"])
+
+
+async def _job_worker() -> None:
+    while True:
+        job_id = await _job_queue.get()
+        try:
+            await run_job(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Job worker error on {job_id}: {str(e)}")
+
+
+def start_job_workers() -> None:
+    """Start the background job workers and queue the jobs left unfinished by a previous run"""
+    global _job_queue, _job_workers
+    _job_queue = asyncio.Queue()
+    for job_id in get_job_store().unfinished():
+        _job_queue.put_nowait(job_id)
+    if _job_queue.qsize():
+        logging.info(f"Resuming {_job_queue.qsize()} unfinished analysis jobs")
+    _job_workers = [
+        asyncio.create_task(_job_worker(), name=f"analysis-job-worker-{i}")
+        for i in range(max(1, config.JOB_WORKERS))
+    ]
+
+
+async def stop_job_workers() -> None:
+    """Cancel the job workers; interrupted jobs resume on the next start"""
+    for task in _job_workers:
+        task.cancel()
+    await asyncio.gather(*_job_workers, return_exceptions=True)
+    _job_workers.clear()
+
+
+@router.post("/jobs", status_code=202)
+async def submit_analysis_job(
+    hr_policy: UploadFile = File(...),
+    invoice_zip: UploadFile = File(...),
+    employee_name: str = Form(None)
+):
+    """
+    Queue an invoice analysis and return its job id immediately.
+    The invoices are processed by a background worker with the pipelined
+    mode, without a limit on their number; poll GET /jobs/{job_id} for
+    progress and results.
+    """
+    if not hr_policy.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="HR policy must be a PDF file")
+    if not invoice_zip.filename.lower().endswith('.zip'):
+        raise HTTPException(status_code=400, detail="Invoice file must be a ZIP archive")
+    if _job_queue is None:
+        raise HTTPException(status_code=503, detail="Job worker is not running")
+
+    try:
+        policy_text = await asyncio.to_thread(extract_text_from_pdf, hr_policy.file)
+    except Exception as e:
+        logging.error(f"Error extracting HR policy: {str(e)}")
+        raise HTTPException(status_code=400, detail="Failed to extract text from HR policy PDF")
+    if not policy_text.strip():
+        raise HTTPException(status_code=400, detail="HR policy PDF appears to be empty or unreadable")
+
+    # Opening the store also creates JOBS_DIR for the upload
+    store = await asyncio.to_thread(get_job_store)
+    job_id = uuid.uuid4().hex
+    zip_path = os.path.join(config.JOBS_DIR, f"{job_id}.zip")
+    await asyncio.to_thread(_save_upload, invoice_zip.file, zip_path)
+    try:
+        total = await asyncio.to_thread(count_zip_pdfs, zip_path)
+    except Exception as e:
+        await asyncio.to_thread(_remove_file, zip_path)
+        logging.error(f"Error reading invoice ZIP: {str(e)}")
+        raise HTTPException(status_code=400, detail="No valid PDF files found in the ZIP archive")
+
+    await asyncio.to_thread(store.create, policy_text, zip_path, total, employee_name, job_id)
+    await _job_queue.put(job_id)
+    logging.info(f"Queued job {job_id} with {total} invoices")
+    return {"job_id": job_id, "status": "queued", "total_invoices": total, "status_url": f"/api/jobs/{job_id}"}
+
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1)
+):
+    """
+    Progress of a job and its results so far.
+    Results are returned in the order they were stored; pass the previous
+    response's next_offset as ``offset`` to fetch only the new ones.
+    """
+    store = await asyncio.to_thread(get_job_store)
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    results = await asyncio.to_thread(store.results, job_id, offset, limit)
+    status_counts = await asyncio.to_thread(store.status_counts, job_id)
+    finished_at = job["finished_at"]
+    started_at = job["started_at"]
+
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "error": job["error"],
+        "total_invoices": job["total"],
+        "processed": job["processed"],
+        "failed": job["failed"],
+        "progress": round(job["processed"] / job["total"], 3) if job["total"] else 1.0,
+        "status_distribution": status_counts,
+        "created_at": job["created_at"],
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "processing_time_seconds": round(finished_at - started_at, 2) if finished_at and started_at else None,
+        "results": results,
+        "next_offset": offset + len(results),
+    }
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+import json
+import threading
+import time
+import numpy as np
+
+from app.core import config
+from app.core.vector_store import add_change_listener
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    sources: List[Dict[str, Any]]
+    source_ids: List[str]
+    scope: str
+    created_at: float
+    similarity: float = 1.0
+
+
+def answer_scope(filters: Optional[Dict[str, Any]], max_docs: int) -> str:
+    """Cache partition of a chat request: answers are only reused under the same filters and source count"""
+    return json.dumps({"filters": filters or {}, "max_docs": max_docs}, sort_keys=True, default=str)
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of chat answers, looked up by question embedding.
+
+    Question embeddings (normalised) live in one float32 matrix, so a lookup
+    is a single matrix-vector product; the best entry of the same scope above
+    ``threshold`` cosine similarity is a hit. Entries expire after
+    ``ttl_seconds``, the least recently used are evicted beyond
+    ``max_entries``, and an entry is dropped as soon as one of its source
+    documents is re-stored or deleted.
+    """
+
+    def __init__(self, max_entries: int = 1024, threshold: float = 0.95, ttl_seconds: Optional[float] = None):
+        self.max_entries = max(1, max_entries)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors: Optional[np.ndarray] = None
+            self._used = np.zeros(self.max_entries, dtype=bool)
+            self._entries: Dict[int, CachedAnswer] = {}
+            self._recency: "OrderedDict[int, None]" = OrderedDict()
+            self._by_source: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, slot: int) -> None:
+        entry = self._entries.pop(slot, None)
+        if entry is None:
+            return
+        self._used[slot] = False
+        self._recency.pop(slot, None)
+        for source_id in entry.source_ids:
+            slots = self._by_source.get(source_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._by_source[source_id]
+
+    def get(self, embedding, scope: str) -> Optional[CachedAnswer]:
+        """Cached answer to the most similar past question in the same scope, if similar enough"""
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None or not self._entries or query.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+            scores = self._vectors @ query
+            scores[~self._used] = -1.0
+            now = time.time()
+            for slot in np.argsort(-scores):
+                slot = int(slot)
+                if scores[slot] < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry.scope != scope:
+                    continue
+                if self.ttl_seconds is not None and now - entry.created_at > self.ttl_seconds:
+                    self._drop(slot)
+                    continue
+                self._recency.move_to_end(slot)
+                self.hits += 1
+                return CachedAnswer(**dict(entry.__dict__, similarity=float(scores[slot])))
+            self.misses += 1
+            return None
+
+    def set(self, embedding, scope: str, answer: str, sources: List[Dict[str, Any]], source_ids: List[str]) -> None:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0:
+            return
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._used[:] = False
+                self._entries.clear()
+                self._recency.clear()
+                self._by_source.clear()
+            free = np.flatnonzero(~self._used)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = next(iter(self._recency))
+                self._drop(slot)
+
+            self._vectors[slot] = vector / norm
+            self._used[slot] = True
+            self._entries[slot] = CachedAnswer(answer, sources, list(source_ids), scope, time.time())
+            self._recency[slot] = None
+            for source_id in source_ids:
+                self._by_source.setdefault(source_id, set()).add(slot)
+
+    def invalidate(self, document_ids: Optional[List[str]]) -> None:
+        """Drop the answers built from any of the given documents (all answers when None)"""
+        if document_ids is None:
+            with self._lock:
+                self.invalidations += len(self._entries)
+            self.clear()
+            return
+        with self._lock:
+            slots = set()
+            for document_id in document_ids:
+                slots |= self._by_source.get(document_id, set())
+            for slot in slots:
+                self._drop(slot)
+            self.invalidations += len(slots)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+answer_cache: Optional[SemanticAnswerCache] = None
+if config.CHAT_CACHE_ENABLED:
+    answer_cache = SemanticAnswerCache(
+        max_entries=config.CHAT_CACHE_MAX_ENTRIES,
+        threshold=config.CHAT_CACHE_SIMILARITY,
+        ttl_seconds=config.CHAT_CACHE_TTL_SECONDS,
+    )
+    add_change_listener(answer_cache.invalidate)
@@ -0,0 +1,132 @@
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of a text"""
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+class SQLiteCache:
+    """
+    Small persistent key/value cache stored in a SQLite file.
+
+    Values are JSON-serialisable objects. Entries expire after ``ttl_seconds``
+    and the least recently used entries are evicted once ``max_entries`` is
+    exceeded. Hit and miss counters are kept for the lifetime of the process.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or an expired entry"""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+
+                value, created_at = row
+                if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._count -= 1
+                    self.misses += 1
+                    return None
+
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+                self.hits += 1
+            return json.loads(value)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {self.path}: {e}")
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if the cache is full"""
+        now = time.time()
+        try:
+            payload = json.dumps(value)
+            with self._lock:
+                cursor = self._conn.execute(
+                    "UPDATE entries SET value = ?, created_at = ?, accessed_at = ? WHERE key = ?",
+                    (payload, now, now, key),
+                )
+                if cursor.rowcount == 0:
+                    self._conn.execute(
+                        "INSERT INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                        (key, payload, now, now),
+                    )
+                    self._count += 1
+                if self._count > self.max_entries:
+                    self._evict(self._count - self.max_entries)
+        except Exception as e:
+            logger.warning(f"Cache write failed for {self.path}: {e}")
+
+    def _evict(self, n: int) -> None:
+        # Expired entries go first, then the least recently used ones
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._count -= cursor.rowcount
+            self.evictions += cursor.rowcount
+            n -= cursor.rowcount
+        if n > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                (n,),
+            )
+            self._count -= cursor.rowcount
+            self.evictions += cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,232 @@
+from typing import Any, Dict, Iterable, List, Optional
+import os
+import sqlite3
+import threading
+
+def _parse_amount(value: Any) -> Optional[float]:
+    try:
+        return float(str(value).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+class CollectionStats:
+    """
+    Aggregate statistics of a vector-store collection, kept up to date on every write.
+
+    A side SQLite table holds one small row per document (status, employee,
+    timestamp, amounts) plus running counters, so reading the stats never
+    scans the collection: distributions and totals are read from the
+    counters, the date range from the timestamp index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                employee TEXT NOT NULL,
+                timestamp TEXT,
+                amount REAL,
+                reimbursable_amount REAL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_timestamp ON documents(timestamp)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_employee ON documents(employee)")
+        # kind is "status", "employee" or "total" (key "documents", "amount", "reimbursable_amount",
+        # and "amount_count" / "reimbursable_count", the documents with a known amount)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS counters (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )"""
+        )
+        # Tables written before the known-amount counters existed: count them once
+        for key, column in (("amount_count", "amount"), ("reimbursable_count", "reimbursable_amount")):
+            if self._conn.execute("SELECT 1 FROM counters WHERE kind = 'total' AND key = ?", (key,)).fetchone() is None:
+                self._conn.execute(
+                    f"INSERT INTO counters (kind, key, value) SELECT 'total', ?, COUNT({column}) FROM documents", (key,)
+                )
+
+    @staticmethod
+    def _row(document_id: str, metadata: Dict[str, Any]) -> tuple:
+        return (
+            document_id,
+            metadata.get("status", "Unknown"),
+            metadata.get("employee_name", "Unknown"),
+            metadata.get("timestamp") or None,
+            _parse_amount(metadata.get("amount")),
+            _parse_amount(metadata.get("reimbursable_amount")),
+        )
+
+    def _bump(self, kind: str, key: str, delta: float) -> None:
+        if not delta:
+            return
+        self._conn.execute(
+            "INSERT INTO counters (kind, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT(kind, key) DO UPDATE SET value = value + excluded.value",
+            (kind, key, delta),
+        )
+
+    def _apply(self, row: tuple, sign: int) -> None:
+        _, status, employee, _, amount, reimbursable = row
+        self._bump("status", status, sign)
+        self._bump("employee", employee, sign)
+        self._bump("total", "documents", sign)
+        if amount is not None:
+            self._bump("total", "amount", sign * amount)
+            self._bump("total", "amount_count", sign)
+        if reimbursable is not None:
+            self._bump("total", "reimbursable_amount", sign * reimbursable)
+            self._bump("total", "reimbursable_count", sign)
+
+    def _remove(self, document_ids: Iterable[str]) -> None:
+        for document_id in document_ids:
+            old = self._conn.execute(
+                "SELECT id, status, employee, timestamp, amount, reimbursable_amount FROM documents WHERE id = ?",
+                (document_id,),
+            ).fetchone()
+            if old is not None:
+                self._apply(old, -1)
+                self._conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+
+    def record(self, documents: Dict[str, Dict[str, Any]]) -> None:
+        """Count stored (or replaced) documents, given as id -> metadata"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._remove(documents)
+                for document_id, metadata in documents.items():
+                    row = self._row(document_id, metadata)
+                    self._conn.execute("INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)", row)
+                    self._apply(row, 1)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove(self, document_ids: List[str]) -> None:
+        """Uncount deleted documents"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._remove(document_ids)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def rebuild(self, documents: Iterable[tuple]) -> None:
+        """Recount from scratch, given (id, metadata) pairs for every document"""
+        self.clear()
+        batch = {}
+        for document_id, metadata in documents:
+            batch[document_id] = metadata
+            if len(batch) >= 1000:
+                self.record(batch)
+                batch = {}
+        if batch:
+            self.record(batch)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM counters")
+            self._conn.execute("COMMIT")
+
+    def document_count(self) -> int:
+        row = self._conn.execute("SELECT value FROM counters WHERE kind = 'total' AND key = 'documents'").fetchone()
+        return int(row[0]) if row else 0
+
+    def employees(self) -> List[str]:
+        """Names of the employees with stored documents"""
+        rows = self._conn.execute("SELECT key FROM counters WHERE kind = 'employee' AND value > 0").fetchall()
+        return [row[0] for row in rows]
+
+    def aggregate(
+        self,
+        statuses: Optional[List[str]] = None,
+        employees: Optional[List[str]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Count and amount totals of the documents matching the given conditions.
+
+        Timestamps are ISO strings (``since`` inclusive, ``until`` exclusive),
+        amounts are compared exclusively. Without conditions the running
+        counters are read; otherwise one indexed query runs over the side table.
+
+        Returns:
+            Dict with documents, amount_total, amount_count (documents with a
+            known amount), reimbursable_total and reimbursable_count
+        """
+        conditions, params = [], []
+        for column, values in (("status", statuses), ("employee", employees)):
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+        for clause, value in (("timestamp >= ?", since), ("timestamp < ?", until),
+                              ("amount > ?", min_amount), ("amount < ?", max_amount)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+
+        with self._lock:
+            if not conditions:
+                totals = dict(self._conn.execute("SELECT key, value FROM counters WHERE kind = 'total'").fetchall())
+                return {
+                    'documents': int(totals.get("documents", 0)),
+                    'amount_total': round(totals.get("amount", 0.0), 2),
+                    'amount_count': int(totals.get("amount_count", 0)),
+                    'reimbursable_total': round(totals.get("reimbursable_amount", 0.0), 2),
+                    'reimbursable_count': int(totals.get("reimbursable_count", 0)),
+                }
+            row = self._conn.execute(
+                "SELECT COUNT(*), TOTAL(amount), COUNT(amount), TOTAL(reimbursable_amount), COUNT(reimbursable_amount) "
+                f"FROM documents WHERE {' AND '.join(conditions)}",
+                params,
+            ).fetchone()
+        return {
+            'documents': row[0],
+            'amount_total': round(row[1], 2),
+            'amount_count': row[2],
+            'reimbursable_total': round(row[3], 2),
+            'reimbursable_count': row[4],
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current statistics, in the shape returned by VectorStore.get_collection_stats"""
+        with self._lock:
+            counters = self._conn.execute("SELECT kind, key, value FROM counters WHERE value != 0").fetchall()
+            # Single MIN/MAX queries are answered from the index, not by a scan
+            earliest = self._conn.execute("SELECT MIN(timestamp) FROM documents").fetchone()[0]
+            latest = self._conn.execute("SELECT MAX(timestamp) FROM documents").fetchone()[0]
+
+        totals = {key: value for kind, key, value in counters if kind == "total"}
+        return {
+            'total_documents': int(totals.get("documents", 0)),
+            'status_distribution': {key: int(value) for kind, key, value in counters if kind == "status"},
+            'employee_distribution': {key: int(value) for kind, key, value in counters if kind == "employee"},
+            'date_range': {
+                'earliest': earliest,
+                'latest': latest
+            } if earliest else None,
+            'total_amount': round(totals.get("amount", 0.0), 2),
+            'total_reimbursable_amount': round(totals.get("reimbursable_amount", 0.0), 2),
+        }
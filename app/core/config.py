@@ -0,0 +1,155 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back to the default"""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment, falling back to the default"""
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a boolean setting ("1", "true", "yes") from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Groq API
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "your_api_key")
+ANALYSIS_MODEL = os.getenv("ANALYSIS_MODEL", "llama3-70b-8192")
+CHAT_MODEL = os.getenv("CHAT_MODEL", "llama3-70b-8192")
+
+# Shared HTTP connection pool for the Groq clients
+LLM_MAX_CONNECTIONS = _env_int("LLM_MAX_CONNECTIONS", 64)
+LLM_MAX_KEEPALIVE_CONNECTIONS = _env_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 32)
+LLM_KEEPALIVE_EXPIRY_SECONDS = _env_float("LLM_KEEPALIVE_EXPIRY_SECONDS", 30.0)
+LLM_REQUEST_TIMEOUT_SECONDS = _env_float("LLM_REQUEST_TIMEOUT_SECONDS", 60.0)
+
+# Process-wide limit on in-flight LLM calls (analysis and chat combined)
+LLM_MAX_CONCURRENCY = _env_int("LLM_MAX_CONCURRENCY", 32)
+
+# On-disk caches
+CACHE_DIR = os.getenv("CACHE_DIR", "./cache")
+VERDICT_CACHE_ENABLED = _env_bool("VERDICT_CACHE_ENABLED", True)
+VERDICT_CACHE_MAX_ENTRIES = _env_int("VERDICT_CACHE_MAX_ENTRIES", 50000)
+VERDICT_CACHE_TTL_SECONDS = _env_float("VERDICT_CACHE_TTL_SECONDS", 30 * 24 * 3600)
+
+# Policy retrieval: send only the policy sections relevant to each invoice
+POLICY_RETRIEVAL_ENABLED = _env_bool("POLICY_RETRIEVAL_ENABLED", True)
+POLICY_TOP_K = _env_int("POLICY_TOP_K", 4)
+POLICY_SECTION_MAX_CHARS = _env_int("POLICY_SECTION_MAX_CHARS", 1200)
+# Policies shorter than this are sent whole, retrieval only pays off on long policies
+POLICY_FULL_TEXT_MAX_CHARS = _env_int("POLICY_FULL_TEXT_MAX_CHARS", 6000)
+# Upper bound on the policy context included in a single prompt
+POLICY_CONTEXT_MAX_CHARS = _env_int("POLICY_CONTEXT_MAX_CHARS", 6000)
+
+# Packed analysis: several short invoices per LLM call
+PACK_CONTEXT_TOKENS = _env_int("PACK_CONTEXT_TOKENS", 8192)
+PACK_MAX_INVOICES = _env_int("PACK_MAX_INVOICES", 10)
+# Invoices estimated above this size are always analyzed on their own
+PACK_MAX_INVOICE_TOKENS = _env_int("PACK_MAX_INVOICE_TOKENS", 600)
+PACK_COMPLETION_TOKENS_PER_INVOICE = _env_int("PACK_COMPLETION_TOKENS_PER_INVOICE", 150)
+
+# Groq quotas, per model. The limiter also follows the x-ratelimit-* response headers.
+GROQ_REQUESTS_PER_MINUTE = _env_int("GROQ_REQUESTS_PER_MINUTE", 30)
+GROQ_TOKENS_PER_MINUTE = _env_int("GROQ_TOKENS_PER_MINUTE", 6000)
+# Completion size assumed when reserving tokens, corrected afterwards from usage
+LLM_EXPECTED_COMPLETION_TOKENS = _env_int("LLM_EXPECTED_COMPLETION_TOKENS", 300)
+# How often a call is re-queued after a 429 or a transient API error before giving up
+LLM_RATE_LIMIT_RETRIES = _env_int("LLM_RATE_LIMIT_RETRIES", 8)
+LLM_TRANSIENT_ERROR_RETRIES = _env_int("LLM_TRANSIENT_ERROR_RETRIES", 2)
+LLM_MAX_BACKOFF_SECONDS = _env_float("LLM_MAX_BACKOFF_SECONDS", 60.0)
+
+# Model cascade: a small model decides routine invoices, the analysis model handles the rest
+CASCADE_ENABLED = _env_bool("CASCADE_ENABLED", False)
+CASCADE_SMALL_MODEL = os.getenv("CASCADE_SMALL_MODEL", "llama3-8b-8192")
+CASCADE_CONFIDENCE_THRESHOLD = _env_float("CASCADE_CONFIDENCE_THRESHOLD", 0.85)
+
+# Deterministic pre-screen: decide obvious invoices from policy limits/exclusions without an LLM call
+RULE_PRESCREEN_ENABLED = _env_bool("RULE_PRESCREEN_ENABLED", False)
+
+# Parallel PDF extraction
+PDF_EXTRACT_WORKERS = _env_int("PDF_EXTRACT_WORKERS", os.cpu_count() or 1)
+PDF_EXTRACT_CHUNK_SIZE = _env_int("PDF_EXTRACT_CHUNK_SIZE", 8)
+# ZIPs with fewer PDFs than this are parsed in-process, the pool is not worth its overhead
+PDF_PARALLEL_MIN_FILES = _env_int("PDF_PARALLEL_MIN_FILES", 16)
+
+# Pipelined ingestion: extraction, analysis and vector-store writes overlap
+PIPELINE_CONCURRENCY = _env_int("PIPELINE_CONCURRENCY", 8)
+PIPELINE_QUEUE_SIZE = _env_int("PIPELINE_QUEUE_SIZE", 32)
+PIPELINE_STORE_BATCH_SIZE = _env_int("PIPELINE_STORE_BATCH_SIZE", 64)
+
+# Bounded-memory ZIP ingestion: archives are read in place, never loaded whole
+# PDF bytes queued for the extraction workers at any one time
+ZIP_MEMORY_CEILING_MB = _env_int("ZIP_MEMORY_CEILING_MB", 256)
+# Members larger than this are streamed to a temp file and parsed from disk
+ZIP_MEMBER_SPOOL_MB = _env_int("ZIP_MEMBER_SPOOL_MB", 32)
+
+# Extracted PDF text, keyed by a hash of the PDF bytes
+PDF_TEXT_CACHE_ENABLED = _env_bool("PDF_TEXT_CACHE_ENABLED", True)
+PDF_TEXT_CACHE_MAX_ENTRIES = _env_int("PDF_TEXT_CACHE_MAX_ENTRIES", 100000)
+PDF_TEXT_CACHE_TTL_SECONDS = _env_float("PDF_TEXT_CACHE_TTL_SECONDS", 90 * 24 * 3600)
+
+# SentenceTransformer model used for invoice, query and policy embeddings
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Embedding backend: "torch" (fp32 PyTorch), "onnx" (fp32 ONNX Runtime) or "onnx-int8" (quantized ONNX)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Quantized export loaded by the onnx-int8 backend, relative to the model repository
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+# Texts per SentenceTransformer forward pass when embedding analyses in bulk
+EMBEDDING_BATCH_SIZE = _env_int("EMBEDDING_BATCH_SIZE", 64)
+
+# Embedding cache: in-process LRU in front of a memory-mapped on-disk store
+EMBEDDING_CACHE_ENABLED = _env_bool("EMBEDDING_CACHE_ENABLED", True)
+EMBEDDING_CACHE_MEMORY_ENTRIES = _env_int("EMBEDDING_CACHE_MEMORY_ENTRIES", 4096)
+EMBEDDING_CACHE_DISK_ENTRIES = _env_int("EMBEDDING_CACHE_DISK_ENTRIES", 200000)
+
+# Hybrid retrieval for chat: BM25 over stored documents fused with vector search
+HYBRID_SEARCH_ENABLED = _env_bool("HYBRID_SEARCH_ENABLED", True)
+# Candidates taken from each ranking before fusion
+HYBRID_CANDIDATES = _env_int("HYBRID_CANDIDATES", 50)
+HYBRID_RRF_K = _env_int("HYBRID_RRF_K", 60)
+
+# Count / total / average chat questions are answered from the collection statistics, without the LLM
+QUERY_ROUTER_ENABLED = _env_bool("QUERY_ROUTER_ENABLED", True)
+
+# Semantic cache of chat answers, keyed by question embedding and filters
+CHAT_CACHE_ENABLED = _env_bool("CHAT_CACHE_ENABLED", True)
+CHAT_CACHE_MAX_ENTRIES = _env_int("CHAT_CACHE_MAX_ENTRIES", 1024)
+# Minimum cosine similarity between questions for a cached answer to be reused
+CHAT_CACHE_SIMILARITY = _env_float("CHAT_CACHE_SIMILARITY", 0.95)
+CHAT_CACHE_TTL_SECONDS = _env_float("CHAT_CACHE_TTL_SECONDS", 900)
+
+# Chat context packing: token budget of the retrieved documents in the RAG prompt
+CHAT_CONTEXT_TOKENS = _env_int("CHAT_CONTEXT_TOKENS", 2500)
+# Invoice content per document; a document with less room than the minimum is left out
+CHAT_CONTEXT_DOC_TOKENS = _env_int("CHAT_CONTEXT_DOC_TOKENS", 400)
+CHAT_CONTEXT_MIN_DOC_TOKENS = _env_int("CHAT_CONTEXT_MIN_DOC_TOKENS", 60)
+# Maximal marginal relevance: 1.0 ranks by relevance only, lower values favour diverse documents
+CHAT_MMR_LAMBDA = _env_float("CHAT_MMR_LAMBDA", 0.7)
+# Documents at least this similar to one already in the context are dropped
+CHAT_DUPLICATE_SIMILARITY = _env_float("CHAT_DUPLICATE_SIMILARITY", 0.97)
+# Candidates retrieved per requested source, for MMR to choose from
+CHAT_RETRIEVAL_OVERFETCH = _env_int("CHAT_RETRIEVAL_OVERFETCH", 3)
+
+# Asynchronous analysis jobs: state, results and uploaded archives are kept here until the job finishes
+JOBS_DIR = os.getenv("JOBS_DIR", "./jobs")
+# Jobs processed at the same time (each runs the invoice pipeline)
+JOB_WORKERS = _env_int("JOB_WORKERS", 1)
+
+# Per-invoice scheduling: each analysis attempt gets this long (0 disables the timeout)
+INVOICE_TIMEOUT_SECONDS = _env_float("INVOICE_TIMEOUT_SECONDS", 180.0)
+# Retries of timed-out or failed analyses, after a jittered exponential backoff
+INVOICE_MAX_RETRIES = _env_int("INVOICE_MAX_RETRIES", 2)
+INVOICE_RETRY_BACKOFF_SECONDS = _env_float("INVOICE_RETRY_BACKOFF_SECONDS", 1.0)
@@ -0,0 +1,65 @@
+from typing import Any, Dict, Optional
+import logging
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+EMBEDDING_BACKENDS = (BACKEND_TORCH, BACKEND_ONNX, BACKEND_ONNX_INT8)
+
+
+def _onnx_model_kwargs(backend: str) -> Dict[str, Any]:
+    if backend == BACKEND_ONNX_INT8:
+        # Dynamically quantized export shipped with the model, or produced by
+        # sentence_transformers.export_dynamic_quantized_onnx_model
+        return {"file_name": config.EMBEDDING_ONNX_INT8_FILE}
+    return {}
+
+
+def load_embedding_model(model_name: Optional[str] = None, backend: Optional[str] = None):
+    """
+    Load a SentenceTransformer on the requested backend.
+
+    * ``torch``: the PyTorch model (fp32), the reference.
+    * ``onnx``: the same weights exported to ONNX Runtime (fp32).
+    * ``onnx-int8``: a dynamically quantized int8 ONNX export.
+
+    All three produce vectors in the same embedding space, so documents stored
+    with one backend can be searched with another. A backend that cannot be
+    loaded (missing onnxruntime, missing export) falls back to the next more
+    conservative one.
+
+    Returns:
+        Tuple of the loaded model and the backend actually in use
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model_name = model_name or config.EMBEDDING_MODEL
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        logger.warning(f"Unknown embedding backend {backend!r}, using {BACKEND_TORCH}")
+        backend = BACKEND_TORCH
+
+    if backend == BACKEND_ONNX_INT8:
+        try:
+            return SentenceTransformer(model_name, backend="onnx", model_kwargs=_onnx_model_kwargs(backend)), backend
+        except Exception as e:
+            logger.warning(f"Quantized ONNX model unavailable, trying fp32 ONNX: {e}")
+            backend = BACKEND_ONNX
+
+    if backend == BACKEND_ONNX:
+        try:
+            return SentenceTransformer(model_name, backend="onnx"), backend
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable, using {BACKEND_TORCH}: {e}")
+            backend = BACKEND_TORCH
+
+    return SentenceTransformer(model_name), backend
+
+
+def embedding_cache_name(model_name: str, backend: str) -> str:
+    """Cache namespace for a model and backend; quantized vectors are not mixed with fp32 ones"""
+    return model_name if backend == BACKEND_TORCH else f"{model_name}-{backend}"
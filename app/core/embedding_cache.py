@@ -0,0 +1,262 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+# Rows added to the on-disk store each time it grows
+_GROWTH_ROWS = 1024
+
+
+def embedding_key(text: str, model_name: str) -> str:
+    """Cache key of a text's embedding under a given model"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8", errors="replace")).hexdigest()
+
+
+class _DiskVectors:
+    """
+    Float32 vectors in a memory-mapped file, indexed by a SQLite table.
+
+    Each vector occupies one fixed-size row of ``<name>.f32``; the index maps
+    cache keys to row numbers. When ``max_entries`` rows are in use the least
+    recently used row is overwritten. The store is meant to be written by a
+    single process.
+    """
+
+    def __init__(self, directory: str, name: str, max_entries: int):
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, f"{name}.f32")
+        self.max_entries = max(1, max_entries)
+
+        self._conn = sqlite3.connect(os.path.join(directory, f"{name}.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS rows (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_rows_accessed ON rows(accessed_at)")
+
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dimension'").fetchone()
+        self.dimension: Optional[int] = row[0] if row else None
+        self.count = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        self._vectors: Optional[np.memmap] = None
+        if self.dimension is not None and os.path.exists(self.data_path):
+            self._map()
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def _map(self) -> None:
+        rows = os.path.getsize(self.data_path) // (4 * self.dimension)
+        self._vectors = np.memmap(self.data_path, dtype=np.float32, mode="r+", shape=(rows, self.dimension)) if rows else None
+
+    def _grow(self, rows: int) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.data_path, "ab") as f:
+            f.truncate(rows * 4 * self.dimension)
+        self._map()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if self._vectors is None or not keys:
+            return {}
+        found = {}
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            placeholders = ",".join("?" * len(part))
+            for key, slot in self._conn.execute(f"SELECT key, slot FROM rows WHERE key IN ({placeholders})", part):
+                if slot < self.capacity:
+                    found[key] = np.array(self._vectors[slot])
+        if found:
+            now = time.time()
+            self._conn.executemany("UPDATE rows SET accessed_at = ? WHERE key = ?", [(now, key) for key in found])
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        if self.dimension is None:
+            self.dimension = int(next(iter(items.values())).shape[0])
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dimension', ?)", (self.dimension,))
+            if os.path.exists(self.data_path):
+                os.remove(self.data_path)
+
+        now = time.time()
+        self._conn.execute("BEGIN")
+        try:
+            for key, vector in items.items():
+                if vector.shape[0] != self.dimension:
+                    continue
+                row = self._conn.execute("SELECT slot FROM rows WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    slot = row[0]
+                elif self.count < self.max_entries:
+                    slot = self.count
+                    self.count += 1
+                else:
+                    # Full: reuse the least recently used row
+                    evicted_key, slot = self._conn.execute(
+                        "SELECT key, slot FROM rows ORDER BY accessed_at LIMIT 1"
+                    ).fetchone()
+                    self._conn.execute("DELETE FROM rows WHERE key = ?", (evicted_key,))
+
+                if slot >= self.capacity:
+                    self._grow(min(self.max_entries, max(slot + 1, self.capacity + _GROWTH_ROWS)))
+                # Vector first, then the index row pointing at it
+                self._vectors[slot] = vector
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rows (key, slot, accessed_at) VALUES (?, ?, ?)", (key, slot, now)
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def flush(self) -> None:
+        if self._vectors is not None:
+            self._vectors.flush()
+
+
+class EmbeddingCache:
+    """
+    Two-level cache of text embeddings for one model.
+
+    Lookups go to a bounded in-process LRU first, then to the memory-mapped
+    on-disk store, and only texts missing from both are encoded. Keys are a
+    hash of the model name and the text, so a model change never returns
+    stale vectors.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        directory: Optional[str] = None,
+        memory_entries: int = 4096,
+        disk_entries: int = 200000
+    ):
+        self.model_name = model_name
+        self.memory_entries = max(1, memory_entries)
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._disk: Optional[_DiskVectors] = None
+        if directory and disk_entries > 0:
+            try:
+                self._disk = _DiskVectors(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name), disk_entries)
+            except Exception as e:
+                logger.warning(f"On-disk embedding cache unavailable, using memory only: {e}")
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def encode(self, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Embeddings of ``texts`` as a float32 array, calling ``encoder`` once
+        for the texts that are not cached.
+        """
+        keys = [embedding_key(text, self.model_name) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    found[key] = self._memory[key]
+                    self._memory.move_to_end(key)
+            self.memory_hits += sum(1 for key in keys if key in found)
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+
+            if missing and self._disk is not None:
+                try:
+                    from_disk = self._disk.get_many(missing)
+                except Exception as e:
+                    logger.warning(f"Embedding cache read failed: {e}")
+                    from_disk = {}
+                for key, vector in from_disk.items():
+                    found[key] = vector
+                    self._remember(key, vector)
+                self.disk_hits += sum(1 for key in keys if key in from_disk)
+                missing = [key for key in missing if key not in from_disk]
+
+        if missing:
+            missing_set = set(missing)
+            texts_to_encode = list(dict.fromkeys(text for text, key in zip(texts, keys) if key in missing_set))
+            encoded = np.asarray(encoder(texts_to_encode), dtype=np.float32)
+            new = {embedding_key(text, self.model_name): vector for text, vector in zip(texts_to_encode, encoded)}
+            with self._lock:
+                self.misses += sum(1 for key in keys if key in missing_set)
+                for key, vector in new.items():
+                    found[key] = vector
+                    self._remember(key, vector)
+                if self._disk is not None:
+                    try:
+                        self._disk.put_many(new)
+                    except Exception as e:
+                        logger.warning(f"Embedding cache write failed: {e}")
+
+        return np.stack([found[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._disk is not None:
+                self._disk.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_entries": len(self._memory),
+            "max_memory_entries": self.memory_entries,
+            "disk_entries": self._disk.count if self._disk is not None else 0,
+            "max_disk_entries": self._disk.max_entries if self._disk is not None else 0,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str) -> Optional[EmbeddingCache]:
+    """Shared embedding cache for a model, or None when caching is disabled"""
+    if not config.EMBEDDING_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = EmbeddingCache(
+                model_name,
+                directory=os.path.join(config.CACHE_DIR, "embeddings"),
+                memory_entries=config.EMBEDDING_CACHE_MEMORY_ENTRIES,
+                disk_entries=config.EMBEDDING_CACHE_DISK_ENTRIES,
+            )
+        return _caches[model_name]
+
+
+def embedding_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit-rate metrics of every embedding cache in use, by model"""
+    with _caches_lock:
+        return {name: cache.stats() for name, cache in _caches.items()}
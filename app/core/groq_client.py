@@ -0,0 +1,312 @@
+from groq import Groq, AsyncGroq, DefaultHttpxClient, DefaultAsyncHttpxClient
+from groq import APIConnectionError, InternalServerError, RateLimitError
+from contextlib import contextmanager, asynccontextmanager
+from typing import Optional
+import asyncio
+import collections
+import threading
+import logging
+import random
+import time
+import httpx
+
+from app.core import config
+from app.core.rate_limiter import RateLimiter, get_rate_limiter, parse_reset_duration
+from app.core.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class _AsyncWaiter:
+    """An async caller parked until the governor hands it a slot"""
+
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class ConcurrencyGovernor:
+    """
+    Process-wide limit on in-flight LLM calls.
+
+    The same slot count is shared by blocking callers (worker threads) and
+    coroutines, so sync and async code paths can never exceed the limit together.
+    Async callers wait on a future instead of occupying a thread.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._async_waiters = collections.deque()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._async_waiters)
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._in_flight < self.limit and not self._async_waiters:
+                self._in_flight += 1
+                return
+            waiter = _AsyncWaiter(loop)
+            self._async_waiters.append(waiter)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._cond:
+                if not waiter.granted:
+                    self._async_waiters.remove(waiter)
+                    raise
+            # The slot was handed over just before we were cancelled; give it back
+            self.release()
+            raise
+
+    def release(self) -> None:
+        with self._cond:
+            while self._async_waiters:
+                waiter = self._async_waiters.popleft()
+                try:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                except RuntimeError:
+                    # Event loop already closed, try the next waiter
+                    continue
+                # Hand the slot straight to the waiter, in_flight is unchanged
+                waiter.granted = True
+                return
+            self._in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+governor = ConcurrencyGovernor(config.LLM_MAX_CONCURRENCY)
+
+_client: Optional[Groq] = None
+_async_client: Optional[AsyncGroq] = None
+_client_lock = threading.Lock()
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.LLM_KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def get_client() -> Groq:
+    """Shared blocking Groq client backed by one keep-alive connection pool"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Groq(
+                    api_key=config.GROQ_API_KEY,
+                    timeout=config.LLM_REQUEST_TIMEOUT_SECONDS,
+                    # Retries are handled below so 429s go through the rate limiter
+                    max_retries=0,
+                    http_client=DefaultHttpxClient(limits=_http_limits()),
+                )
+    return _client
+
+
+def get_async_client() -> AsyncGroq:
+    """Shared async Groq client backed by one keep-alive connection pool"""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncGroq(
+                    api_key=config.GROQ_API_KEY,
+                    timeout=config.LLM_REQUEST_TIMEOUT_SECONDS,
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+                )
+    return _async_client
+
+
+def estimate_request_tokens(kwargs: dict) -> int:
+    """Estimate prompt plus completion tokens of a chat completion request"""
+    prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in kwargs.get("messages", []))
+    completion_tokens = min(kwargs.get("max_tokens") or config.LLM_EXPECTED_COMPLETION_TOKENS, config.LLM_EXPECTED_COMPLETION_TOKENS)
+    return prompt_tokens + completion_tokens
+
+
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    headers = error.response.headers if error.response is not None else {}
+    return parse_reset_duration(headers.get("retry-after")) or parse_reset_duration(headers.get("x-ratelimit-reset-tokens"))
+
+
+def _transient_backoff(attempt: int) -> float:
+    return min(config.LLM_MAX_BACKOFF_SECONDS, 2.0 ** attempt) * (0.5 + random.random() / 2)
+
+
+def _after_response(limiter: RateLimiter, raw, reserved_tokens: int):
+    limiter.update_from_headers(raw.headers)
+    limiter.on_success()
+    response = raw.parse()
+    usage = getattr(response, "usage", None)
+    limiter.record_usage(reserved_tokens, getattr(usage, "total_tokens", None))
+    return response
+
+
+async def _after_response_async(limiter: RateLimiter, raw, reserved_tokens: int):
+    limiter.update_from_headers(raw.headers)
+    limiter.on_success()
+    response = await raw.parse()
+    usage = getattr(response, "usage", None)
+    limiter.record_usage(reserved_tokens, getattr(usage, "total_tokens", None))
+    return response
+
+
+def create_chat_completion(**kwargs):
+    """
+    Blocking chat completion.
+    
+    Waits for the model's rate limiter and a process-wide concurrency slot.
+    429s and transient API errors are re-queued with backoff instead of being
+    returned to the caller.
+    """
+    limiter = get_rate_limiter(kwargs.get("model", ""))
+    reserved_tokens = estimate_request_tokens(kwargs)
+    rate_limited, transient = 0, 0
+    while True:
+        limiter.acquire(reserved_tokens, reserved=bool(rate_limited or transient))
+        try:
+            with governor.slot():
+                raw = get_client().chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            rate_limited += 1
+            if rate_limited > config.LLM_RATE_LIMIT_RETRIES:
+                raise
+            delay = limiter.on_rate_limited(_retry_after(e))
+            logger.warning(f"Groq rate limit hit, re-queuing call in {delay:.1f}s")
+            continue
+        except (APIConnectionError, InternalServerError):
+            transient += 1
+            if transient > config.LLM_TRANSIENT_ERROR_RETRIES:
+                raise
+            time.sleep(_transient_backoff(transient))
+            continue
+        return _after_response(limiter, raw, reserved_tokens)
+
+
+async def create_chat_completion_async(**kwargs):
+    """
+    Native async chat completion.
+    
+    Same queuing behaviour as create_chat_completion, without holding a thread.
+    """
+    limiter = get_rate_limiter(kwargs.get("model", ""))
+    reserved_tokens = estimate_request_tokens(kwargs)
+    rate_limited, transient = 0, 0
+    while True:
+        await limiter.acquire_async(reserved_tokens, reserved=bool(rate_limited or transient))
+        try:
+            async with governor.slot_async():
+                raw = await get_async_client().chat.completions.with_raw_response.create(**kwargs)
+        except RateLimitError as e:
+            rate_limited += 1
+            if rate_limited > config.LLM_RATE_LIMIT_RETRIES:
+                raise
+            delay = limiter.on_rate_limited(_retry_after(e))
+            logger.warning(f"Groq rate limit hit, re-queuing call in {delay:.1f}s")
+            continue
+        except (APIConnectionError, InternalServerError):
+            transient += 1
+            if transient > config.LLM_TRANSIENT_ERROR_RETRIES:
+                raise
+            await asyncio.sleep(_transient_backoff(transient))
+            continue
+        return await _after_response_async(limiter, raw, reserved_tokens)
+
+
+async def stream_chat_completion_async(**kwargs):
+    """
+    Streaming chat completion, yielding completion chunks as they arrive.
+    
+    Rate limiting and retries apply until the stream is opened; the
+    concurrency slot is held until the stream is exhausted or closed.
+    """
+    kwargs = dict(kwargs, stream=True)
+    limiter = get_rate_limiter(kwargs.get("model", ""))
+    reserved_tokens = estimate_request_tokens(kwargs)
+    rate_limited, transient = 0, 0
+    while True:
+        await limiter.acquire_async(reserved_tokens, reserved=bool(rate_limited or transient))
+        await governor.acquire_async()
+        try:
+            try:
+                raw = await get_async_client().chat.completions.with_raw_response.create(**kwargs)
+            except RateLimitError as e:
+                rate_limited += 1
+                if rate_limited > config.LLM_RATE_LIMIT_RETRIES:
+                    raise
+                delay = limiter.on_rate_limited(_retry_after(e))
+                logger.warning(f"Groq rate limit hit, re-queuing call in {delay:.1f}s")
+                continue
+            except (APIConnectionError, InternalServerError):
+                transient += 1
+                if transient > config.LLM_TRANSIENT_ERROR_RETRIES:
+                    raise
+            else:
+                limiter.update_from_headers(raw.headers)
+                limiter.on_success()
+                stream = await raw.parse()
+                try:
+                    async for chunk in stream:
+                        yield chunk
+                finally:
+                    await stream.close()
+                return
+        finally:
+            governor.release()
+        # Back off from a transient error without holding the slot
+        await asyncio.sleep(_transient_backoff(transient))
+
+
+async def aclose_clients() -> None:
+    """Close the shared connection pools (called on application shutdown)"""
+    global _client, _async_client
+    with _client_lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+    if async_client is not None:
+        await async_client.close()
+    if client is not None:
+        client.close()
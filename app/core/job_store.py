@@ -0,0 +1,161 @@
+from typing import Any, Dict, List, Optional, Set
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+UNFINISHED_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class JobStore:
+    """
+    Persistent state of asynchronous analysis jobs, in a SQLite file.
+
+    One row per job (inputs, status, counts) and one row per processed
+    invoice with its result, written as soon as the result is stored in the
+    vector store. After a restart, unfinished jobs are picked up again and
+    only the invoices without a result are processed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                employee_name TEXT,
+                policy_text TEXT NOT NULL,
+                zip_path TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                processed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, file_path)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_job_results_seq ON job_results(job_id, seq)")
+
+    def create(self, policy_text: str, zip_path: str, total: int, employee_name: Optional[str] = None, job_id: Optional[str] = None) -> str:
+        """Register a queued job and return its id"""
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, employee_name, policy_text, zip_path, total, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JOB_QUEUED, employee_name, policy_text, zip_path, total, time.time()),
+            )
+        return job_id
+
+    def mark_running(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (JOB_RUNNING, time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, error: Optional[str] = None) -> None:
+        """Mark a job completed, or failed with an error message"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (JOB_FAILED if error else JOB_COMPLETED, error, time.time(), job_id),
+            )
+
+    def record_results(self, job_id: str, results: List[Dict[str, Any]]) -> None:
+        """Save processed invoices' results and advance the job's counters"""
+        if not results:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                seq = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), -1) + 1 FROM job_results WHERE job_id = ?", (job_id,)
+                ).fetchone()[0]
+                added = failed = 0
+                for result in results:
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO job_results (job_id, file_path, seq, status, result) VALUES (?, ?, ?, ?, ?)",
+                        (job_id, result["file_path"], seq, result.get("status", "error"), json.dumps(result)),
+                    )
+                    if cursor.rowcount:
+                        seq += 1
+                        added += 1
+                        failed += result.get("status") == "error"
+                self._conn.execute(
+                    "UPDATE jobs SET processed = processed + ?, failed = failed + ? WHERE id = ?",
+                    (added, failed, job_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def processed_files(self, job_id: str) -> Set[str]:
+        """File paths of the invoices of a job that already have a result"""
+        with self._lock:
+            rows = self._conn.execute("SELECT file_path FROM job_results WHERE job_id = ?", (job_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def get(self, job_id: str, include_policy: bool = False) -> Optional[Dict[str, Any]]:
+        """A job's state, or None for an unknown id"""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip([column[0] for column in cursor.description], row))
+        if not include_policy:
+            job.pop("policy_text")
+        return job
+
+    def results(self, job_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Results of a job in the order they were recorded"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM job_results WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (job_id, offset, -1 if limit is None else limit),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def status_counts(self, job_id: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM job_results WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def unfinished(self) -> List[str]:
+        """Ids of queued and interrupted jobs, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({', '.join('?' * len(UNFINISHED_STATUSES))}) ORDER BY created_at",
+                UNFINISHED_STATUSES,
+            ).fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,158 @@
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import math
+import re
+import threading
+import numpy as np
+
+# Words, numbers and joined identifiers such as "employee_3_travel_bill" or "INV-2024-001"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[_\-./][a-z0-9]+)*")
+_PART_RE = re.compile(r"[_\-./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased tokens; joined identifiers are indexed whole and by their parts"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 index over the stored documents.
+
+    Postings are append-only typed arrays (document numbers and term
+    frequencies) per term, so memory stays compact and scoring is a few
+    vectorised numpy operations per query term. Replaced and deleted
+    documents are tombstoned and dropped by an occasional compaction.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.ready = False
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._doc_ids: List[str] = []          # document number -> document id
+            self._numbers: Dict[str, int] = {}     # document id -> live document number
+            self._lengths = array("I")
+            self._alive = bytearray()
+            self._postings: Dict[str, Tuple[array, array]] = {}
+            self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def _add(self, document_id: str, text: str) -> None:
+        self._remove(document_id)
+        frequencies = Counter(tokenize(text))
+        number = len(self._doc_ids)
+        self._doc_ids.append(document_id)
+        self._numbers[document_id] = number
+        length = sum(frequencies.values())
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._total_length += length
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("H"))
+            postings[0].append(number)
+            postings[1].append(min(frequency, 65535))
+
+    def _remove(self, document_id: str) -> None:
+        number = self._numbers.pop(document_id, None)
+        if number is not None:
+            self._alive[number] = 0
+            self._total_length -= self._lengths[number]
+
+    def add_many(self, documents: Iterable[Tuple[str, str]]) -> None:
+        """Index (or re-index) documents given as (id, text) pairs"""
+        with self._lock:
+            for document_id, text in documents:
+                self._add(document_id, text)
+            self._maybe_compact()
+
+    def remove_many(self, document_ids: Iterable[str]) -> None:
+        with self._lock:
+            for document_id in document_ids:
+                self._remove(document_id)
+            self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        dead = len(self._doc_ids) - len(self._numbers)
+        if dead < 1000 or dead < len(self._numbers):
+            return
+        # Renumber live documents and drop tombstoned postings
+        old_alive = np.frombuffer(bytes(self._alive), dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(old_alive) - 1
+        self._doc_ids = [doc_id for doc_id, alive in zip(self._doc_ids, old_alive) if alive]
+        self._numbers = {doc_id: i for i, doc_id in enumerate(self._doc_ids)}
+        self._lengths = array("I", (length for length, alive in zip(self._lengths, old_alive) if alive))
+        self._alive = bytearray(b"\x01" * len(self._doc_ids))
+        postings = {}
+        for term, (numbers, frequencies) in self._postings.items():
+            numbers_np = np.frombuffer(numbers, dtype=np.uint32)
+            keep = old_alive[numbers_np]
+            if keep.any():
+                postings[term] = (
+                    array("I", renumber[numbers_np[keep]].astype(np.uint32).tobytes()),
+                    array("H", np.frombuffer(frequencies, dtype=np.uint16)[keep].tobytes()),
+                )
+        self._postings = postings
+
+    def search(self, query: str, k: int = 20, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Top-k documents for a query by BM25.
+
+        Returns:
+            List of (document id, score), best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            live = len(self._numbers)
+            if not terms or not live:
+                return []
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            average_length = max(self._total_length / live, 1.0)
+            norms = self.k1 * (1 - self.b + self.b * lengths / average_length)
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                numbers = np.frombuffer(postings[0], dtype=np.uint32)
+                frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+                live_postings = alive[numbers]
+                numbers, frequencies = numbers[live_postings], frequencies[live_postings]
+                if not len(numbers):
+                    continue
+                idf = math.log(1 + (live - len(numbers) + 0.5) / (len(numbers) + 0.5))
+                scores[numbers] += idf * frequencies * (self.k1 + 1) / (frequencies + norms[numbers])
+
+            candidates = np.flatnonzero(scores > 0)
+            if allowed is not None:
+                candidates = np.array([n for n in candidates if self._doc_ids[n] in allowed], dtype=np.int64)
+            if not len(candidates):
+                return []
+            top = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+            return [(self._doc_ids[n], float(scores[n])) for n in top]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, document_id in enumerate(ranking, 1):
+            scores[document_id] = scores.get(document_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -1,32 +1,95 @@
-from groq import Groq
 import re
-import logging
+import os
+import json
 import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional
 
-# Initialize Groq client
-client = Groq(api_key="your_API_KEY")
+from app.core import config
+from app.core.cache import SQLiteCache, content_hash
+from app.core.groq_client import create_chat_completion, create_chat_completion_async
+from app.core.tokens import estimate_tokens
 
-def analyze_invoice_with_policy(invoice_text: str, policy_text: str) -> tuple[str, str]:
+# Bump whenever the analysis prompt or response parsing changes, so cached
+# verdicts produced by the old prompt are no longer served.
+ANALYSIS_PROMPT_VERSION = "1"
+PACKED_PROMPT_VERSION = "packed-1"
+TRIAGE_PROMPT_VERSION = "triage-1"
+
+# Which stage produced a verdict
+TIER_NONE = "none"
+TIER_SMALL = "small"
+TIER_LARGE = "large"
+
+_verdict_cache: Optional[SQLiteCache] = None
+_verdict_cache_lock = threading.Lock()
+
+
+def get_verdict_cache() -> Optional[SQLiteCache]:
     """
-    Analyze an invoice against HR policy using Groq API.
-    
-    Args:
-        invoice_text: Text content of the invoice
-        policy_text: Text content of the HR policy
+    Return the shared verdict cache, opening its file under CACHE_DIR on
+    first use; None when VERDICT_CACHE_ENABLED is off.
+    """
+    global _verdict_cache
+    if not config.VERDICT_CACHE_ENABLED:
+        return None
+    if _verdict_cache is None:
+        with _verdict_cache_lock:
+            if _verdict_cache is None:
+                _verdict_cache = SQLiteCache(
+                    os.path.join(config.CACHE_DIR, "verdicts.sqlite3"),
+                    max_entries=config.VERDICT_CACHE_MAX_ENTRIES,
+                    ttl_seconds=config.VERDICT_CACHE_TTL_SECONDS,
+                )
+    return _verdict_cache
+
+
+def verdict_cache_key(invoice_text: str, policy_text: str, model: str, prompt_version: str = ANALYSIS_PROMPT_VERSION) -> str:
+    """
+    Content-addressed cache key for a verdict: policy hash, invoice hash,
+    model name and prompt version.
+    """
+    return content_hash(
+        f"{model}|{prompt_version}|{content_hash(policy_text)}|{content_hash(invoice_text)}"
+    )
+
+
+def _cached_verdict(key: str) -> Optional[tuple[str, str]]:
+    verdict_cache = get_verdict_cache()
+    if verdict_cache is None:
+        return None
+    cached = verdict_cache.get(key)
+    if cached:
+        return cached["status"], cached["reason"]
+    return None
+
+
+def _remember_verdict(key: str, verdict: tuple[str, str]) -> None:
+    verdict_cache = get_verdict_cache()
+    if verdict_cache is not None:
+        verdict_cache.set(key, {"status": verdict[0], "reason": verdict[1]})
+
+
+def validate_analysis_inputs(invoice_text: str, policy_text: str) -> Optional[tuple[str, str]]:
+    """
+    Check the inputs before spending an LLM call on them.
     
     Returns:
-        tuple: (status, reason) where status is one of:
-               "Fully Reimbursed", "Partially Reimbursed", "Declined"
+        tuple: (status, reason) verdict when the inputs are unusable, otherwise None
     """
-    
-    # Validate inputs
     if not invoice_text or not invoice_text.strip():
         return "Declined", "Invoice text is empty or unreadable"
     
     if not policy_text or not policy_text.strip():
         return "Declined", "HR policy is empty or unreadable"
+    
+    return None
+
 
-    prompt = f"""
+def build_analysis_prompt(invoice_text: str, policy_text: str) -> str:
+    """Build the single-invoice analysis prompt"""
+    return f"""
 You are an AI assistant responsible for analyzing employee invoices based on a company's HR reimbursement policy.
 
 ## HR Policy:
@@ -49,37 +112,113 @@ Choose one of these three statuses:
 Provide a clear, specific reason for your decision.
 """
 
+
+def _analysis_request(prompt: str) -> dict:
+    """Keyword arguments for the analysis chat completion"""
+    return {
+        "model": config.ANALYSIS_MODEL,  # e.g. "llama3-70b-8192", "mixtral-8x7b-32768" or "llama3-8b-8192"
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt,
+            }
+        ],
+        "temperature": 0.3,
+        "max_tokens": 1024,
+    }
+
+
+def interpret_analysis_response(content: str) -> tuple[str, str]:
+    """
+    Turn raw completion text into a validated (status, reason) verdict.
+    """
+    # Parse the response more robustly
+    status, reason = parse_llm_response(content)
+    
+    # Validate the status
+    valid_statuses = ["Fully Reimbursed", "Partially Reimbursed", "Declined"]
+    if status not in valid_statuses:
+        logging.warning(f"Invalid status returned: {status}. Defaulting to Declined.")
+        status = "Declined"
+        reason = f"Invalid response format. Original reason: {reason}"
+    
+    return status, reason
+
+
+def analyze_invoice_with_policy(invoice_text: str, policy_text: str) -> tuple[str, str]:
+    """
+    Analyze an invoice against HR policy using Groq API.
+    
+    Verdicts are cached on disk by policy/invoice content, model and prompt
+    version, so re-analysing the same invoice against the same policy does not
+    call the API again. Failed calls are never cached.
+    
+    Args:
+        invoice_text: Text content of the invoice
+        policy_text: Text content of the HR policy
+    
+    Returns:
+        tuple: (status, reason) where status is one of:
+               "Fully Reimbursed", "Partially Reimbursed", "Declined",
+               or "error" if the API call failed after all retries
+    """
+    invalid = validate_analysis_inputs(invoice_text, policy_text)
+    if invalid:
+        return invalid
+
+    cache_key = verdict_cache_key(invoice_text, policy_text, config.ANALYSIS_MODEL)
+    cached = _cached_verdict(cache_key)
+    if cached:
+        return cached
+
+    prompt = build_analysis_prompt(invoice_text, policy_text)
+
     try:
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",  # You can also use "mixtral-8x7b-32768" or "llama3-8b-8192"
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            temperature=0.3,
-            max_tokens=1024
-        )
+        response = create_chat_completion(**_analysis_request(prompt))
         
         # Extract content from response
         content = response.choices[0].message.content
+        verdict = interpret_analysis_response(content)
+        _remember_verdict(cache_key, verdict)
+        return verdict
         
-        # Parse the response more robustly
-        status, reason = parse_llm_response(content)
-        
-        # Validate the status
-        valid_statuses = ["Fully Reimbursed", "Partially Reimbursed", "Declined"]
-        if status not in valid_statuses:
-            logging.warning(f"Invalid status returned: {status}. Defaulting to Declined.")
-            status = "Declined"
-            reason = f"Invalid response format. Original reason: {reason}"
+    except Exception as e:
+        logging.error(f"Error calling Groq API: {e}")
+        # Not a verdict: report it as a processing error so it is never cached or mistaken for a decline
+        return "error", f"AI analysis failed - {str(e)}"
+
+
+async def analyze_invoice_with_policy_async(invoice_text: str, policy_text: str) -> tuple[str, str]:
+    """
+    Native async version of analyze_invoice_with_policy.
+    
+    Uses the shared AsyncGroq client, so no worker thread is held while the
+    request is in flight. In-flight calls are capped process-wide by
+    LLM_MAX_CONCURRENCY.
+    """
+    invalid = validate_analysis_inputs(invoice_text, policy_text)
+    if invalid:
+        return invalid
+
+    cache_key = verdict_cache_key(invoice_text, policy_text, config.ANALYSIS_MODEL)
+    cached = _cached_verdict(cache_key)
+    if cached:
+        return cached
+
+    prompt = build_analysis_prompt(invoice_text, policy_text)
+
+    try:
+        response = await create_chat_completion_async(**_analysis_request(prompt))
         
-        return status, reason
+        content = response.choices[0].message.content
+        verdict = interpret_analysis_response(content)
+        _remember_verdict(cache_key, verdict)
+        return verdict
         
     except Exception as e:
         logging.error(f"Error calling Groq API: {e}")
-        return "Declined", f"Error: AI analysis failed - {str(e)}"
+        # Not a verdict: report it as a processing error so it is never cached or mistaken for a decline
+        return "error", f"AI analysis failed - {str(e)}"
 
 
 def parse_llm_response(content: str) -> tuple[str, str]:
@@ -162,46 +301,324 @@ def normalize_status(status: str) -> str:
             return "Declined"
 
 
-# Async version using Groq
-async def analyze_invoice_with_policy_async(invoice_text: str, policy_text: str) -> tuple[str, str]:
+# --- Model cascade: cheap first pass, escalate only when needed ---
+
+def build_triage_prompt(invoice_text: str, policy_text: str) -> str:
+    """Analysis prompt for the small model, which must also rate its confidence"""
+    return build_analysis_prompt(invoice_text, policy_text).rstrip() + """
+Also rate how confident you are that your status is correct, from 0.0 (guessing) to 1.0 (certain),
+on a third line in exactly this format:
+Confidence: [0.0-1.0]
+"""
+
+
+def parse_triage_response(content: str) -> Optional[tuple[str, str, float]]:
     """
-    Async version of analyze_invoice_with_policy using Groq API.
-    Note: Groq Python SDK doesn't have native async support, so we use asyncio.to_thread
+    Parse a first-pass answer into (status, reason, confidence).
+    
+    Returns None when the status or the confidence cannot be read, so the
+    invoice is escalated rather than guessed.
     """
-    return await asyncio.to_thread(analyze_invoice_with_policy, invoice_text, policy_text)
+    status_match = re.search(r'Reimbursement Status:\s*(.+?)(?:\n|$)', content, re.IGNORECASE)
+    reason_match = re.search(r'Reason:\s*(.+?)(?:\n\s*Confidence:|$)', content, re.IGNORECASE | re.DOTALL)
+    confidence_match = re.search(r'Confidence:\s*\[?\s*([0-9]*\.?[0-9]+)\s*(%)?', content, re.IGNORECASE)
+    if not status_match or not reason_match or not confidence_match:
+        return None
+    
+    status = _strict_status(status_match.group(1))
+    reason = reason_match.group(1).strip()
+    confidence = float(confidence_match.group(1))
+    if confidence_match.group(2) or confidence > 1.0:
+        confidence /= 100.0
+    if not status or not reason:
+        return None
+    return status, reason, min(max(confidence, 0.0), 1.0)
+
+
+def needs_escalation(triage: Optional[tuple[str, str, float]]) -> bool:
+    """Low-confidence, partial or unparseable first-pass results go to the large model"""
+    if triage is None:
+        return True
+    status, _, confidence = triage
+    return status == "Partially Reimbursed" or confidence < config.CASCADE_CONFIDENCE_THRESHOLD
 
 
-# # Alternative async implementation with proper async handling
-# async def analyze_invoice_with_policy_async_native(invoice_text: str, policy_text: str) -> tuple[str, str]:
-#     """
-#     Native async version - you might want to use an async HTTP client for better performance
-#     """
-#     # Validate inputs
-#     if not invoice_text or not invoice_text.strip():
-#         return "Declined", "Invoice text is empty or unreadable"
+def _triage_request(prompt: str) -> dict:
+    request = _analysis_request(prompt)
+    request["model"] = config.CASCADE_SMALL_MODEL
+    request["temperature"] = 0.0
+    request["max_tokens"] = 512
+    return request
+
+
+def _cached_triage(key: str) -> Optional[tuple[str, str, float]]:
+    verdict_cache = get_verdict_cache()
+    if verdict_cache is None:
+        return None
+    cached = verdict_cache.get(key)
+    if cached:
+        return cached["status"], cached["reason"], cached["confidence"]
+    return None
+
+
+def _remember_triage(key: str, triage: tuple[str, str, float]) -> None:
+    verdict_cache = get_verdict_cache()
+    if verdict_cache is not None:
+        verdict_cache.set(key, {"status": triage[0], "reason": triage[1], "confidence": triage[2]})
+
+
+def _triage_key(invoice_text: str, policy_text: str) -> str:
+    return verdict_cache_key(invoice_text, policy_text, config.CASCADE_SMALL_MODEL, TRIAGE_PROMPT_VERSION)
+
+
+def triage_invoice(invoice_text: str, policy_text: str) -> Optional[tuple[str, str, float]]:
+    """First pass on the small model; None if it failed or could not be parsed"""
+    key = _triage_key(invoice_text, policy_text)
+    cached = _cached_triage(key)
+    if cached:
+        return cached
+    try:
+        response = create_chat_completion(**_triage_request(build_triage_prompt(invoice_text, policy_text)))
+        triage = parse_triage_response(response.choices[0].message.content)
+    except Exception as e:
+        logging.warning(f"Small-model pass failed, escalating: {e}")
+        return None
+    if triage:
+        _remember_triage(key, triage)
+    return triage
+
+
+async def triage_invoice_async(invoice_text: str, policy_text: str) -> Optional[tuple[str, str, float]]:
+    """Async version of triage_invoice"""
+    key = _triage_key(invoice_text, policy_text)
+    cached = _cached_triage(key)
+    if cached:
+        return cached
+    try:
+        response = await create_chat_completion_async(**_triage_request(build_triage_prompt(invoice_text, policy_text)))
+        triage = parse_triage_response(response.choices[0].message.content)
+    except Exception as e:
+        logging.warning(f"Small-model pass failed, escalating: {e}")
+        return None
+    if triage:
+        _remember_triage(key, triage)
+    return triage
+
+
+def analyze_invoice_tiered(invoice_text: str, policy_text: str, cascade: Optional[bool] = None) -> tuple[str, str, str]:
+    """
+    Analyze an invoice, optionally through the model cascade.
+    
+    With the cascade on (CASCADE_ENABLED, or ``cascade=True``) the small model
+    answers first with a confidence score; only low-confidence, "Partially
+    Reimbursed" or unparseable answers are escalated to the analysis model.
+    
+    Returns:
+        tuple: (status, reason, tier) where tier is "small" or "large"
+               ("none" when the inputs were rejected without a model call)
+    """
+    invalid = validate_analysis_inputs(invoice_text, policy_text)
+    if invalid:
+        return invalid + (TIER_NONE,)
+    
+    if config.CASCADE_ENABLED if cascade is None else cascade:
+        triage = triage_invoice(invoice_text, policy_text)
+        if not needs_escalation(triage):
+            return triage[0], triage[1], TIER_SMALL
+    
+    return analyze_invoice_with_policy(invoice_text, policy_text) + (TIER_LARGE,)
+
+
+async def analyze_invoice_tiered_async(invoice_text: str, policy_text: str, cascade: Optional[bool] = None) -> tuple[str, str, str]:
+    """Async version of analyze_invoice_tiered"""
+    invalid = validate_analysis_inputs(invoice_text, policy_text)
+    if invalid:
+        return invalid + (TIER_NONE,)
+    
+    if config.CASCADE_ENABLED if cascade is None else cascade:
+        triage = await triage_invoice_async(invoice_text, policy_text)
+        if not needs_escalation(triage):
+            return triage[0], triage[1], TIER_SMALL
+    
+    return await analyze_invoice_with_policy_async(invoice_text, policy_text) + (TIER_LARGE,)
+
+# --- Packed mode: several invoices per completion request ---
+
+_PACKED_PROMPT_OVERHEAD_TOKENS = 350
+_PACKED_INVOICE_OVERHEAD_TOKENS = 15
+
+
+def plan_invoice_packs(invoices: Dict[str, str], policy_tokens: int) -> List[List[str]]:
+    """
+    Group invoices into packs that fit in one prompt.
+    
+    Short invoices are packed greedily, in order, until the context budget
+    (policy + invoices + expected completion) or PACK_MAX_INVOICES is reached.
+    Long invoices always get a pack of their own.
+    
+    Args:
+        invoices: Mapping of invoice id to invoice text
+        policy_tokens: Estimated tokens of the policy context sent with each pack
+    
+    Returns:
+        List[List[str]]: Invoice ids per pack
+    """
+    available = config.PACK_CONTEXT_TOKENS - _PACKED_PROMPT_OVERHEAD_TOKENS - policy_tokens
+    packs, current, used = [], [], 0
+    
+    for invoice_id, text in invoices.items():
+        invoice_tokens = estimate_tokens(text)
+        if invoice_tokens > config.PACK_MAX_INVOICE_TOKENS:
+            packs.append([invoice_id])
+            continue
+        
+        cost = invoice_tokens + _PACKED_INVOICE_OVERHEAD_TOKENS + config.PACK_COMPLETION_TOKENS_PER_INVOICE
+        if current and (len(current) >= config.PACK_MAX_INVOICES or used + cost > available):
+            packs.append(current)
+            current, used = [], 0
+        current.append(invoice_id)
+        used += cost
     
-#     if not policy_text or not policy_text.strip():
-#         return "Declined", "HR policy is empty or unreadable"
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_packed_prompt(invoices: Dict[str, str], policy_text: str) -> str:
+    """Build a prompt asking for one JSON verdict per invoice"""
+    invoice_blocks = "\n\n".join(
+        f"### Invoice {invoice_id}\n{text.strip()}" for invoice_id, text in invoices.items()
+    )
+    return f"""
+You are an AI assistant responsible for analyzing employee invoices based on a company's HR reimbursement policy.
+
+## HR Policy:
+{policy_text}
+
+## Employee Invoices:
+{invoice_blocks}
+
+Analyze EACH invoice separately against the HR policy and determine its reimbursement status.
+
+Choose one of these three statuses for every invoice:
+- Fully Reimbursed: If the invoice meets all policy requirements
+- Partially Reimbursed: If some items are covered but others are not
+- Declined: If the invoice doesn't meet policy requirements
+
+Respond with ONLY a JSON array containing exactly one object per invoice, no other text:
+[{{"invoice_id": "<invoice id>", "status": "<Fully Reimbursed|Partially Reimbursed|Declined>", "reason": "<clear, specific reason>"}}]
+"""
+
+
+def _strict_status(raw_status: str) -> Optional[str]:
+    """Map a packed-mode status to a valid status, or None if it is not recognisable"""
+    status = raw_status.strip().lower()
+    if "partial" in status:
+        return "Partially Reimbursed"
+    if "full" in status:
+        return "Fully Reimbursed"
+    if "declin" in status or "reject" in status or "denied" in status:
+        return "Declined"
+    return None
 
-#     # For now, we'll use the sync version wrapped in to_thread
-#     # In production, consider using aiohttp or httpx for true async HTTP calls
-#     return await asyncio.to_thread(analyze_invoice_with_policy, invoice_text, policy_text)
 
+def _find_json_array(content: str) -> Optional[list]:
+    """First JSON array of objects in the text, decoded from each "[" in turn so brackets in prose are skipped"""
+    decoder = json.JSONDecoder()
+    start = content.find("[")
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(content, start)
+        except ValueError:
+            value = None
+        if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            return value
+        start = content.find("[", start + 1)
+    return None
 
-# # Example usage
-# if __name__ == "__main__":
-#     # Test the function
-#     sample_invoice = "Hotel stay at Marriott NYC - $250/night for 2 nights, Business conference"
-#     sample_policy = "Hotel expenses are reimbursed up to $200/night for business travel"
+
+def parse_packed_response(content: str, expected_ids: List[str]) -> Dict[str, tuple[str, str]]:
+    """
+    Parse the JSON array returned for a pack.
     
-#     status, reason = analyze_invoice_with_policy(sample_invoice, sample_policy)
-#     print(f"Status: {status}")
-#     print(f"Reason: {reason}")
+    Only well-formed answers for expected invoice ids are returned; anything
+    missing or malformed is left out so the caller can retry it on its own.
+    """
+    verdicts = {}
+    items = _find_json_array(content or "")
+    if items is None:
+        logging.warning("Could not parse packed response: no JSON array of objects found")
+        return verdicts
+    
+    expected = set(expected_ids)
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        invoice_id = str(item.get("invoice_id", "")).strip()
+        reason = item.get("reason")
+        status = _strict_status(str(item.get("status", "")))
+        if invoice_id in expected and invoice_id not in verdicts and status and isinstance(reason, str) and reason.strip():
+            verdicts[invoice_id] = (status, reason.strip())
+    return verdicts
+
+
+def _packed_request(prompt: str, n_invoices: int) -> dict:
+    request = _analysis_request(prompt)
+    request["max_tokens"] = config.PACK_COMPLETION_TOKENS_PER_INVOICE * n_invoices + 64
+    return request
+
+
+async def analyze_invoice_pack_async(invoices: Dict[str, str], policy_text: str) -> Dict[str, tuple[str, str]]:
+    """
+    Analyze several invoices against the same policy context in one request.
     
-#     # Test async version
-#     async def test_async():
-#         status, reason = await analyze_invoice_with_policy_async(sample_invoice, sample_policy)
-#         print(f"Async - Status: {status}")
-#         print(f"Async - Reason: {reason}")
+    Cached verdicts are served first. The remaining invoices are sent as one
+    packed prompt (or the normal single-invoice prompt when only one is
+    left). Invoices the model skipped or answered badly are retried
+    individually, so every invoice id gets a verdict.
     
-#     # asyncio.run(test_async())
\ No newline at end of file
+    Args:
+        invoices: Mapping of invoice id to invoice text
+        policy_text: Policy context shared by the pack
+    
+    Returns:
+        Dict[str, tuple]: (status, reason) per invoice id
+    """
+    verdicts, pending = {}, {}
+    for invoice_id, text in invoices.items():
+        invalid = validate_analysis_inputs(text, policy_text)
+        cached = None if invalid else _cached_verdict(
+            verdict_cache_key(text, policy_text, config.ANALYSIS_MODEL, PACKED_PROMPT_VERSION)
+        )
+        if invalid or cached:
+            verdicts[invoice_id] = invalid or cached
+        else:
+            pending[invoice_id] = text
+    
+    if len(pending) > 1:
+        # Short ids keep the prompt small and avoid echoing odd file paths
+        aliases = {f"INV-{i}": invoice_id for i, invoice_id in enumerate(pending, 1)}
+        prompt = build_packed_prompt({alias: pending[invoice_id] for alias, invoice_id in aliases.items()}, policy_text)
+        try:
+            response = await create_chat_completion_async(**_packed_request(prompt, len(aliases)))
+            parsed = parse_packed_response(response.choices[0].message.content, list(aliases))
+        except Exception as e:
+            logging.error(f"Error calling Groq API for packed invoices: {e}")
+            parsed = {}
+        
+        for alias, verdict in parsed.items():
+            invoice_id = aliases[alias]
+            verdicts[invoice_id] = verdict
+            _remember_verdict(
+                verdict_cache_key(pending.pop(invoice_id), policy_text, config.ANALYSIS_MODEL, PACKED_PROMPT_VERSION),
+                verdict
+            )
+        if pending:
+            logging.info(f"Retrying {len(pending)} invoice(s) missing from packed response individually")
+    
+    retried = await asyncio.gather(*[
+        analyze_invoice_with_policy_async(text, policy_text) for text in pending.values()
+    ])
+    verdicts.update(zip(pending.keys(), retried))
+    return verdicts
+
@@ -1,7 +1,21 @@
 import zipfile
-import io
+import hashlib
+import os
+import shutil
+import tempfile
+import multiprocessing
+import threading
 import fitz  # PyMuPDF
-from typing import Dict, Union, BinaryIO
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union, BinaryIO
+
+from app.core import config
+from app.core.cache import SQLiteCache
+
+# Read size used when streaming ZIP members and uploads to temp files
+_COPY_BUFFER_BYTES = 1024 * 1024
 
 
 def extract_text_from_pdf(file_input: Union[str, BinaryIO]) -> str:
@@ -34,6 +48,23 @@ def extract_text_from_pdf(file_input: Union[str, BinaryIO]) -> str:
         raise Exception(f"Failed to extract text from PDF: {str(e)}")
 
 
+def pdf_bytes_to_text(pdf_bytes: bytes) -> str:
+    """
+    Extract text from the raw bytes of a PDF.
+    
+    Args:
+        pdf_bytes: PDF file content
+    
+    Returns:
+        str: Extracted text from all pages
+    """
+    pdf = fitz.open(stream=pdf_bytes, filetype="pdf")  # Open from bytes
+    try:
+        return "".join(page.get_text() for page in pdf)
+    finally:
+        pdf.close()  # Always close the PDF
+
+
 def extract_pdf_text_from_zipfile(pdf_file) -> str:
     """
     Extract text from a PDF file within a ZIP archive.
@@ -45,20 +76,176 @@ def extract_pdf_text_from_zipfile(pdf_file) -> str:
         str: Extracted text from all pages
     """
     try:
-        pdf_bytes = pdf_file.read()  # Read binary content
-        pdf = fitz.open(stream=pdf_bytes, filetype="pdf")  # Open from bytes
-        
-        text = ""
-        for page in pdf:
-            text += page.get_text()
-        
-        pdf.close()  # Always close the PDF
-        return text
+        return pdf_bytes_to_text(pdf_file.read())  # Read binary content
         
     except Exception as e:
         raise Exception(f"Failed to extract text from PDF in ZIP: {str(e)}")
 
 
+def _member_text(source: Union[bytes, str]) -> str:
+    """
+    Text for one ZIP member, with per-file problems reported in place of the text.
+    ``source`` is the member's bytes, or the path of a temp file it was spooled to.
+    """
+    try:
+        text = pdf_bytes_to_text(source) if isinstance(source, bytes) else extract_text_from_pdf(source)
+    except Exception as e:
+        return f"[Error reading PDF: Failed to extract text from PDF in ZIP: {str(e)}]"
+    # Still add empty files but with a note
+    return text if text.strip() else "[Empty or unreadable PDF]"
+
+
+def _extract_member_chunk(members: List[Tuple[str, Union[bytes, str]]]) -> List[Tuple[str, str]]:
+    """Process-pool task: extract the text of a chunk of ZIP members"""
+    return [(filename, _member_text(source)) for filename, source in members]
+
+
+def _list_pdf_members(z: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    pdf_files = [f for f in z.filelist if f.filename.lower().endswith(".pdf") and not f.filename.startswith('__MACOSX/')]
+    if not pdf_files:
+        raise Exception("No PDF files found in ZIP archive")
+    return pdf_files
+
+
+@contextmanager
+def _open_zip(zip_input: Union[str, BinaryIO]) -> Iterator[zipfile.ZipFile]:
+    """
+    Open a ZIP archive without loading it into memory.
+    
+    Paths and seekable file objects (such as the spooled UploadFile) are read
+    in place; only the central directory is parsed up front and members are
+    decompressed when opened. Non-seekable streams are first copied to a
+    temporary file.
+    """
+    spooled = None
+    try:
+        if isinstance(zip_input, str) or _seekable(zip_input):
+            z = zipfile.ZipFile(zip_input)
+        else:
+            spooled = tempfile.TemporaryFile()
+            shutil.copyfileobj(zip_input, spooled, _COPY_BUFFER_BYTES)
+            spooled.seek(0)
+            z = zipfile.ZipFile(spooled)
+    except BaseException:
+        if spooled is not None:
+            spooled.close()
+        raise
+    try:
+        yield z
+    finally:
+        z.close()
+        if spooled is not None:
+            spooled.close()
+
+
+def _seekable(f: BinaryIO) -> bool:
+    try:
+        return bool(f.seekable())
+    except (AttributeError, ValueError):
+        return False
+
+
+def _read_member(z: zipfile.ZipFile, file_info: zipfile.ZipInfo) -> Union[bytes, str]:
+    """
+    Read one ZIP member: small members as bytes, members above
+    ZIP_MEMBER_SPOOL_MB streamed to a temp file whose path is returned.
+    """
+    if file_info.file_size <= config.ZIP_MEMBER_SPOOL_MB * 1024 * 1024:
+        with z.open(file_info) as pdf_file:
+            return pdf_file.read()
+    
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as spool, z.open(file_info) as pdf_file:
+            shutil.copyfileobj(pdf_file, spool, _COPY_BUFFER_BYTES)
+    except BaseException:
+        _discard([path])
+        raise
+    return path
+
+
+def _discard(sources) -> None:
+    """Delete the temp files among spooled member sources"""
+    for source in sources:
+        if isinstance(source, str):
+            try:
+                os.unlink(source)
+            except OSError:
+                pass
+
+
+def _buffered_bytes(source: Union[bytes, str]) -> int:
+    return len(source) if isinstance(source, bytes) else 0
+
+
+# Extracted text of previously seen PDFs, keyed by a hash of the PDF bytes
+_pdf_text_cache: Optional[SQLiteCache] = None
+_pdf_text_cache_lock = threading.Lock()
+
+
+def get_pdf_text_cache() -> Optional[SQLiteCache]:
+    """
+    Return the shared PDF text cache, opening its file under CACHE_DIR on
+    first use; None when PDF_TEXT_CACHE_ENABLED is off.
+    """
+    global _pdf_text_cache
+    if not config.PDF_TEXT_CACHE_ENABLED:
+        return None
+    if _pdf_text_cache is None:
+        with _pdf_text_cache_lock:
+            if _pdf_text_cache is None:
+                _pdf_text_cache = SQLiteCache(
+                    os.path.join(config.CACHE_DIR, "pdf_text.sqlite3"),
+                    max_entries=config.PDF_TEXT_CACHE_MAX_ENTRIES,
+                    ttl_seconds=config.PDF_TEXT_CACHE_TTL_SECONDS,
+                )
+    return _pdf_text_cache
+
+
+@dataclass
+class ExtractionStats:
+    """How the text of one archive's PDFs was obtained"""
+    cache_hits: int = 0
+    cache_misses: int = 0
+    # Members whose bytes are identical to an earlier member of the same archive
+    duplicate_files: int = 0
+
+
+def _source_hash(source: Union[bytes, str]) -> str:
+    """SHA-256 of a member's bytes, read in blocks when it was spooled to disk"""
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(_COPY_BUFFER_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _lookup_text(digest: str, seen: Dict[str, str], stats: ExtractionStats) -> Optional[str]:
+    if digest in seen:
+        stats.duplicate_files += 1
+        return seen[digest]
+    pdf_text_cache = get_pdf_text_cache()
+    if pdf_text_cache is None:
+        return None
+    text = pdf_text_cache.get(digest)
+    if text is None:
+        stats.cache_misses += 1
+    else:
+        stats.cache_hits += 1
+        seen[digest] = text
+    return text
+
+
+def _remember_text(digest: str, text: str, seen: Dict[str, str]) -> None:
+    seen[digest] = text
+    pdf_text_cache = get_pdf_text_cache()
+    # Read errors may be transient, only cache what was actually extracted
+    if pdf_text_cache is not None and not text.startswith("[Error reading PDF"):
+        pdf_text_cache.set(digest, text)
+
+
 def extract_zip_pdfs(zip_input: Union[str, BinaryIO]) -> Dict[str, str]:
     """
     Extract text from all PDF files in a ZIP archive.
@@ -72,33 +259,18 @@ def extract_zip_pdfs(zip_input: Union[str, BinaryIO]) -> Dict[str, str]:
     invoice_texts = {}
     
     try:
-        if isinstance(zip_input, str):
-            # Handle file path
-            with open(zip_input, 'rb') as f:
-                zip_bytes = f.read()
-        else:
-            # Handle file-like object (UploadFile.file)
-            zip_bytes = zip_input.read()
-        
-        with zipfile.ZipFile(io.BytesIO(zip_bytes)) as z:
-            pdf_files = [f for f in z.filelist if f.filename.lower().endswith(".pdf") and not f.filename.startswith('__MACOSX/')]
-            
-            if not pdf_files:
-                raise Exception("No PDF files found in ZIP archive")
-            
-            for file_info in pdf_files:
+        with _open_zip(zip_input) as z:
+            for file_info in _list_pdf_members(z):
                 try:
-                    with z.open(file_info) as pdf_file:
-                        text = extract_pdf_text_from_zipfile(pdf_file)
-                        if text.strip():  # Only add if text is not empty
-                            invoice_texts[file_info.filename] = text
-                        else:
-                            # Still add empty files but with a note
-                            invoice_texts[file_info.filename] = "[Empty or unreadable PDF]"
-                            
+                    source = _read_member(z, file_info)
                 except Exception as e:
                     # Log individual file errors but continue processing
                     invoice_texts[file_info.filename] = f"[Error reading PDF: {str(e)}]"
+                    continue
+                try:
+                    invoice_texts[file_info.filename] = _member_text(source)
+                finally:
+                    _discard([source])
         
         return invoice_texts
         
@@ -108,6 +280,239 @@ def extract_zip_pdfs(zip_input: Union[str, BinaryIO]) -> Dict[str, str]:
         raise Exception(f"Failed to extract PDFs from ZIP: {str(e)}")
 
 
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Shared extraction pool, created on first use and resized if the worker count changes"""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != max_workers:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            # "spawn" keeps the workers independent of the server's threads
+            _process_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _process_pool_workers = max_workers
+        return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """Stop the extraction workers (called on application shutdown)"""
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool, _process_pool_workers = None, 0
+
+
+def iter_zip_pdfs(
+    zip_input: Union[str, BinaryIO],
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    stats: Optional[ExtractionStats] = None,
+    skip: Optional[Set[str]] = None
+) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Yield (filename, text, digest) for every PDF in a ZIP archive as soon as it is extracted.
+    
+    The archive is read in place (see _open_zip) and members are read one at
+    a time, so memory use does not grow with the size of the archive. Large
+    archives are parsed on the process pool: members are sent to the workers
+    in chunks of ``chunk_size`` files, with at most two chunks per worker and
+    ZIP_MEMORY_CEILING_MB of PDF bytes in flight, and results are yielded in
+    completion order. Small archives, or a single worker, are parsed
+    in-process in ZIP order. Per-file errors are reported in place of the
+    text, exactly like extract_zip_pdfs.
+    
+    Each member is hashed first: text already in the PDF text cache, or
+    extracted from an identical member of the same archive, is reused
+    instead of parsing the PDF again. The SHA-256 of the member's bytes is
+    yielded with its text (None when the member could not be read), so
+    callers can tell identical files apart from files that merely extract
+    to the same text, such as scans without a text layer.
+    
+    Args:
+        zip_input: Either a ZIP file path (str) or file-like object (BinaryIO)
+        max_workers: Worker processes (default PDF_EXTRACT_WORKERS)
+        chunk_size: PDFs per task (default PDF_EXTRACT_CHUNK_SIZE)
+        stats: Optional counters updated with cache hits and duplicates
+        skip: Filenames not to extract (e.g. already processed by a resumed job)
+    
+    Yields:
+        Tuple[str, str, Optional[str]]: Filename, extracted text and content digest
+    """
+    stack = ExitStack()
+    try:
+        z = stack.enter_context(_open_zip(zip_input))
+    except zipfile.BadZipFile:
+        raise Exception("Invalid ZIP file format")
+    except Exception as e:
+        raise Exception(f"Failed to extract PDFs from ZIP: {str(e)}")
+    
+    with stack:
+        try:
+            pdf_files = _list_pdf_members(z)
+        except Exception as e:
+            raise Exception(f"Failed to extract PDFs from ZIP: {str(e)}")
+        if skip:
+            pdf_files = [f for f in pdf_files if f.filename not in skip]
+        yield from _iter_zip_members(z, pdf_files, max_workers, chunk_size, stats)
+
+
+def count_zip_pdfs(zip_input: Union[str, BinaryIO]) -> int:
+    """Number of PDFs in a ZIP archive, read from its central directory only"""
+    try:
+        with _open_zip(zip_input) as z:
+            return len(_list_pdf_members(z))
+    except zipfile.BadZipFile:
+        raise Exception("Invalid ZIP file format")
+
+
+def _iter_zip_members(
+    z: zipfile.ZipFile,
+    pdf_files: List[zipfile.ZipInfo],
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    stats: Optional[ExtractionStats] = None
+) -> Iterator[Tuple[str, str, Optional[str]]]:
+    max_workers = max(1, max_workers or config.PDF_EXTRACT_WORKERS)
+    chunk_size = max(1, chunk_size or config.PDF_EXTRACT_CHUNK_SIZE)
+    stats = stats if stats is not None else ExtractionStats()
+    seen: Dict[str, str] = {}  # content hash -> text, for members already extracted in this archive
+    
+    if max_workers == 1 or len(pdf_files) < config.PDF_PARALLEL_MIN_FILES:
+        for file_info in pdf_files:
+            try:
+                source = _read_member(z, file_info)
+            except Exception as e:
+                # Log individual file errors but continue processing
+                yield file_info.filename, f"[Error reading PDF: {str(e)}]", None
+                continue
+            try:
+                digest = _source_hash(source)
+                text = _lookup_text(digest, seen, stats)
+                if text is None:
+                    text = _member_text(source)
+                    _remember_text(digest, text, seen)
+            finally:
+                _discard([source])
+            yield file_info.filename, text, digest
+        return
+    
+    memory_ceiling = config.ZIP_MEMORY_CEILING_MB * 1024 * 1024
+    pool = _get_process_pool(max_workers)
+    pending = {}  # future -> (member sources, buffered bytes, content hashes)
+    waiting: Dict[str, List[str]] = {}  # content hash of an in-flight member -> identical members
+    in_flight_bytes = 0
+    
+    def collect(done):
+        nonlocal in_flight_bytes
+        results = []
+        for future in done:
+            sources, size, digests = pending.pop(future)
+            in_flight_bytes -= size
+            _discard(sources)
+            for (filename, text), digest in zip(future.result(), digests):
+                _remember_text(digest, text, seen)
+                results.append((filename, text, digest))
+                results.extend((duplicate, text, digest) for duplicate in waiting.pop(digest, []))
+        return results
+    
+    try:
+        for start in range(0, len(pdf_files), chunk_size):
+            chunk, digests = [], []
+            for file_info in pdf_files[start:start + chunk_size]:
+                try:
+                    source = _read_member(z, file_info)
+                    digest = _source_hash(source)
+                except Exception as e:
+                    yield file_info.filename, f"[Error reading PDF: {str(e)}]", None
+                    continue
+                
+                if digest in waiting:
+                    # An identical PDF is already being parsed
+                    waiting[digest].append(file_info.filename)
+                    stats.duplicate_files += 1
+                    _discard([source])
+                    continue
+                text = _lookup_text(digest, seen, stats)
+                if text is not None:
+                    _discard([source])
+                    yield file_info.filename, text, digest
+                    continue
+                
+                waiting[digest] = []
+                chunk.append((file_info.filename, source))
+                digests.append(digest)
+            if not chunk:
+                continue
+            
+            chunk_bytes = sum(_buffered_bytes(source) for _, source in chunk)
+            future = pool.submit(_extract_member_chunk, chunk)
+            pending[future] = ([source for _, source in chunk], chunk_bytes, digests)
+            in_flight_bytes += chunk_bytes
+            del chunk
+            
+            # Bound the number of chunks, and the PDF bytes, held in memory
+            while pending and (len(pending) >= 2 * max_workers or in_flight_bytes > memory_ceiling):
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            yield from collect(done)
+    finally:
+        # Consumer stopped early: drop the work nobody will read
+        for future, (sources, _, _) in pending.items():
+            future.cancel()
+            if future.cancelled():
+                _discard(sources)
+            else:
+                # Already running in a worker, remove its temp files once it is done
+                future.add_done_callback(lambda _, sources=sources: _discard(sources))
+
+
+def extract_zip_pdfs_parallel(
+    zip_input: Union[str, BinaryIO],
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    stats: Optional[ExtractionStats] = None,
+    digests: Optional[Dict[str, str]] = None
+) -> Dict[str, str]:
+    """
+    Extract text from all PDF files in a ZIP archive using a process pool.
+    
+    Same result as extract_zip_pdfs, computed with iter_zip_pdfs.
+    
+    Args:
+        zip_input: Either a ZIP file path (str) or file-like object (BinaryIO)
+        max_workers: Worker processes (default PDF_EXTRACT_WORKERS)
+        chunk_size: PDFs per task (default PDF_EXTRACT_CHUNK_SIZE)
+        stats: Optional counters updated with cache hits and duplicates
+        digests: Optional dict filled with the SHA-256 of each readable member's bytes
+    
+    Returns:
+        Dict[str, str]: Dictionary mapping filename to extracted text, in ZIP order
+    """
+    try:
+        with _open_zip(zip_input) as z:
+            pdf_files = _list_pdf_members(z)
+            invoice_texts = {}
+            for filename, text, digest in _iter_zip_members(z, pdf_files, max_workers, chunk_size, stats):
+                invoice_texts[filename] = text
+                if digests is not None and digest is not None:
+                    digests[filename] = digest
+    except zipfile.BadZipFile:
+        raise Exception("Invalid ZIP file format")
+    except Exception as e:
+        raise Exception(f"Failed to extract PDFs from ZIP: {str(e)}")
+    
+    # Workers finish out of order, restore the archive order
+    return {f.filename: invoice_texts[f.filename] for f in pdf_files}
+
+
 # Alternative async-compatible versions if needed
 import asyncio
 
@@ -0,0 +1,149 @@
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+
+async def _produce(items: Iterator[Any], queue: asyncio.Queue, consumers: int) -> None:
+    """
+    Drain a blocking iterator on a worker thread into a bounded queue.
+    The thread blocks while the queue is full, so extraction never runs far
+    ahead of analysis.
+    """
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+
+    def pump():
+        try:
+            for item in items:
+                future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+                while True:
+                    try:
+                        future.result(timeout=0.5)
+                        break
+                    except concurrent.futures.TimeoutError:
+                        if stop.is_set():
+                            future.cancel()
+                            return
+        finally:
+            close = getattr(items, "close", None)
+            if close:
+                close()
+
+    try:
+        await asyncio.to_thread(pump)
+    except asyncio.CancelledError:
+        # Nobody is consuming any more, let the thread give up
+        stop.set()
+        raise
+    except Exception:
+        for _ in range(consumers):
+            await queue.put(_DONE)
+        raise
+    for _ in range(consumers):
+        await queue.put(_DONE)
+
+
+async def run_ingestion_pipeline(
+    items: Iterator[Tuple[str, str]],
+    analyze: Callable[[str, str], Awaitable[Dict[str, Any]]],
+    store: Callable[[List[Tuple[Dict[str, Any], str]]], None],
+    concurrency: int = 8,
+    queue_size: int = 32,
+    store_batch_size: int = 16,
+    store_flush_seconds: float = 0.25,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run extract -> analyze -> store as three overlapping stages.
+
+    * extract: ``items`` yields (file_path, text); it is consumed on a worker
+      thread so PDF parsing overlaps with LLM waits.
+    * analyze: ``concurrency`` coroutines call ``analyze(file_path, text)``.
+    * store: results are written in batches of up to ``store_batch_size``
+      (or whatever arrived within ``store_flush_seconds``) with
+      ``store(batch)`` on a worker thread, where each batch entry is
+      (result, text).
+
+    Stages are connected by bounded queues, so memory stays flat and wall
+    time approaches that of the slowest stage.
+
+    Returns:
+        List of analysis results in completion order
+    """
+    concurrency = max(1, concurrency)
+    extracted: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    analyzed: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    results: List[Dict[str, Any]] = []
+    started = time.time()
+    first_result_at: Optional[float] = None
+
+    async def analyze_worker():
+        nonlocal first_result_at
+        while True:
+            item = await extracted.get()
+            if item is _DONE:
+                return
+            file_path, text = item
+            result = await analyze(file_path, text)
+            if first_result_at is None:
+                first_result_at = time.time()
+            results.append(result)
+            if on_result:
+                on_result(result)
+            await analyzed.put((result, text))
+
+    async def store_worker():
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            item = await analyzed.get()
+            if item is _DONE:
+                return
+            batch = [item]
+            # Gather more results for a bigger write, but never hold one back for long
+            deadline = loop.time() + store_flush_seconds
+            while len(batch) < store_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(analyzed.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+            try:
+                await asyncio.to_thread(store, batch)
+            except Exception as e:
+                logger.warning(f"Failed to store a batch of {len(batch)} results: {e}")
+
+    producer = asyncio.create_task(_produce(items, extracted, concurrency))
+    storer = asyncio.create_task(store_worker())
+    workers = [asyncio.create_task(analyze_worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*workers)
+        await analyzed.put(_DONE)
+        await storer
+        # Re-raise extraction errors (e.g. an invalid archive)
+        await producer
+    except BaseException:
+        for task in workers + [producer, storer]:
+            task.cancel()
+        raise
+
+    if first_result_at is not None:
+        logger.info(
+            f"Pipeline processed {len(results)} invoices in {time.time() - started:.2f}s "
+            f"(first verdict after {first_result_at - started:.2f}s)"
+        )
+    return results
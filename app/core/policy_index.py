@@ -0,0 +1,200 @@
+from typing import Callable, List, Optional
+import logging
+import re
+import numpy as np
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+# "1. ELIGIBLE EXPENSES", "2.3 Meals", "Section 4 - Travel", "## Hotels"
+_NUMBERED_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s+\S|(?:section\s+)?\d+(?:\.\d+)*[.):]?\s+\S)", re.IGNORECASE)
+# "EXPENSE LIMITS", "TRAVEL POLICY:"
+_CAPS_HEADING_RE = re.compile(r"^\s*[A-Z][A-Z0-9 &/,'()-]{3,}:?\s*$")
+
+
+def _is_heading(line: str) -> bool:
+    return bool(_NUMBERED_HEADING_RE.match(line) or _CAPS_HEADING_RE.match(line))
+
+
+def _split_long_section(section: str, max_chars: int) -> List[str]:
+    """Split an oversized section on line boundaries, repeating its heading in every chunk"""
+    lines = section.splitlines()
+    heading = lines[0].strip() if lines and _is_heading(lines[0]) else ""
+    body = lines[1:] if heading else lines
+
+    chunks, current, size = [], [], len(heading)
+    for line in body:
+        if current and size + len(line) + 1 > max_chars:
+            chunks.append("\n".join(([heading] if heading else []) + current).strip())
+            current, size = [], len(heading)
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append("\n".join(([heading] if heading else []) + current).strip())
+    return chunks
+
+
+def split_policy_sections(policy_text: str, max_chars: int = 1200) -> List[str]:
+    """
+    Split an HR policy into sections.
+
+    Headings (numbered, markdown or all-caps lines) start a new section. A
+    policy without recognisable headings is split into blank-line separated
+    paragraphs, merged up to ``max_chars``. Sections longer than ``max_chars``
+    are split further.
+    """
+    sections, current = [], []
+    for line in policy_text.splitlines():
+        if _is_heading(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+
+    if len(sections) <= 1:
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", policy_text) if p.strip()]
+        sections, buffer = [], ""
+        for paragraph in paragraphs:
+            if buffer and len(buffer) + len(paragraph) + 2 > max_chars:
+                sections.append(buffer)
+                buffer = ""
+            buffer = f"{buffer}\n\n{paragraph}" if buffer else paragraph
+        if buffer:
+            sections.append(buffer)
+
+    result = []
+    for section in sections:
+        if len(section) > max_chars:
+            result.extend(_split_long_section(section, max_chars))
+        else:
+            result.append(section)
+    return [s for s in result if s]
+
+
+def _default_encoder(texts: List[str]) -> np.ndarray:
+    # Reuse the SentenceTransformer already loaded by the vector store
+    from app.core.vector_store import get_vector_store
+    return get_vector_store().encode(texts)
+
+
+class PolicyIndex:
+    """
+    In-memory index over the sections of one HR policy.
+
+    Built once per upload and shared by every invoice in the batch; each
+    invoice prompt then carries only the top-k matching sections instead of
+    the whole policy. Short policies, or policies whose sections could not be
+    embedded, are passed through whole.
+    """
+
+    def __init__(
+        self,
+        policy_text: str,
+        sections: Optional[List[str]] = None,
+        embeddings: Optional[np.ndarray] = None,
+        encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+        top_k: int = 4,
+        max_chars: int = 6000
+    ):
+        self.policy_text = policy_text
+        self.sections = sections or []
+        self.embeddings = embeddings
+        self.encoder = encoder
+        self.top_k = max(1, top_k)
+        self.max_chars = max_chars
+
+    @property
+    def uses_retrieval(self) -> bool:
+        return self.embeddings is not None and self.encoder is not None
+
+    @classmethod
+    def build(
+        cls,
+        policy_text: str,
+        encoder: Optional[Callable[[List[str]], np.ndarray]] = None
+    ) -> "PolicyIndex":
+        """Split and embed a policy; falls back to the full text when retrieval is not worthwhile"""
+        full_text = cls(policy_text)
+        if not config.POLICY_RETRIEVAL_ENABLED or len(policy_text) <= config.POLICY_FULL_TEXT_MAX_CHARS:
+            return full_text
+
+        sections = split_policy_sections(policy_text, config.POLICY_SECTION_MAX_CHARS)
+        if len(sections) <= config.POLICY_TOP_K:
+            return full_text
+
+        encoder = encoder or _default_encoder
+        try:
+            embeddings = np.asarray(encoder(sections), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Policy section embedding failed, sending full policy instead: {e}")
+            return full_text
+
+        logger.info(f"Indexed HR policy into {len(sections)} sections")
+        return cls(
+            policy_text,
+            sections=sections,
+            embeddings=embeddings,
+            encoder=encoder,
+            top_k=config.POLICY_TOP_K,
+            max_chars=config.POLICY_CONTEXT_MAX_CHARS,
+        )
+
+    def _top_sections(self, queries: np.ndarray) -> List[int]:
+        """Best sections for each query row, merged by score and capped by the character budget"""
+        scores = self.embeddings @ queries.T  # (sections, queries)
+        ranked = np.argsort(-scores.max(axis=1))
+        candidates = set(np.argsort(-scores, axis=0)[:self.top_k].ravel().tolist())
+
+        chosen, size = [], 0
+        for idx in ranked:
+            idx = int(idx)
+            if idx not in candidates:
+                continue
+            section_len = len(self.sections[idx])
+            if chosen and size + section_len > self.max_chars:
+                continue
+            chosen.append(idx)
+            size += section_len
+        return sorted(chosen)
+
+    def select(self, invoice_text: str) -> str:
+        """
+        Return the policy context for one invoice: the top-k most similar
+        sections within the character budget, in their original policy order.
+        """
+        if not self.uses_retrieval or not invoice_text.strip():
+            return self.policy_text
+
+        try:
+            query = np.asarray(self.encoder([invoice_text]), dtype=np.float32)[0]
+        except Exception as e:
+            logger.warning(f"Invoice embedding failed, sending full policy instead: {e}")
+            return self.policy_text
+
+        return "\n\n".join(self.sections[i] for i in self._top_sections(query[None, :]))
+
+    def select_many(self, invoice_texts: List[str]) -> str:
+        """
+        Policy context shared by several invoices (packed mode): the union of
+        each invoice's top-k sections, best scores first, within the budget.
+        """
+        texts = [t for t in invoice_texts if t.strip()]
+        if not self.uses_retrieval or not texts:
+            return self.policy_text
+
+        try:
+            queries = np.asarray(self.encoder(texts), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Invoice embedding failed, sending full policy instead: {e}")
+            return self.policy_text
+
+        return "\n\n".join(self.sections[i] for i in self._top_sections(queries))
+
+    @property
+    def context_chars(self) -> int:
+        """Upper bound on the size of the policy context returned by select"""
+        if not self.uses_retrieval:
+            return len(self.policy_text)
+        return min(len(self.policy_text), self.max_chars)
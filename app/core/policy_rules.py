@@ -0,0 +1,256 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Expense categories and the words that identify them, in invoices and in policy lines
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "meals": ["meal", "meals", "food", "restaurant", "lunch", "dinner", "breakfast", "cafe", "dining", "catering"],
+    "hotel": ["hotel", "hotels", "lodging", "accommodation", "room rate", "motel", "resort"],
+    "travel": ["flight", "airfare", "airline", "train", "railway", "taxi", "cab", "uber", "ola", "bus fare", "fuel", "mileage"],
+    "alcohol": ["alcohol", "alcoholic", "beer", "wine", "liquor", "whisky", "whiskey", "vodka", "rum", "cocktail", "bar tab"],
+    "office": ["office supplies", "stationery", "printer", "toner"],
+    "entertainment": ["movie", "cinema", "concert", "entertainment", "amusement"],
+}
+
+# One precompiled alternation over every keyword; the matched group names the category
+_CATEGORY_RE = re.compile(
+    "|".join(
+        f"(?P<{category}>\\b(?:{'|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))})\\b)"
+        for category, keywords in CATEGORY_KEYWORDS.items()
+    ),
+    re.IGNORECASE,
+)
+
+_AMOUNT = r"(?:rs\.?|inr|usd|₹|\$)?\s*([0-9][0-9,]*(?:\.[0-9]{1,2})?)"
+_TOTAL_RE = re.compile(
+    r"^(?!.*\bsub\s*-?\s*total\b).*\b(?:grand\s+total|total\s+amount|amount\s+due|amount\s+paid|total)\b[^0-9\n]*?" + _AMOUNT,
+    re.IGNORECASE | re.MULTILINE,
+)
+_MONTH = (
+    r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+# Numeric dates need a year; dates with a month name may leave it out ("12 March", "Mar 12th")
+_DATE_RE = re.compile(
+    r"\b(?:\d{4}[-/.]\d{1,2}[-/.]\d{1,2}"
+    r"|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}"
+    r"|\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH + r"\b\.?(?:,?\s+\d{2,4})?"
+    r"|" + _MONTH + r"\.?\s+\d{1,2}(?:st|nd|rd|th)?(?:,?\s+\d{2,4})?)\b",
+    re.IGNORECASE,
+)
+_NIGHTS_RE = re.compile(r"\b(\d{1,3})\s*nights?\b", re.IGNORECASE)
+
+# Policy phrasing
+_CAP_RE = re.compile(r"\b(?:maximum|max\.?|up\s+to|limit(?:ed)?\s+to|not\s+(?:to\s+)?exceed|capped\s+at|cap\s+of)\b[^0-9\n]*?" + _AMOUNT, re.IGNORECASE)
+_PER_NIGHT_RE = re.compile(r"\bper\s+night\b|/\s*night\b", re.IGNORECASE)
+_PER_DAY_RE = re.compile(r"\bper\s+day\b|/\s*day\b|\bdaily\b", re.IGNORECASE)
+# Exclusion wording: the excluded category is the subject in front of "... will not be reimbursed",
+# or the object after "No ..." / "The policy excludes ..."
+_EXCLUDES_BEFORE_RE = re.compile(
+    r"\b(?:not|cannot)\s+(?:be\s+)?(?:reimbursed|reimbursable|covered|eligible|allowed|claimable)\b"
+    r"|\b(?:is|are|be)\s+(?:excluded|prohibited)\b",
+    re.IGNORECASE,
+)
+_EXCLUDES_AFTER_RE = re.compile(
+    r"^\W*(?:no|excluded|exclusions?|prohibited)\b|\bexcludes?\b|\bdoes\s+not\s+cover\b",
+    re.IGNORECASE,
+)
+# Generic heads in front of the real subject ("Expenses for alcohol", "No reimbursement will be made for alcohol")
+_GENERIC_SUBJECT_RE = re.compile(
+    r"^\W*(?:the\s+|any\s+)?(?:expenses?|costs?|claims?|charges?|purchases?|reimbursements?)\b(?:\s+\w+){0,3}?\s+(?:for|of|on|towards)\s+",
+    re.IGNORECASE,
+)
+# Words that start a qualifier of the subject ("alcohol purchased with meals"); the subject ends there
+_QUALIFIER_RE = re.compile(
+    r"\b(?:with|during|at|for|in|on|as\s+part\s+of|purchased|bought|ordered|served|including|included)\b",
+    re.IGNORECASE,
+)
+# Conditional exclusions are for the LLM to judge
+_CONDITION_RE = re.compile(
+    r"\b(?:unless|except|excluding|without|if|other\s+than|approv(?:al|ed)|pre-?approved|beyond|above|over|exceed\w*)\b",
+    re.IGNORECASE,
+)
+_DOCUMENT = r"(?:invoices?|receipts?|bills?)"
+# An explicit requirement that invoices show a date, not any mention of a date (e.g. a submission deadline)
+_DATE_REQUIRED_RE = re.compile(
+    r"\b" + _DOCUMENT + r"\b[^.;]*?\b(?:must|shall|should|required\s+to|needs?\s+to|has\s+to|have\s+to)\s+(?:clearly\s+)?"
+    r"(?:show|include|have(?!\s+been)|contain|bear|display|carry|state|mention)\b[^.;]*?\bdates?\b"
+    r"|\b" + _DOCUMENT + r"\b[^.;]*?\b(?:must|shall|should)\s+be\s+dated\b"
+    r"|\bdates?\b[^.;]*?\b(?:is|are)\s+(?:required|mandatory)\s+on\b[^.;]*?\b" + _DOCUMENT + r"\b"
+    r"|\bundated\s+" + _DOCUMENT + r"\b",
+    re.IGNORECASE,
+)
+# Sentence and clause boundaries inside a policy line ("Rs. 500" is not one: a capital letter must follow)
+_CLAUSE_SPLIT_RE = re.compile(r"(?<=[.!])\s+(?=[A-Z])|;\s*")
+
+
+def _parse_amount(value: str) -> Optional[float]:
+    try:
+        return float(value.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _categories_in(text: str) -> Set[str]:
+    return {match.lastgroup for match in _CATEGORY_RE.finditer(text)}
+
+
+def _excluded_categories(clause: str) -> Optional[Set[str]]:
+    """
+    Categories a clause excludes: only the subject of the exclusion, never
+    the categories in its qualifiers ("Alcoholic beverages purchased with
+    meals will not be reimbursed" excludes alcohol, not meals).
+
+    Returns:
+        None when the clause is not an exclusion; an empty set when it is,
+        but its subject is conditional or not a known category
+    """
+    before = _EXCLUDES_BEFORE_RE.search(clause)
+    after = _EXCLUDES_AFTER_RE.search(clause)
+    if before is None and after is None:
+        return None
+    if _CONDITION_RE.search(clause):
+        return set()
+    if after is not None and (before is None or after.start() < before.start()):
+        subject = clause[after.end():before.start() if before is not None else None]
+    else:
+        subject = clause[:before.start()]
+    subject = _GENERIC_SUBJECT_RE.sub("", subject)
+    qualifier = _QUALIFIER_RE.search(subject)
+    if qualifier is not None:
+        subject = subject[:qualifier.start()]
+    return _categories_in(subject)
+
+
+@dataclass
+class InvoiceFields:
+    """Fields pulled mechanically from an invoice's text"""
+    total: Optional[float] = None
+    has_date: bool = False
+    nights: Optional[int] = None
+    categories: Set[str] = field(default_factory=set)
+
+
+def extract_invoice_fields(invoice_text: str) -> InvoiceFields:
+    """Extract the total, date, night count and expense categories from an invoice"""
+    totals = [_parse_amount(m.group(1)) for m in _TOTAL_RE.finditer(invoice_text)]
+    totals = [t for t in totals if t is not None]
+    nights = _NIGHTS_RE.search(invoice_text)
+    return InvoiceFields(
+        # The last total on an invoice is the one after tax
+        total=totals[-1] if totals else None,
+        has_date=bool(_DATE_RE.search(invoice_text)),
+        nights=int(nights.group(1)) if nights and int(nights.group(1)) > 0 else None,
+        categories=_categories_in(invoice_text),
+    )
+
+
+@dataclass
+class CategoryCap:
+    amount: float
+    unit: Optional[str] = None  # "night", "day" or None for a per-invoice cap
+    source: str = ""
+
+
+@dataclass
+class PolicyRules:
+    """
+    Limits and exclusions compiled from an HR policy.
+
+    ``evaluate`` only returns a verdict when a rule settles the invoice on its
+    own; anything ambiguous returns None and goes to the LLM.
+    """
+    caps: Dict[str, CategoryCap] = field(default_factory=dict)
+    excluded: Dict[str, str] = field(default_factory=dict)
+    date_required: Optional[str] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.caps or self.excluded or self.date_required)
+
+    def evaluate(self, invoice_text: str) -> Optional[tuple[str, str]]:
+        if self.is_empty or not invoice_text.strip():
+            return None
+
+        fields = extract_invoice_fields(invoice_text)
+
+        if self.date_required and not fields.has_date:
+            # The date may be written in a form the extractor misses; only the LLM may decline for it
+            return None
+
+        if not fields.categories:
+            return None
+
+        excluded = fields.categories & set(self.excluded)
+        if excluded and excluded == fields.categories:
+            category = sorted(excluded)[0]
+            return "Declined", f"The invoice is for {category}, which the policy excludes (\"{self.excluded[category]}\")."
+        if excluded or len(fields.categories) > 1:
+            # Mixed invoices may be partially reimbursable, leave them to the LLM
+            return None
+
+        category = next(iter(fields.categories))
+        cap = self.caps.get(category)
+        if cap is None or fields.total is None:
+            return None
+
+        amount = fields.total
+        if cap.unit == "night" and fields.nights:
+            amount = fields.total / fields.nights
+        if amount <= cap.amount:
+            limit = f"{cap.amount:.2f} per {cap.unit}" if cap.unit else f"{cap.amount:.2f}"
+            spent = f"{fields.total:.2f}" if amount == fields.total else f"{fields.total:.2f} ({amount:.2f} per {cap.unit})"
+            return "Fully Reimbursed", (
+                f"The {category} invoice total of {spent} is within the policy limit of {limit} (\"{cap.source}\")."
+            )
+        # Over the cap: how much is reimbursable is a judgement call for the LLM
+        return None
+
+
+def compile_policy_rules(policy_text: str) -> PolicyRules:
+    """
+    Compile category limits, excluded categories and the date requirement
+    from the policy text, one sentence at a time. Sentences that are not
+    recognised are ignored.
+    """
+    rules = PolicyRules()
+    for raw_line in policy_text.splitlines():
+        for clause in _CLAUSE_SPLIT_RE.split(raw_line.strip()):
+            if not clause:
+                continue
+
+            if rules.date_required is None and _DATE_REQUIRED_RE.search(clause):
+                rules.date_required = clause
+
+            excluded = _excluded_categories(clause)
+            if excluded is not None:
+                if not excluded and _categories_in(clause):
+                    logger.debug(f"Exclusion without a clear subject left to the LLM: {clause}")
+                for category in excluded:
+                    rules.excluded.setdefault(category, clause)
+                continue
+
+            categories = _categories_in(clause)
+            cap_match = _CAP_RE.search(clause)
+            if categories and cap_match:
+                amount = _parse_amount(cap_match.group(1))
+                if amount is None:
+                    continue
+                unit = "night" if _PER_NIGHT_RE.search(clause) else ("day" if _PER_DAY_RE.search(clause) else None)
+                for category in categories:
+                    # The strictest limit wins
+                    if category not in rules.caps or amount < rules.caps[category].amount:
+                        rules.caps[category] = CategoryCap(amount=amount, unit=unit, source=clause)
+
+    # A category cannot be both capped and excluded
+    for category in rules.excluded:
+        rules.caps.pop(category, None)
+
+    logger.info(
+        f"Compiled policy rules: {len(rules.caps)} caps, {len(rules.excluded)} exclusions, "
+        f"date required: {bool(rules.date_required)}"
+    )
+    return rules
@@ -0,0 +1,276 @@
+from dataclasses import dataclass, field
+from calendar import monthrange
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import re
+
+STATUS_FULL = "Fully Reimbursed"
+STATUS_PARTIAL = "Partially Reimbursed"
+STATUS_DECLINED = "Declined"
+
+INTENT_COUNT = "count"
+INTENT_SUM = "sum"
+INTENT_AVERAGE = "average"
+
+_INTENT_PATTERNS = [
+    (INTENT_COUNT, re.compile(r"\bhow many\b|\bnumber of\b|\bcount(?: of)?\b")),
+    (INTENT_AVERAGE, re.compile(r"\baverage\b|\bmean\b|\bavg\b")),
+    (INTENT_SUM, re.compile(r"\bhow much\b|\btotal\b|\bsum(?: of)?\b")),
+]
+
+# Checked in order; the bare "reimbursed" is handled separately
+_STATUS_PATTERNS = [
+    ([STATUS_PARTIAL], re.compile(r"\bpartial(?:ly)?(?: reimbursed| approved)?\b")),
+    ([STATUS_FULL], re.compile(r"\bfully (?:reimbursed|approved)\b|\bapproved\b")),
+    ([STATUS_DECLINED], re.compile(r"\bdeclined\b|\brejected\b|\bdenied\b")),
+]
+_REIMBURSED_RE = re.compile(r"\breimburs(?:ed|able|ement|ements)\b")
+_CLAIMED_RE = re.compile(r"\bclaimed\b|\bspent\b|\binvoiced\b|\bbilled\b")
+
+_AMOUNT = r"(?:rs\.?|inr|₹|\$)?\s*([0-9][0-9,]*(?:\.[0-9]+)?)"
+_MIN_AMOUNT_RE = re.compile(r"\b(?:over|above|more than|greater than|exceeding)\s+" + _AMOUNT)
+_MAX_AMOUNT_RE = re.compile(r"\b(?:under|below|less than)\s+" + _AMOUNT)
+
+_MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+           "august", "september", "october", "november", "december"]
+_PERIOD_RE = re.compile(r"\b(this|last|previous|past) (week|month|year)\b")
+_DAYS_RE = re.compile(r"\b(?:last|past|previous) ([0-9]+) (day|week|month)s?\b")
+_DAY_RE = re.compile(r"\btoday\b|\byesterday\b")
+_MONTH_RE = re.compile(r"\b(" + "|".join(_MONTHS) + r")(?: ([0-9]{4}))?\b")
+_YEAR_RE = re.compile(r"\b(?:in|during) ([0-9]{4})\b")
+
+# Words that carry no condition; anything else left over sends the question to RAG
+_FILLER = set("""
+a all an and any are as at be been by claim claims count did do does employee employees expense
+expenses for from get give got had has have how i in invoice invoices is it many me much my number
+of on overall per please processed received reimbursement reimbursements s show so submitted sum
+tell the their there these this those to total value was we were what whole with
+amount amounts average avg mean bill bills during rs inr
+""".split())
+_WORD_RE = re.compile(r"[a-z0-9_.\-]+")
+
+
+@dataclass
+class AggregateQuery:
+    intent: str
+    measure: str = "amount"  # or "reimbursable"
+    statuses: List[str] = field(default_factory=list)
+    employees: List[str] = field(default_factory=list)
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    period: Optional[str] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+
+
+def _month_start(year: int, month: int) -> datetime:
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return datetime(year, month, 1)
+
+
+def _months_before(day: datetime, months: int) -> datetime:
+    """The same day of the month ``months`` calendar months earlier, clamped to that month's last day"""
+    start = _month_start(day.year, day.month - months)
+    return start.replace(day=min(day.day, monthrange(start.year, start.month)[1]))
+
+
+def _parse_period(text: str, now: datetime) -> Tuple[Optional[datetime], Optional[datetime], Optional[str], str]:
+    """Time range named in the question, its wording, and the text with it removed"""
+    today = datetime(now.year, now.month, now.day)
+    match = _DAY_RE.search(text)
+    if match:
+        start = today if match.group(0) == "today" else today - timedelta(days=1)
+        return start, start + timedelta(days=1), match.group(0), text.replace(match.group(0), " ")
+
+    match = _DAYS_RE.search(text)
+    if match:
+        count, unit = int(match.group(1)), match.group(2)
+        if unit == "month":
+            start = _months_before(today, count)
+        else:
+            start = today - timedelta(days=count * (7 if unit == "week" else 1))
+        return start, None, match.group(0), text.replace(match.group(0), " ")
+
+    match = _PERIOD_RE.search(text)
+    if match:
+        which, unit = match.groups()
+        back = 0 if which == "this" else 1
+        if unit == "week":
+            start = today - timedelta(days=today.weekday() + 7 * back)
+            end = start + timedelta(days=7)
+        elif unit == "month":
+            start = _month_start(today.year, today.month - back)
+            end = _month_start(start.year, start.month + 1)
+        else:
+            start = datetime(today.year - back, 1, 1)
+            end = datetime(start.year + 1, 1, 1)
+        return start, end, match.group(0), text.replace(match.group(0), " ")
+
+    match = _MONTH_RE.search(text)
+    if match:
+        month = _MONTHS.index(match.group(1)) + 1
+        year = int(match.group(2)) if match.group(2) else (today.year if month <= today.month else today.year - 1)
+        start = _month_start(year, month)
+        return start, _month_start(year, month + 1), f"in {match.group(0)}", text.replace(match.group(0), " ")
+
+    match = _YEAR_RE.search(text)
+    if match:
+        year = int(match.group(1))
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1), match.group(0), text.replace(match.group(0), " ")
+
+    return None, None, None, text
+
+
+def parse_aggregate_query(question: str, employees: List[str], now: Optional[datetime] = None) -> Optional[AggregateQuery]:
+    """
+    Recognise a count / total / average question over stored analyses.
+
+    Only questions that are fully understood are returned: every remaining
+    word must be a filler word once the intent, statuses, employee names,
+    time range and amount bounds are taken out. Anything else (categories,
+    vendors, "why" questions) returns None and is answered by RAG.
+
+    Args:
+        question: The user's question
+        employees: Known employee names, matched as whole words
+        now: Reference time for relative periods
+    """
+    text = " " + question.lower().replace("’", "'").replace("'s ", " ") + " "
+    # Keep thousands separators ("1,000") for the amount bounds
+    text = re.sub(r"[?!;:()\"]|,(?!\d)|(?<!\d),", " ", text)
+
+    intent = None
+    for name, pattern in _INTENT_PATTERNS:
+        if pattern.search(text):
+            intent = name
+            break
+    if intent is None:
+        return None
+    query = AggregateQuery(intent=intent)
+
+    # Employee names first: they may contain status-like words
+    for name in sorted(employees, key=len, reverse=True):
+        pattern = re.compile(r"(?<![\w\-.])" + re.escape(name.lower()) + r"(?![\w\-])")
+        if name and pattern.search(text):
+            query.employees.append(name)
+            text = pattern.sub(" ", text)
+
+    query.since, query.until, query.period, text = _parse_period(text, now or datetime.now())
+
+    match = _MIN_AMOUNT_RE.search(text)
+    if match:
+        query.min_amount = float(match.group(1).replace(",", ""))
+        text = text.replace(match.group(0), " ")
+    match = _MAX_AMOUNT_RE.search(text)
+    if match:
+        query.max_amount = float(match.group(1).replace(",", ""))
+        text = text.replace(match.group(0), " ")
+
+    for statuses, pattern in _STATUS_PATTERNS:
+        if pattern.search(text):
+            query.statuses.extend(statuses)
+            text = pattern.sub(" ", text)
+
+    if _REIMBURSED_RE.search(text):
+        if intent == INTENT_COUNT:
+            # "How many invoices were reimbursed": fully or partially
+            if not query.statuses:
+                query.statuses = [STATUS_FULL, STATUS_PARTIAL]
+        else:
+            # "Total reimbursed": the reimbursable amounts
+            query.measure = "reimbursable"
+        text = _REIMBURSED_RE.sub(" ", text)
+    text = _CLAIMED_RE.sub(" ", text)
+    for _, pattern in _INTENT_PATTERNS:
+        text = pattern.sub(" ", text)
+
+    leftover = [word for word in _WORD_RE.findall(text) if word.strip(".-") and word.strip(".-") not in _FILLER]
+    if leftover:
+        return None
+    return query
+
+
+def _money(value: float) -> str:
+    return f"{value:,.2f}"
+
+
+def _describe(query: AggregateQuery) -> str:
+    parts = []
+    if query.statuses:
+        parts.append(" or ".join(s.lower() for s in query.statuses))
+    subject = "invoices"
+    if parts:
+        subject = f"{parts[0]} invoices"
+    if query.employees:
+        subject += f" for {', '.join(query.employees)}"
+    if query.min_amount is not None:
+        subject += f" over {_money(query.min_amount)}"
+    if query.max_amount is not None:
+        subject += f" under {_money(query.max_amount)}"
+    if query.period:
+        subject += f" processed {query.period}"
+    return subject
+
+
+def answer_aggregate_query(query: AggregateQuery, stats) -> Dict[str, Any]:
+    """
+    Answer a parsed aggregate question from the collection statistics.
+
+    Returns:
+        Dict with the markdown answer and the aggregate it was computed from
+    """
+    aggregate = stats.aggregate(
+        statuses=query.statuses or None,
+        employees=query.employees or None,
+        since=query.since.isoformat() if query.since else None,
+        until=query.until.isoformat() if query.until else None,
+        min_amount=query.min_amount,
+        max_amount=query.max_amount,
+    )
+    subject = _describe(query)
+    documents = aggregate['documents']
+
+    if query.intent == INTENT_COUNT:
+        answer = f"**{documents}** {'invoice matches' if documents == 1 else 'invoices match'}: {subject}."
+    else:
+        total_key, count_key = (
+            ("reimbursable_total", "reimbursable_count") if query.measure == "reimbursable" else ("amount_total", "amount_count")
+        )
+        label = "reimbursable amount" if query.measure == "reimbursable" else "invoiced amount"
+        known = aggregate[count_key]
+        if query.intent == INTENT_AVERAGE:
+            value = aggregate[total_key] / known if known else 0.0
+            answer = f"The average {label} of {subject} is **{_money(value)}**."
+        else:
+            answer = f"The total {label} of {subject} is **{_money(aggregate[total_key])}**."
+        answer += f"\n\nBased on {known} of {documents} matching invoices with a known {label}."
+
+    return {"answer": answer, "aggregate": dict(aggregate, intent=query.intent, measure=query.measure)}
+
+
+def route_query(question: str, filters: Optional[Dict[str, Any]], stats) -> Optional[Dict[str, Any]]:
+    """
+    Answer count / total / average questions from metadata, without retrieval or the LLM.
+
+    Only plain questions are routed: explicit filters other than equality on
+    status or employee_name send the question to RAG.
+
+    Returns:
+        The answer dict of answer_aggregate_query, or None to fall through to RAG
+    """
+    filters = {k: v for k, v in (filters or {}).items() if v is not None and v != ""}
+    if any(k not in ("status", "employee_name") or not isinstance(v, str) for k, v in filters.items()):
+        return None
+
+    query = parse_aggregate_query(question, stats.employees())
+    if query is None:
+        return None
+    if "status" in filters:
+        if query.statuses and filters["status"] not in query.statuses:
+            return None
+        query.statuses = [filters["status"]]
+    if "employee_name" in filters:
+        if query.employees and filters["employee_name"] not in query.employees:
+            return None
+        query.employees = [filters["employee_name"]]
+    return answer_aggregate_query(query, stats)
@@ -1,42 +1,201 @@
-from groq import Groq
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 import logging
-import os
+import numpy as np
+
+from app.core import config
+from app.core.groq_client import create_chat_completion, create_chat_completion_async, stream_chat_completion_async
+from app.core.tokens import CHARS_PER_TOKEN, estimate_tokens
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-# Initialize Groq client with API key
-# Consider using environment variables for API keys
-client = Groq(api_key=os.getenv("GROQ_API_KEY", "your_api_key"))
+CHAT_ERROR_MESSAGE = "I apologize, but I encountered an error while processing your question. Please try again or contact support if the issue persists."
+
+
+class AnswerStreamError(Exception):
+    """Generation failed part-way through a streamed answer; what was streamed is incomplete"""
+
+
+@dataclass
+class ContextPack:
+    """Documents chosen for a chat prompt and the context text built from them"""
+    text: str
+    docs: List[Dict[str, Any]] = field(default_factory=list)
+    tokens: int = 0
+    dropped_duplicates: int = 0
+    dropped_for_budget: int = 0
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "context_tokens": self.tokens,
+            "documents_used": len(self.docs),
+            "dropped_duplicates": self.dropped_duplicates,
+            "dropped_for_budget": self.dropped_for_budget,
+        }
+
+
+def _doc_score(doc: Dict[str, Any]) -> float:
+    return float(doc.get('fusion_score', doc.get('similarity_score', 0.0)) or 0.0)
+
+
+def _normalised_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
 
-def answer_query_with_context(question: str, docs: list) -> str:
+def select_diverse_docs(
+    docs: List[Dict[str, Any]],
+    query_embedding=None,
+    lambda_: float = 0.7,
+    duplicate_threshold: float = 0.97
+) -> tuple:
     """
-    Generate an answer to a question using retrieved document context.
+    Order documents by maximal marginal relevance and drop near-duplicates.
+
+    Relevance is the cosine similarity to the question when its embedding is
+    given, otherwise the retrieval score rescaled to [0, 1]. Each step picks
+    the document maximising ``lambda * relevance - (1 - lambda) * redundancy``
+    (redundancy: highest similarity to an already picked document), with the
+    pairwise similarities computed once as a matrix. Documents at least
+    ``duplicate_threshold`` similar to a picked one are dropped. Without
+    stored embeddings, documents are ordered by score and exact duplicates
+    of the invoice text are dropped.
+
+    Returns:
+        Tuple of the ordered documents and the number of duplicates dropped
+    """
+    docs = [doc for doc in docs if doc]  # Filter out None/empty docs
+    if len(docs) < 2:
+        return docs, 0
+
+    if any(doc.get('embedding') is None for doc in docs):
+        seen, ordered = set(), []
+        for doc in sorted(docs, key=_doc_score, reverse=True):
+            key = " ".join((doc.get('document') or "").split()).lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            ordered.append(doc)
+        return ordered, len(docs) - len(ordered)
+
+    vectors = _normalised_rows(np.asarray([doc['embedding'] for doc in docs], dtype=np.float32))
+    similarity = vectors @ vectors.T
+    if query_embedding is not None:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        relevance = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    else:
+        scores = np.array([_doc_score(doc) for doc in docs], dtype=np.float32)
+        spread = float(scores.max() - scores.min())
+        relevance = (scores - scores.min()) / spread if spread else np.ones(len(docs), dtype=np.float32)
+
+    remaining = np.ones(len(docs), dtype=bool)
+    redundancy = np.zeros(len(docs), dtype=np.float32)
+    picked = []
+    dropped = 0
+    while remaining.any():
+        mmr = lambda_ * relevance - (1 - lambda_) * redundancy if picked else relevance.copy()
+        mmr[~remaining] = -np.inf
+        best = int(np.argmax(mmr))
+        remaining[best] = False
+        picked.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+        duplicates = remaining & (similarity[best] >= duplicate_threshold)
+        dropped += int(duplicates.sum())
+        remaining &= ~duplicates
+    return [docs[i] for i in picked], dropped
+
+
+def _doc_block(doc: Dict[str, Any], content: str) -> str:
+    metadata = doc.get('metadata') or {}
+    return (
+        f"**Invoice ID:** {metadata.get('invoice_id', 'N/A')}\n"
+        f"**Employee:** {metadata.get('employee_name', 'N/A')}\n"
+        f"**Status:** {metadata.get('status', 'N/A')}\n"
+        f"**Reason:** {metadata.get('reason', 'N/A')}\n"
+        f"**Content:** {content}"
+    )
+
+
+def pack_context(
+    question: str,
+    docs: list,
+    query_embedding=None,
+    budget_tokens: Optional[int] = None,
+    max_docs: Optional[int] = None
+) -> ContextPack:
+    """
+    Fill a token budget with the most relevant, mutually distinct documents.
+
+    Documents are ordered by select_diverse_docs, then added in that order,
+    each with its invoice content cut to CHAT_CONTEXT_DOC_TOKENS and to what
+    is left of the budget; the question counts against the budget. A
+    document that would get less than CHAT_CONTEXT_MIN_DOC_TOKENS of content
+    ends the packing.
+
+    Args:
+        question (str): The user's question
+        docs (list): Retrieved documents, optionally with stored embeddings
+        query_embedding: Embedding of the question, for relevance in MMR
+        budget_tokens (int): Context budget, CHAT_CONTEXT_TOKENS by default
+        max_docs (int): Upper bound on the documents used
+    """
+    budget = (budget_tokens or config.CHAT_CONTEXT_TOKENS) - estimate_tokens(question)
+    ordered, dropped = select_diverse_docs(
+        docs, query_embedding, config.CHAT_MMR_LAMBDA, config.CHAT_DUPLICATE_SIMILARITY
+    )
+    if max_docs is not None:
+        ordered = ordered[:max_docs]
+
+    blocks, used = [], []
+    tokens = 0
+    for doc in ordered:
+        header_tokens = estimate_tokens(_doc_block(doc, ""))
+        room = min(config.CHAT_CONTEXT_DOC_TOKENS, budget - tokens - header_tokens)
+        if room < config.CHAT_CONTEXT_MIN_DOC_TOKENS:
+            break
+        content = " ".join((doc.get('document') or "").split())
+        limit = room * CHARS_PER_TOKEN
+        if len(content) > limit:
+            content = content[:limit - 3] + "..."
+        block = _doc_block(doc, content)
+        blocks.append(block)
+        used.append(doc)
+        tokens += estimate_tokens(block)
+
+    return ContextPack(
+        text="\n\n".join(blocks),
+        docs=used,
+        tokens=tokens,
+        dropped_duplicates=dropped,
+        dropped_for_budget=len(ordered) - len(used),
+    )
+
+
+def build_chat_prompt(question: str, docs: list, context: Optional[ContextPack] = None) -> str:
+    """
+    Build the RAG prompt from the question and the retrieved documents.
     
     Args:
         question (str): The user's question
         docs (list): List of retrieved documents with metadata
+        context (ContextPack): Context already packed from docs, packed here if omitted
         
     Returns:
-        str: Generated answer in markdown format
+        str: Prompt for the chat model
     """
-    try:
-        # Build context from retrieved documents
-        context = "\n\n".join([
-            f"**Invoice ID:** {doc['metadata'].get('invoice_id', 'N/A')}\n"
-            f"**Employee:** {doc['metadata'].get('employee_name', 'N/A')}\n"
-            f"**Status:** {doc['metadata'].get('status', 'N/A')}\n"
-            f"**Reason:** {doc['metadata'].get('reason', 'N/A')}\n"
-            f"**Content:** {doc.get('document', '')[:500]}..."
-            for doc in docs if doc  # Filter out None/empty docs
-        ])
-        
-        # Create the prompt
-        prompt = f"""You are an assistant that answers questions about employee invoice reimbursements.
+    if context is None:
+        context = pack_context(question, docs)
+    logger.info(
+        f"Chat context: {len(context.docs)} documents, {context.tokens} tokens, "
+        f"{context.dropped_duplicates} near-duplicates dropped, {context.dropped_for_budget} over budget"
+    )
+    
+    return f"""You are an assistant that answers questions about employee invoice reimbursements.
 
 Use the following document context to respond in **markdown format**:
 
-{context}
+{context.text}
 
 Now answer the user's question: {question}
 
@@ -47,15 +206,36 @@ Instructions:
 - If the context doesn't contain enough information, acknowledge this
 - Structure your response clearly"""
 
+
+def _chat_request(prompt: str) -> dict:
+    """Keyword arguments for the RAG chat completion"""
+    return {
+        "model": config.CHAT_MODEL,  # Alternative models: "mixtral-8x7b-32768", "llama3-8b-8192"
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0.3,
+        "max_tokens": 1024,
+        "top_p": 1,
+        "stream": False,
+    }
+
+
+def answer_query_with_context(question: str, docs: list, context: Optional[ContextPack] = None) -> str:
+    """
+    Generate an answer to a question using retrieved document context.
+    
+    Args:
+        question (str): The user's question
+        docs (list): List of retrieved documents with metadata
+        context (ContextPack): Context already packed from docs (see pack_context)
+        
+    Returns:
+        str: Generated answer in markdown format
+    """
+    try:
+        prompt = build_chat_prompt(question, docs, context)
+
         # Generate response using Groq
-        response = client.chat.completions.create(
-            model="llama3-70b-8192",  # Alternative models: "mixtral-8x7b-32768", "llama3-8b-8192"
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=1024,
-            top_p=1,
-            stream=False
-        )
+        response = create_chat_completion(**_chat_request(prompt))
         
         answer = response.choices[0].message.content
         logger.info(f"Generated answer for question: {question[:50]}...")
@@ -64,7 +244,61 @@ Instructions:
         
     except Exception as e:
         logger.error(f"Error generating answer: {str(e)}")
-        return f"I apologize, but I encountered an error while processing your question. Please try again or contact support if the issue persists."
+        return CHAT_ERROR_MESSAGE
+
+
+async def answer_query_with_context_async(question: str, docs: list, context: Optional[ContextPack] = None) -> str:
+    """
+    Native async version of answer_query_with_context.
+    
+    Shares the connection pool and the process-wide concurrency limit with
+    invoice analysis.
+    """
+    try:
+        prompt = build_chat_prompt(question, docs, context)
+
+        response = await create_chat_completion_async(**_chat_request(prompt))
+        
+        answer = response.choices[0].message.content
+        logger.info(f"Generated answer for question: {question[:50]}...")
+        
+        return answer
+        
+    except Exception as e:
+        logger.error(f"Error generating answer: {str(e)}")
+        return CHAT_ERROR_MESSAGE
+
+async def stream_answer_with_context(question: str, docs: list, context: Optional[ContextPack] = None):
+    """
+    Stream an answer to a question token by token.
+    
+    Args:
+        question (str): The user's question
+        docs (list): List of retrieved documents with metadata
+        context (ContextPack): Context already packed from docs (see pack_context)
+        
+    Yields:
+        str: Answer text fragments in generation order
+        
+    Raises:
+        AnswerStreamError: If generation fails; the fragments already
+            yielded are only part of an answer
+    """
+    try:
+        prompt = build_chat_prompt(question, docs, context)
+        
+        async for chunk in stream_chat_completion_async(**_chat_request(prompt)):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+        
+        logger.info(f"Streamed answer for question: {question[:50]}...")
+        
+    except Exception as e:
+        logger.error(f"Error streaming answer: {str(e)}")
+        raise AnswerStreamError(str(e)) from e
 
 def format_document_context(docs: list) -> str:
     """
@@ -0,0 +1,194 @@
+from typing import Dict, Mapping, Optional
+import asyncio
+import logging
+import re
+import threading
+import time
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset durations such as "7.66s", "2m59.56s" or "120ms" into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for one model's requests-per-minute and tokens-per-minute quota.
+
+    A call takes its request and tokens from the buckets only once they are
+    available; until then the caller waits without holding anything, so a
+    caller that is cancelled or times out while waiting leaves the buckets
+    untouched. Retries of a call (after a 429 or a transient error) reuse its
+    reservation and only wait for the pause to end. The buckets are
+    tightened from the x-ratelimit-* response headers and a 429 pauses every
+    caller with an exponential backoff that resets after the next successful
+    call.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_capacity = float(max(1, requests_per_minute))
+        self.token_capacity = float(max(1, tokens_per_minute))
+        self._request_rate = self.request_capacity / 60.0
+        self._token_rate = self.token_capacity / 60.0
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_429 = 0
+        self._lock = threading.Lock()
+        self.throttled_calls = 0
+        self.rate_limited_responses = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._requests = min(self.request_capacity, self._requests + elapsed * self._request_rate)
+            self._tokens = min(self.token_capacity, self._tokens + elapsed * self._token_rate)
+            self._updated = now
+
+    def try_acquire(self, tokens: int, reserved: bool = False) -> float:
+        """
+        Take one request and ``tokens`` tokens if the buckets allow it.
+
+        Args:
+            tokens: Estimated tokens of the call
+            reserved: The call already holds its reservation (a retry), only
+                wait for the pause to end and the buckets to recover
+
+        Returns:
+            0 when the call may be sent, otherwise the seconds to wait before
+            trying again; nothing is taken in that case
+        """
+        requests = 0.0 if reserved else 1.0
+        tokens = 0.0 if reserved else min(float(max(tokens, 1)), self.token_capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(
+                0.0,
+                (requests - self._requests) / self._request_rate,
+                (tokens - self._tokens) / self._token_rate,
+                self._blocked_until - now,
+            )
+            if wait <= 0:
+                self._requests -= requests
+                self._tokens -= tokens
+            return wait
+
+    def acquire(self, tokens: int, reserved: bool = False) -> None:
+        """Block until the call may be sent; see try_acquire"""
+        throttled = False
+        while (wait := self.try_acquire(tokens, reserved)) > 0:
+            throttled = True
+            time.sleep(wait)
+        if throttled:
+            self._count_throttled()
+
+    async def acquire_async(self, tokens: int, reserved: bool = False) -> None:
+        """Wait until the call may be sent; cancelling the wait takes nothing from the buckets"""
+        throttled = False
+        while (wait := self.try_acquire(tokens, reserved)) > 0:
+            throttled = True
+            await asyncio.sleep(wait)
+        if throttled:
+            self._count_throttled()
+
+    def _count_throttled(self) -> None:
+        with self._lock:
+            self.throttled_calls += 1
+
+    def record_usage(self, reserved_tokens: int, used_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the real usage of a call is known"""
+        if used_tokens is None:
+            return
+        with self._lock:
+            self._tokens -= used_tokens - min(float(max(reserved_tokens, 1)), self.token_capacity)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Follow the remaining quota reported by the API"""
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining_tokens is not None:
+                self._tokens = min(self._tokens, float(remaining_tokens))
+            if remaining_requests is not None:
+                self._requests = min(self._requests, float(remaining_requests))
+                if remaining_requests <= 0:
+                    reset = parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+                    if reset:
+                        self._blocked_until = max(self._blocked_until, now + reset)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """Pause all callers after a 429; returns the backoff applied"""
+        with self._lock:
+            self._consecutive_429 += 1
+            self.rate_limited_responses += 1
+            backoff = min(config.LLM_MAX_BACKOFF_SECONDS, 2.0 ** (self._consecutive_429 - 1))
+            delay = max(retry_after or 0.0, backoff)
+            now = time.monotonic()
+            self._refill(now)
+            # Nothing is left in this window, start refilling from empty
+            self._tokens = min(self._tokens, 0.0)
+            self._blocked_until = max(self._blocked_until, now + delay)
+            return delay
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._consecutive_429 = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "requests_available": round(self._requests, 2),
+                "tokens_available": round(self._tokens, 2),
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+                "throttled_calls": self.throttled_calls,
+                "rate_limited_responses": self.rate_limited_responses,
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    """Shared limiter for a model; Groq quotas are tracked per model"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = RateLimiter(config.GROQ_REQUESTS_PER_MINUTE, config.GROQ_TOKENS_PER_MINUTE)
+            _limiters[model] = limiter
+        return limiter
+
+
+def rate_limiter_stats() -> Dict[str, Dict[str, float]]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model: limiter.stats() for model, limiter in limiters.items()}
@@ -0,0 +1,104 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempt: int, base_seconds: float, max_seconds: float = 30.0) -> float:
+    """Exponential backoff with full jitter: uniform in [0, base * 2**attempt], capped"""
+    return random.uniform(0, min(max_seconds, base_seconds * (2 ** attempt)))
+
+
+async def call_with_retries(
+    work: Callable[[], Awaitable[Dict[str, Any]]],
+    on_failure: Callable[[str], Dict[str, Any]],
+    timeout: Optional[float] = None,
+    retries: int = 0,
+    backoff_seconds: float = 1.0,
+    should_retry: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    slot: Optional[asyncio.Semaphore] = None,
+    label: str = "task"
+) -> Dict[str, Any]:
+    """
+    Run one unit of work with a timeout per attempt and jittered retries.
+
+    An attempt fails when it times out, raises, or returns a result for
+    which ``should_retry`` is true. The semaphore ``slot``, when given, is
+    held only while an attempt runs, never during the backoff, so a retrying
+    item does not hold back the others.
+
+    Returns:
+        The first good result, the last retryable result, or
+        ``on_failure(reason)`` when every attempt timed out or raised
+    """
+    result = None
+    reason = "unknown error"
+    for attempt in range(retries + 1):
+        if attempt:
+            delay = retry_delay(attempt - 1, backoff_seconds)
+            logger.info(f"Retrying {label} in {delay:.1f}s (attempt {attempt + 1}/{retries + 1}): {reason}")
+            await asyncio.sleep(delay)
+        try:
+            if slot is not None:
+                async with slot:
+                    result = await asyncio.wait_for(work(), timeout)
+            else:
+                result = await asyncio.wait_for(work(), timeout)
+        except asyncio.TimeoutError:
+            result, reason = None, f"timed out after {timeout:g}s"
+            continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result, reason = None, str(e)
+            continue
+        if should_retry is None or not should_retry(result):
+            return result
+        reason = str(result.get("reason", "retryable result"))
+
+    if result is not None:
+        return result
+    logger.error(f"{label} failed after {retries + 1} attempts: {reason}")
+    return on_failure(reason)
+
+
+async def run_scheduled(
+    items: Iterable[Tuple[str, Any]],
+    work: Callable[[str, Any, asyncio.Semaphore], Awaitable[Dict[str, Any]]],
+    concurrency: int = 4,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run ``work(key, value, slot)`` for every item with at most ``concurrency`` attempts in flight.
+
+    There are no batches: a slot freed by a finished (or timed-out) item is
+    taken by the next one at once, so a slow item only ever occupies its own
+    slot. ``work`` must hold ``slot`` only while an attempt runs, as
+    call_with_retries(slot=slot) does, so retrying items wait out their
+    backoff without a slot.
+
+    Returns:
+        Results in completion order
+    """
+    slot = asyncio.Semaphore(max(1, concurrency))
+    started = time.time()
+
+    tasks = [asyncio.ensure_future(work(key, value, slot)) for key, value in items]
+    results = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            results.append(result)
+            if on_result:
+                on_result(result)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if results:
+        logger.info(f"Scheduler processed {len(results)} items in {time.time() - started:.2f}s with concurrency {concurrency}")
+    return results
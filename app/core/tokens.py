@@ -0,0 +1,12 @@
+import math
+
+
+# Llama 3 tokenizers average roughly four characters per token on English text.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, tokenizer-free estimate of the number of tokens in a text"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
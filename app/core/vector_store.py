@@ -1,21 +1,157 @@
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
-
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Iterator, Optional
 from datetime import datetime
 import hashlib
 import json
 import numpy as np
 import os
+import threading
+import time
+
+from app.core import config
+from app.core.embedding_cache import get_embedding_cache
+from app.core.embedding_backends import embedding_cache_name, load_embedding_model
+from app.core.collection_stats import CollectionStats
+from app.core.lexical_index import LexicalIndex, reciprocal_rank_fusion
+
+
+CHROMA_PATH = "./chroma_db"
+
+# Metadata stored as numbers, so range operators can be pushed down into Chroma
+NUMERIC_FIELDS = ("amount", "reimbursable_amount", "timestamp_epoch")
+RANGE_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+WHERE_OPERATORS = ("$eq", "$ne", "$in", "$nin") + RANGE_OPERATORS
+
+
+def _to_float(value: Any) -> Optional[float]:
+    """Number from an int, float or "1,250.00"-style string; None when there is none"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", "").strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_epoch(value: Any) -> Optional[float]:
+    """Epoch seconds from a number or an ISO date / datetime string"""
+    number = _to_float(value)
+    if number is not None:
+        return number
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _where_condition(field: str, condition: Any) -> Optional[Dict[str, Any]]:
+    """One field condition; plain values mean equality and lists mean $in"""
+    # "timestamp" ranges are answered from the numeric epoch field
+    if field == "timestamp" and isinstance(condition, dict) and any(op in condition for op in RANGE_OPERATORS):
+        field = "timestamp_epoch"
+    coerce = _to_epoch if field == "timestamp_epoch" else _to_float if field in NUMERIC_FIELDS else None
+
+    def operand(value: Any) -> Any:
+        if coerce is None:
+            return value
+        number = coerce(value)
+        if number is None:
+            raise ValueError(f"Filter on {field!r} needs a number, got {value!r}")
+        return number
+
+    if isinstance(condition, dict):
+        unknown = [op for op in condition if op not in WHERE_OPERATORS]
+        if unknown:
+            raise ValueError(f"Unsupported filter operator(s) for {field!r}: {', '.join(unknown)}")
+        clauses = []
+        for op, value in condition.items():
+            if value is None:
+                continue
+            if op in ("$in", "$nin"):
+                if not isinstance(value, (list, tuple)):
+                    raise ValueError(f"{op} on {field!r} needs a list")
+                if not value:
+                    continue
+                clauses.append({field: {op: [operand(v) for v in value]}})
+            else:
+                clauses.append({field: {op: operand(value)}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+    if isinstance(condition, (list, tuple)):
+        return {field: {"$in": [operand(v) for v in condition]}} if condition else None
+    if condition is None or condition == "":
+        return None
+    return {field: operand(condition)}
+
+
+def build_where_clause(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Translate a metadata filter into a Chroma ``where`` clause.
+
+    Each key is a metadata field mapped to a value (equality), a list
+    (``$in``) or an operator dict such as ``{"$gte": 500, "$lt": 1000}``
+    (``$eq``, ``$ne``, ``$gt``, ``$gte``, ``$lt``, ``$lte``, ``$in``,
+    ``$nin``). Operands on amount fields are converted to numbers, and
+    ranges on ``timestamp`` take ISO dates and run on ``timestamp_epoch``.
+    ``$and`` / ``$or`` lists of such filters are accepted as well. Fields
+    given None or "" are ignored, while 0 and False are real conditions.
+
+    Raises:
+        ValueError: On an unknown operator or a non-numeric range operand
+    """
+    clauses = []
+    for field, condition in (filters or {}).items():
+        if field in ("$and", "$or"):
+            if not isinstance(condition, (list, tuple)):
+                raise ValueError(f"{field} needs a list of filters")
+            nested = [c for c in (build_where_clause(f) for f in condition) if c]
+            if len(nested) > 1:
+                clauses.append({field: nested})
+            elif nested:
+                clauses.append(nested[0])
+            continue
+        if field.startswith("$"):
+            raise ValueError(f"Unsupported filter operator: {field}")
+        clause = _where_condition(field, condition)
+        if clause:
+            clauses.append(clause)
+    if not clauses:
+        return None
+    # Chroma takes one condition per where clause
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+_change_listeners: List[Callable[[Optional[List[str]]], None]] = []
+
+
+def add_change_listener(listener: Callable[[Optional[List[str]]], None]) -> None:
+    """
+    Call ``listener`` after every write to a store: with the ids of the
+    stored or deleted documents, or with None when the collection is cleared.
+    """
+    _change_listeners.append(listener)
+
+
+def _notify_change(document_ids: Optional[List[str]]) -> None:
+    for listener in list(_change_listeners):
+        try:
+            listener(document_ids)
+        except Exception as e:
+            print(f"Change listener error: {e}")
 
 
 class VectorStore:
     def __init__(self, collection_name: str = "invoice_reimbursements"):
         """Initialize ChromaDB persistent vector store using SentenceTransformer"""
+        # Heavy imports are deferred so processes that never touch the store start fast
+        import chromadb
+        from chromadb.config import Settings
+
         # Persistent ChromaDB client
         self.client = chromadb.PersistentClient(
-            path="./chroma_db",
+            path=CHROMA_PATH,
             settings=Settings(allow_reset=True, anonymized_telemetry=False)
         )
         self.collection_name = collection_name
@@ -29,17 +165,54 @@ class VectorStore:
                 metadata={"description": "Invoice reimbursement analysis storage"}
             )
 
-        # Load the local sentence transformer model
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+        # Aggregate statistics, maintained on every write instead of scanning the collection
+        self.stats = CollectionStats(os.path.join(CHROMA_PATH, f"{collection_name}_stats.sqlite3"))
+        self._sync_stats()
+
+        # BM25 index fused with vector search; built by build_lexical_index, then kept up to date on writes
+        self.lexical_index = LexicalIndex() if config.HYBRID_SEARCH_ENABLED else None
+
+        # Load the local sentence transformer model on the configured backend (torch, onnx, onnx-int8)
+        self.model_name = config.EMBEDDING_MODEL
+        self.model, self.embedding_backend = load_embedding_model(self.model_name, config.EMBEDDING_BACKEND)
+        # Repeated texts (chat questions, re-stored invoices, policy sections) skip the model
+        self.embedding_cache = get_embedding_cache(embedding_cache_name(self.model_name, self.embedding_backend))
+
+    def _sync_stats(self) -> None:
+        """Rebuild the statistics once if they do not match the collection (first run, or an older store)"""
+        try:
+            total = self.collection.count()
+            if self.stats.document_count() == total:
+                return
+            print(f"Rebuilding collection statistics for {total} documents")
+
+            def all_metadata(page_size: int = 1000):
+                for offset in range(0, total, page_size):
+                    page = self.collection.get(include=['metadatas'], limit=page_size, offset=offset)
+                    yield from zip(page['ids'], page['metadatas'])
+
+            self.stats.rebuild(all_metadata())
+        except Exception as e:
+            print(f"Stats rebuild error: {e}")
 
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding using SentenceTransformer"""
         try:
-            return self.model.encode(text).tolist()
+            return self.encode([text])[0].tolist()
         except Exception as e:
             print(f"Embedding error: {e}")
             return self._simple_embedding(text)
 
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode a batch of texts into L2-normalised float32 embeddings, using the embedding cache"""
+        def encode_uncached(batch: List[str]) -> np.ndarray:
+            embeddings = self.model.encode(batch, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+            return np.asarray(embeddings, dtype=np.float32)
+
+        if self.embedding_cache is None:
+            return encode_uncached(texts)
+        return self.embedding_cache.encode(texts, encode_uncached)
+
     def _simple_embedding(self, text: str, dimension: int = 384) -> List[float]:
         """Fallback: Generate a hash-based embedding"""
         text_hash = hashlib.md5(text.encode()).hexdigest()
@@ -48,6 +221,44 @@ class VectorStore:
             numbers.extend(numbers)
         return numbers[:dimension]
 
+    @staticmethod
+    def _combined_text(invoice_content: str, analysis_result: Dict[str, Any]) -> str:
+        """Text embedded and stored for an analyzed invoice"""
+        return f"""
+            Invoice Content: {invoice_content}
+
+            Analysis Result:
+            Status: {analysis_result['status']}
+            Reason: {analysis_result['reason']}
+            Amount: {analysis_result.get('amount', 'N/A')}
+            Reimbursable Amount: {analysis_result.get('reimbursable_amount', 'N/A')}
+            """
+
+    @staticmethod
+    def _analysis_metadata(analysis_result: Dict[str, Any], employee_name: str, filename: str) -> Dict[str, Any]:
+        """Metadata of a stored analysis; amounts and the epoch timestamp are numbers so they can be range-filtered"""
+        timestamp = analysis_result.get('timestamp') or datetime.now().isoformat()
+        metadata = {
+            "employee_name": employee_name,
+            "filename": filename,
+            "invoice_id": analysis_result.get('invoice_id', filename),
+            "model_tier": analysis_result.get('model_tier') or 'N/A',
+            "status": analysis_result['status'],
+            "timestamp": timestamp,
+            "reason": analysis_result['reason'][:500],
+            "policy_violations": json.dumps(analysis_result.get('policy_violations', [])),
+            "compliant_items": json.dumps(analysis_result.get('compliant_items', []))
+        }
+        # Unknown amounts are left out rather than stored as "N/A", so they never match a range
+        for field in ("amount", "reimbursable_amount"):
+            value = _to_float(analysis_result.get(field))
+            if value is not None:
+                metadata[field] = value
+        epoch = _to_epoch(timestamp)
+        if epoch is not None:
+            metadata["timestamp_epoch"] = epoch
+        return metadata
+
     def store_analysis(
         self,
         document_id: str,
@@ -57,116 +268,258 @@ class VectorStore:
         filename: str
     ) -> bool:
         """Store invoice analysis in vector database"""
+        return self.store_analyses_bulk([{
+            "document_id": document_id,
+            "invoice_content": invoice_content,
+            "analysis_result": analysis_result,
+            "employee_name": employee_name,
+            "filename": filename,
+        }]) == 1
+
+    def store_analyses_bulk(self, records: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        """
+        Store many invoice analyses with one embedding pass and one write.
+
+        Each record has the keys of store_analysis' arguments (document_id,
+        invoice_content, analysis_result, employee_name, filename). All texts
+        are encoded in a single batched model call, and the documents are
+        upserted together, so re-analyzed invoices replace their old entry.
+
+        Returns:
+            Number of documents stored
+        """
+        # The last record wins when an id appears twice
+        by_id = {record["document_id"]: record for record in records}
+        if not by_id:
+            return 0
+
         try:
-            combined_text = f"""
-            Invoice Content: {invoice_content}
+            ids = list(by_id)
+            documents = [self._combined_text(r["invoice_content"], r["analysis_result"]) for r in by_id.values()]
+            metadatas = [
+                self._analysis_metadata(r["analysis_result"], r["employee_name"], r["filename"])
+                for r in by_id.values()
+            ]
 
-            Analysis Result:
-            Status: {analysis_result['status']}
-            Reason: {analysis_result['reason']}
-            Amount: {analysis_result.get('amount', 'N/A')}
-            Reimbursable Amount: {analysis_result.get('reimbursable_amount', 'N/A')}
-            """
+            try:
+                embeddings = self.encode(documents, batch_size=batch_size or config.EMBEDDING_BATCH_SIZE).tolist()
+            except Exception as e:
+                print(f"Embedding error: {e}")
+                embeddings = [self._simple_embedding(document) for document in documents]
 
-            embedding = self.generate_embedding(combined_text)
-
-            metadata = {
-                "employee_name": employee_name,
-                "filename": filename,
-                "status": analysis_result['status'],
-                "amount": str(analysis_result.get('amount', 'N/A')),
-                "reimbursable_amount": str(analysis_result.get('reimbursable_amount', 'N/A')),
-                "timestamp": analysis_result.get('timestamp', datetime.now().isoformat()),
-                "reason": analysis_result['reason'][:500],
-                "policy_violations": json.dumps(analysis_result.get('policy_violations', [])),
-                "compliant_items": json.dumps(analysis_result.get('compliant_items', []))
-            }
+            # Chroma rejects writes above its maximum batch size
+            max_batch = getattr(self.client, "get_max_batch_size", lambda: len(ids))() or len(ids)
+            for start in range(0, len(ids), max_batch):
+                end = start + max_batch
+                self.collection.upsert(
+                    ids=ids[start:end],
+                    embeddings=embeddings[start:end],
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end]
+                )
 
-            self.collection.add(
-                ids=[document_id],
-                embeddings=[embedding],
-                documents=[combined_text],
-                metadatas=[metadata]
-            )
+            try:
+                self.stats.record(dict(zip(ids, metadatas)))
+            except Exception as e:
+                print(f"Stats update error: {e}")
+            if self.lexical_index is not None:
+                self.lexical_index.add_many(
+                    (document_id, self._lexical_text(document, metadata))
+                    for document_id, document, metadata in zip(ids, documents, metadatas)
+                )
+            _notify_change(ids)
 
-            return True
+            return len(ids)
 
         except Exception as e:
-            print(f"Error storing analysis: {e}")
-            return False
+            print(f"Error storing analyses: {e}")
+            return 0
 
     def search_similar(
         self,
         query: str,
         n_results: int = 5,
-        metadata_filter: Optional[Dict[str, Any]] = None
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        include_embeddings: bool = False
     ) -> List[Dict[str, Any]]:
-        """Search for similar documents"""
+        """
+        Search for similar documents.
+
+        Once the lexical index is built, vector and BM25 candidates are fused
+        with reciprocal rank fusion, so exact tokens (invoice numbers, file
+        names, vendors) rank well even when the embedding misses them.
+        With ``include_embeddings`` every hit also carries its stored
+        embedding (used for diversity when packing chat context).
+        """
         try:
             query_embedding = self.generate_embedding(query)
-            where_clause = {k: v for k, v in (metadata_filter or {}).items() if v}
+            where_clause = build_where_clause(metadata_filter)
+            hybrid = self.lexical_index is not None and self.lexical_index.ready
+            candidates = max(n_results, config.HYBRID_CANDIDATES) if hybrid else n_results
 
+            extra = ['embeddings'] if include_embeddings else []
             results = self.collection.query(
                 query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where_clause,
-                include=['documents', 'metadatas', 'distances']
+                n_results=candidates,
+                where=where_clause or None,
+                include=['documents', 'metadatas', 'distances'] + extra
             )
 
-            return [
-                {
+            hits = {
+                results['ids'][0][i]: {
                     'id': results['ids'][0][i],
                     'document': results['documents'][0][i],
                     'metadata': results['metadatas'][0][i],
                     'similarity_score': 1 - results['distances'][0][i]
                 }
                 for i in range(len(results['ids'][0]))
-            ]
+            }
+            if include_embeddings:
+                for i, hit in enumerate(hits.values()):
+                    hit['embedding'] = results['embeddings'][0][i]
+            vector_ranking = list(hits)
+            if not hybrid:
+                return list(hits.values())[:n_results]
+
+            # Over-fetch lexical candidates when a filter will discard some of them
+            lexical = self.lexical_index.search(query, k=candidates * (5 if where_clause else 1))
+            lexical_ids = [document_id for document_id, _ in lexical]
+            to_fetch = [i for i in lexical_ids if i not in hits]
+            if where_clause:
+                # Only documents matching the filter may enter the fusion
+                to_fetch = lexical_ids
+            if to_fetch:
+                fetched = self.collection.get(
+                    ids=to_fetch,
+                    where=where_clause or None,
+                    include=['documents', 'metadatas'] + extra
+                )
+                matching = set(fetched['ids'])
+                for i, document_id in enumerate(fetched['ids']):
+                    hit = hits.setdefault(document_id, {
+                        'id': document_id,
+                        'document': fetched['documents'][i],
+                        'metadata': fetched['metadatas'][i],
+                        'similarity_score': 0.0
+                    })
+                    if include_embeddings:
+                        hit.setdefault('embedding', fetched['embeddings'][i])
+                if where_clause:
+                    lexical_ids = [i for i in lexical_ids if i in matching]
+            lexical_ranking = [i for i in lexical_ids if i in hits][:candidates]
+
+            fused = reciprocal_rank_fusion([vector_ranking, lexical_ranking], k=config.HYBRID_RRF_K)
+            return [dict(hits[document_id], fusion_score=score) for document_id, score in fused[:n_results]]
 
         except Exception as e:
             print(f"Search error: {e}")
             return []
 
+    def build_lexical_index(self, page_size: int = 1000) -> None:
+        """Index every stored document for lexical search (run once, off the request path)"""
+        if self.lexical_index is None:
+            return
+        started = time.time()
+        for page_start in range(0, self.collection.count(), page_size):
+            page, _ = self.get_documents_page(offset=page_start, limit=page_size, include_documents=True)
+            self.lexical_index.add_many(
+                (doc['id'], self._lexical_text(doc['document'], doc['metadata'] or {})) for doc in page
+            )
+        self.lexical_index.ready = True
+        print(f"Lexical index built over {len(self.lexical_index)} documents in {time.time() - started:.1f}s")
+
+    @staticmethod
+    def _lexical_text(document: str, metadata: Dict[str, Any]) -> str:
+        """Document text plus the identifiers kept only in metadata"""
+        return " ".join([document or ""] + [str(metadata.get(k, "")) for k in ("employee_name", "filename", "invoice_id")])
+
     def search_by_metadata(
         self,
         metadata_filter: Dict[str, Any],
-        n_results: int = 10
+        n_results: int = 10,
+        offset: int = 0
     ) -> List[Dict[str, Any]]:
-        """Search by metadata fields only"""
+        """Search by metadata fields only; ``offset`` pages through larger result sets"""
         try:
-            where_clause = {k: v for k, v in metadata_filter.items() if v}
-            results = self.collection.get(
-                where=where_clause,
-                include=['documents', 'metadatas'],
-                limit=n_results
+            page, _ = self.get_documents_page(
+                metadata_filter=metadata_filter,
+                offset=offset,
+                limit=n_results,
+                include_documents=True
             )
-
-            return [
-                {
-                    'id': results['ids'][i],
-                    'document': results['documents'][i],
-                    'metadata': results['metadatas'][i],
-                    'similarity_score': 1.0
-                }
-                for i in range(len(results['ids']))
-            ]
+            for doc in page:
+                doc['similarity_score'] = 1.0
+            return page
 
         except Exception as e:
             print(f"Metadata search error: {e}")
             return []
 
+    def get_documents_page(
+        self,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        offset: int = 0,
+        limit: int = 500,
+        include_documents: bool = False
+    ) -> tuple:
+        """
+        One page of stored documents in insertion order.
+
+        Document bodies are only fetched when ``include_documents`` is set.
+
+        Returns:
+            Tuple of the page (list of dicts with id, metadata and optionally
+            document) and the offset of the next page, or None after the last one
+        """
+        where_clause = build_where_clause(metadata_filter)
+        include = ['metadatas', 'documents'] if include_documents else ['metadatas']
+        results = self.collection.get(
+            where=where_clause or None,
+            include=include,
+            limit=limit,
+            offset=offset
+        )
+
+        page = []
+        for i in range(len(results['ids'])):
+            doc = {'id': results['ids'][i], 'metadata': results['metadatas'][i]}
+            if include_documents:
+                doc['document'] = results['documents'][i]
+            page.append(doc)
+        next_offset = offset + len(page) if len(page) == limit else None
+        return page, next_offset
+
+    def iter_documents(
+        self,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        include_documents: bool = False,
+        page_size: int = 500,
+        offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over stored documents page by page, holding one page in memory.
+
+        Args:
+            metadata_filter: Metadata filter, see build_where_clause
+            include_documents: Also fetch the document bodies
+            page_size: Documents fetched per query
+            offset: Number of matching documents to skip
+            limit: Stop after this many documents
+        """
+        remaining = limit
+        next_offset = offset
+        while next_offset is not None and (remaining is None or remaining > 0):
+            size = page_size if remaining is None else min(page_size, remaining)
+            page, next_offset = self.get_documents_page(metadata_filter, next_offset, size, include_documents)
+            yield from page
+            if remaining is not None:
+                remaining -= len(page)
+
     def get_all_documents(self) -> List[Dict[str, Any]]:
-        """Get all documents"""
+        """Get all documents (prefer iter_documents for large collections)"""
         try:
-            results = self.collection.get(include=['documents', 'metadatas'])
-            return [
-                {
-                    'id': results['ids'][i],
-                    'document': results['documents'][i],
-                    'metadata': results['metadatas'][i]
-                }
-                for i in range(len(results['ids']))
-            ]
+            return list(self.iter_documents(include_documents=True))
         except Exception as e:
             print(f"Error getting documents: {e}")
             return []
@@ -175,6 +528,10 @@ class VectorStore:
         """Delete a document"""
         try:
             self.collection.delete(ids=[document_id])
+            self.stats.remove([document_id])
+            if self.lexical_index is not None:
+                self.lexical_index.remove_many([document_id])
+            _notify_change([document_id])
             return True
         except Exception as e:
             print(f"Delete error: {e}")
@@ -188,50 +545,98 @@ class VectorStore:
                 name=self.collection_name,
                 metadata={"description": "Invoice reimbursement analysis storage"}
             )
+            self.stats.clear()
+            if self.lexical_index is not None:
+                self.lexical_index.clear()
+            _notify_change(None)
             return True
         except Exception as e:
             print(f"Clear error: {e}")
             return False
 
     def get_collection_stats(self) -> Dict[str, Any]:
-        """Get stats about the collection"""
+        """Get stats about the collection, from the incrementally maintained counters"""
         try:
-            all_docs = self.get_all_documents()
-            if not all_docs:
-                return {
-                    'total_documents': 0,
-                    'status_distribution': {},
-                    'employee_distribution': {},
-                    'date_range': None
-                }
-
-            status_counts = {}
-            employee_counts = {}
-            dates = []
-
-            for doc in all_docs:
-                metadata = doc['metadata']
-                status = metadata.get('status', 'Unknown')
-                status_counts[status] = status_counts.get(status, 0) + 1
-
-                employee = metadata.get('employee_name', 'Unknown')
-                employee_counts[employee] = employee_counts.get(employee, 0) + 1
-
-                timestamp = metadata.get('timestamp')
-                if timestamp:
-                    dates.append(timestamp)
-
-            dates.sort()
-            return {
-                'total_documents': len(all_docs),
-                'status_distribution': status_counts,
-                'employee_distribution': employee_counts,
-                'date_range': {
-                    'earliest': dates[0],
-                    'latest': dates[-1]
-                } if dates else None
-            }
-
+            return self.stats.snapshot()
         except Exception as e:
             print(f"Stats error: {e}")
             return {'error': str(e)}
+
+
+_vector_store: Optional[VectorStore] = None
+_vector_store_lock = threading.Lock()
+_warmup_thread: Optional[threading.Thread] = None
+_warmup_error: Optional[str] = None
+# Set once the warm-up has loaded the model and built the lexical index
+_vector_store_ready = threading.Event()
+
+
+def get_vector_store() -> VectorStore:
+    """
+    Return the process-wide VectorStore, creating it on first use.
+    While the lifespan warm-up is still loading it, callers wait for it
+    instead of loading a second copy.
+    """
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
+    return _vector_store
+
+
+def start_vector_store_warmup() -> threading.Thread:
+    """
+    Load the shared VectorStore and run one encode on a background thread,
+    so the first request does not pay for opening ChromaDB and loading the model.
+    """
+    global _warmup_thread
+
+    def warm_up():
+        global _warmup_error
+        started = time.time()
+        try:
+            store = get_vector_store()
+            # The first forward pass is much slower than the rest
+            store.model.encode(["warm-up"])
+            store.build_lexical_index()
+            _vector_store_ready.set()
+            print(f"Vector store ready in {time.time() - started:.1f}s")
+        except Exception as e:
+            _warmup_error = str(e)
+            print(f"Vector store warm-up failed: {e}")
+
+    _warmup_thread = threading.Thread(target=warm_up, name="vector-store-warmup", daemon=True)
+    _warmup_thread.start()
+    return _warmup_thread
+
+
+def vector_store_status() -> Dict[str, Any]:
+    """Readiness of the shared VectorStore, for health checks"""
+    return {
+        "ready": _vector_store_ready.is_set(),
+        "warming_up": _warmup_thread is not None and _warmup_thread.is_alive(),
+        "error": _warmup_error,
+    }
+
+
+def close_vector_store() -> None:
+    """Flush the embedding cache and release the shared store (called on application shutdown)"""
+    global _vector_store
+    with _vector_store_lock:
+        store, _vector_store = _vector_store, None
+        _vector_store_ready.clear()
+    if store is not None and store.embedding_cache is not None:
+        store.embedding_cache.flush()
+
+
+def query_vector_store(
+    question: str,
+    filters: Optional[Dict[str, Any]] = None,
+    top_k: int = 5,
+    include_embeddings: bool = False
+) -> List[Dict[str, Any]]:
+    """Retrieve the documents most similar to a question from the shared store"""
+    return get_vector_store().search_similar(
+        question, n_results=top_k, metadata_filter=filters, include_embeddings=include_embeddings
+    )
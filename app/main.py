@@ -1,5 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api import analyze
+from app.api import analyze, chatbot, documents, jobs
+from app.core.groq_client import aclose_clients
+from app.core.pdf_utils import shutdown_process_pool
+from app.core.vector_store import start_vector_store_warmup, close_vector_store
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load ChromaDB and the embedding model in the background; the app serves
+    # requests meanwhile and /api/health reports when the store is ready
+    start_vector_store_warmup()
+    # Background analysis jobs, including those interrupted by the last shutdown
+    jobs.start_job_workers()
+    yield
+    await jobs.stop_job_workers()
+    # Release the shared Groq connection pools, PDF extraction workers and vector store
+    await aclose_clients()
+    shutdown_process_pool()
+    close_vector_store()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(analyze.router, prefix="/api")
+app.include_router(chatbot.router, prefix="/api")
+app.include_router(documents.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
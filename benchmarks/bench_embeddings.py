@@ -0,0 +1,129 @@
+"""
+Benchmark: embedding backends (torch fp32, ONNX fp32, ONNX int8) on CPU.
+
+Builds a synthetic corpus of analyzed invoices and a set of chat-style
+questions, then for every backend reports load time, bulk encoding
+throughput, single-query latency, and recall@k of its nearest neighbours
+against the torch fp32 baseline.
+
+Usage:
+    python -m benchmarks.bench_embeddings --docs 2000 --queries 200 --k 10
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.core import config
+from app.core.embedding_backends import EMBEDDING_BACKENDS, BACKEND_TORCH, load_embedding_model
+
+EMPLOYEES = ["asha", "ravi", "meera", "john", "li wei", "fatima", "carlos", "anna"]
+CATEGORIES = {
+    "meals": ["Lunch with client", "Team dinner", "Breakfast buffet", "Airport cafe"],
+    "hotel": ["Deluxe room 2 nights", "Standard room 1 night", "Suite 3 nights", "Business hotel stay"],
+    "travel": ["Taxi to airport", "Economy flight BLR-DEL", "Train fare Chennai-Mumbai", "Uber ride to office"],
+    "alcohol": ["Wine bottle", "Bar tab", "Beer pitcher"],
+    "office": ["Printer toner", "Stationery pack", "Office supplies"],
+}
+STATUSES = ["Fully Reimbursed", "Partially Reimbursed", "Declined"]
+
+
+def make_corpus(docs: int, seed: int = 7):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(docs):
+        category = rng.choice(list(CATEGORIES))
+        items = rng.sample(CATEGORIES[category], k=min(2, len(CATEGORIES[category])))
+        amount = rng.randint(50, 9000)
+        status = rng.choice(STATUSES)
+        corpus.append(
+            f"Invoice Content: INVOICE #{i:05d} Employee: {rng.choice(EMPLOYEES)} "
+            f"Date: 2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+            f"{'; '.join(items)}. Total: Rs. {amount}\n"
+            f"Analysis Result: Status: {status} Reason: {category} expense of Rs. {amount} "
+            f"{'is within' if status == 'Fully Reimbursed' else 'exceeds'} the policy limit."
+        )
+    return corpus
+
+
+def make_queries(queries: int, seed: int = 11):
+    rng = random.Random(seed)
+    templates = [
+        "Which {category} invoices were declined?",
+        "Show {employee}'s {category} expenses",
+        "Was the {category} bill of {employee} reimbursed?",
+        "Invoices over Rs. {amount} for {category}",
+        "Why was {employee}'s claim partially reimbursed?",
+    ]
+    return [
+        rng.choice(templates).format(
+            category=rng.choice(list(CATEGORIES)), employee=rng.choice(EMPLOYEES), amount=rng.randint(500, 5000)
+        )
+        for _ in range(queries)
+    ]
+
+
+def top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def encode(model, texts, batch_size: int) -> np.ndarray:
+    return np.asarray(model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True), dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=config.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.docs)
+    queries = make_queries(args.queries)
+    backends = [BACKEND_TORCH] + [b for b in args.backends if b != BACKEND_TORCH]
+    print(f"Corpus: {len(corpus)} documents, {len(queries)} queries, model {args.model}, k={args.k}")
+    print(f"{'backend':<11}{'loaded as':<11}{'load s':>8}{'docs/s':>9}{'p50 ms':>8}{'p95 ms':>8}{'dim':>5}{'recall@k':>10}{'cos':>7}")
+
+    baseline_docs = baseline_neighbours = None
+    for backend in backends:
+        started = time.perf_counter()
+        try:
+            model, loaded_as = load_embedding_model(args.model, backend)
+        except Exception as e:
+            print(f"{backend:<11}failed to load: {e}")
+            continue
+        load_seconds = time.perf_counter() - started
+
+        encode(model, corpus[:args.batch_size], args.batch_size)  # warm-up
+        started = time.perf_counter()
+        doc_vectors = encode(model, corpus, args.batch_size)
+        throughput = len(corpus) / (time.perf_counter() - started)
+
+        latencies = []
+        query_vectors = []
+        for query in queries:
+            started = time.perf_counter()
+            query_vectors.append(encode(model, [query], 1)[0])
+            latencies.append((time.perf_counter() - started) * 1000)
+        query_vectors = np.stack(query_vectors)
+        neighbours = top_k(doc_vectors, query_vectors, args.k)
+
+        if baseline_docs is None:
+            baseline_docs, baseline_neighbours = doc_vectors, neighbours
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(neighbours, baseline_neighbours)])
+        cosine = float(np.mean(np.sum(doc_vectors * baseline_docs, axis=1))) if doc_vectors.shape == baseline_docs.shape else float("nan")
+
+        print(
+            f"{backend:<11}{loaded_as:<11}{load_seconds:>8.2f}{throughput:>9.1f}"
+            f"{np.percentile(latencies, 50):>8.2f}{np.percentile(latencies, 95):>8.2f}"
+            f"{doc_vectors.shape[1]:>5}{recall:>10.3f}{cosine:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
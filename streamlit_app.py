@@ -1,8 +1,7 @@
 import streamlit as st
 import requests
+import json
 import zipfile
-import os
-import tempfile
 import time
 from pathlib import Path
 
@@ -12,6 +11,50 @@ API_BASE = "http://localhost:8000/api"
 
 st.title("🧾 Invoice Reimbursement System")
 
+
+def run_analysis_job(files, data, progress_bar, status_text, timeout_seconds):
+    """
+    Submit the analysis as a background job and poll it until it finishes,
+    showing real per-invoice progress.
+
+    Returns:
+        Tuple of an HTTP-like status code and a payload shaped like the /analyze response
+    """
+    job_data = {"employee_name": data["employee_name"]} if "employee_name" in data else {}
+    response = requests.post(f"{API_BASE}/jobs", files=files, data=job_data, timeout=(10, 300))
+    if response.status_code != 202:
+        return response.status_code, response.json()
+    job_id = response.json()["job_id"]
+    deadline = time.time() + timeout_seconds
+    results = []
+    offset = 0
+    while True:
+        job = requests.get(f"{API_BASE}/jobs/{job_id}", params={"offset": offset}, timeout=30).json()
+        results.extend(job["results"])
+        offset = job["next_offset"]
+        total = job["total_invoices"] or 1
+        progress_bar.progress(min(job["processed"] / total, 1.0))
+        status_text.text(f"🔄 Analyzed {job['processed']}/{job['total_invoices']} invoices (job {job_id[:8]}, {job['status']})")
+        if job["status"] == "completed":
+            break
+        if job["status"] == "failed":
+            return 500, {"detail": job["error"]}
+        if time.time() > deadline:
+            # The job keeps running on the server; its results can be fetched later
+            raise requests.exceptions.Timeout(f"Job {job_id} still running")
+        time.sleep(1)
+
+    return 200, {
+        "success": True,
+        "results": results,
+        "total_invoices": len(results),
+        "processed_successfully": len([r for r in results if r.get("status") != "error"]),
+        "employee_names_generated": sorted({r.get("employee_name") for r in results if r.get("employee_name")}),
+        "processing_time_seconds": job["processing_time_seconds"] or 0,
+        "batch_size_used": 1,
+        "processing_mode": "job (pipeline)",
+    }
+
 tab1, tab2 = st.tabs(["📥 Analyze Invoices", "💬 Chatbot"])
 
 # --- TAB 1: INVOICE ANALYSIS ---
@@ -26,9 +69,9 @@ with tab1:
     with col1:
         processing_mode = st.selectbox(
             "Processing Mode",
-            ["auto", "sequential", "batch"],
+            ["auto", "pipeline", "sequential", "batch", "packed"],
             index=0,
-            help="Auto: sequential for ≤5 invoices, batch for >5. Sequential: one at a time (stable). Batch: multiple at once (faster)."
+            help="Auto: background job with live progress (pipeline, no invoice limit). Pipeline: extraction, analysis and storage overlap (first results soonest). Sequential: one at a time (stable). Batch: multiple at once (faster). Packed: several short invoices per LLM call (fewest requests)."
         )
     with col2:
         batch_size = st.slider(
@@ -102,154 +145,144 @@ with tab1:
             st.error("Please upload a ZIP file containing invoices.")
         else:
             try:
-                # Create temporary files using context managers and tempfile
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_policy:
-                    temp_policy.write(policy_file.getvalue())
-                    temp_policy_path = temp_policy.name
-
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as temp_zip:
-                    temp_zip.write(zip_file.getvalue())
-                    temp_zip_path = temp_zip.name
+                # Send the uploaded buffers as they are, without temporary copies
+                # (the ZIP preview above may have moved the read position)
+                policy_file.seek(0)
+                zip_file.seek(0)
 
                 # Prepare files for API request with correct parameter names
-                with open(temp_policy_path, "rb") as policy_fp, open(temp_zip_path, "rb") as zip_fp:
-                    files = {
-                        "hr_policy": (policy_file.name, policy_fp, "application/pdf"),
-                        "invoice_zip": (zip_file.name, zip_fp, "application/zip")
-                    }
-                    # Send processing mode, batch size and employee name
-                    data = {
-                        "batch_size": batch_size,
-                        "processing_mode": "sequential" if processing_mode == "sequential" else ("batch" if processing_mode == "batch" else "batch")
-                    }
-                    if employee_name and employee_name.strip():
-                        data["employee_name"] = employee_name.strip()
+                files = {
+                    "hr_policy": (policy_file.name, policy_file, "application/pdf"),
+                    "invoice_zip": (zip_file.name, zip_file, "application/zip")
+                }
+                # Send processing mode, batch size and employee name
+                data = {
+                    "batch_size": batch_size,
+                    "processing_mode": "pipeline" if processing_mode == "auto" else processing_mode
+                }
+                if employee_name and employee_name.strip():
+                    data["employee_name"] = employee_name.strip()
 
-                    # Create progress indicators
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    start_time = time.time()
-                    
-                    timeout_seconds = timeout_minutes * 60
-                    
-                    with st.spinner("🔄 Analyzing invoices... This may take several minutes."):
-                        try:
-                            status_text.text("📤 Uploading files and starting analysis...")
-                            progress_bar.progress(10)
-                            
+                # Create progress indicators
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                start_time = time.time()
+                
+                timeout_seconds = timeout_minutes * 60
+                
+                with st.spinner("🔄 Analyzing invoices... This may take several minutes."):
+                    try:
+                        status_text.text("📤 Uploading files and starting analysis...")
+                        progress_bar.progress(10)
+                        
+                        if processing_mode == "auto":
+                            status_code, payload = run_analysis_job(files, data, progress_bar, status_text, timeout_seconds)
+                        else:
                             response = requests.post(
                                 f"{API_BASE}/analyze", 
                                 files=files, 
                                 data=data,
                                 timeout=timeout_seconds
                             )
-                            
-                            progress_bar.progress(100)
-                            processing_time = time.time() - start_time
-                            
-                            if response.status_code == 200:
-                                result = response.json()
-                                if result.get("success", False):
-                                    results = result.get("results", [])
-                                    total = result.get("total_invoices", 0)
-                                    successful = result.get("processed_successfully", 0)
-                                    employee_names_generated = result.get("employee_names_generated", [])
-                                    server_processing_time = result.get("processing_time_seconds", 0)
-                                    batch_size_used = result.get("batch_size_used", batch_size)
-                                    processing_mode_used = result.get("processing_mode", "unknown")
+                            status_code, payload = response.status_code, response.json()
+                        
+                        progress_bar.progress(100)
+                        processing_time = time.time() - start_time
+                        
+                        if status_code == 200:
+                            result = payload
+                            if result.get("success", False):
+                                results = result.get("results", [])
+                                total = result.get("total_invoices", 0)
+                                successful = result.get("processed_successfully", 0)
+                                employee_names_generated = result.get("employee_names_generated", [])
+                                server_processing_time = result.get("processing_time_seconds", 0)
+                                batch_size_used = result.get("batch_size_used", batch_size)
+                                processing_mode_used = result.get("processing_mode", "unknown")
+                                
+                                st.success(f"✅ Analysis Complete! {successful}/{total} invoices processed successfully in {processing_time:.1f} seconds.")
+                                
+                                # Performance info
+                                st.info(f"⚡ **Performance:** Mode: {processing_mode_used} | Server time: {server_processing_time:.1f}s | Batch size: {batch_size_used} | Total time: {processing_time:.1f}s")
+                                
+                                # Show generated employee names
+                                if employee_names_generated:
+                                    st.info(f"👥 **Generated Employee Names:** {', '.join(employee_names_generated)}")
+                                
+                                # Display results in a more organized way
+                                if results:
+                                    st.subheader("📊 Analysis Results")
                                     
-                                    st.success(f"✅ Analysis Complete! {successful}/{total} invoices processed successfully in {processing_time:.1f} seconds.")
+                                    # Summary statistics
+                                    status_counts = {}
+                                    for result_item in results:
+                                        status = result_item.get('status', 'Unknown')
+                                        status_counts[status] = status_counts.get(status, 0) + 1
                                     
-                                    # Performance info
-                                    st.info(f"⚡ **Performance:** Mode: {processing_mode_used} | Server time: {server_processing_time:.1f}s | Batch size: {batch_size_used} | Total time: {processing_time:.1f}s")
+                                    # Display status summary
+                                    cols = st.columns(len(status_counts))
+                                    for i, (status, count) in enumerate(status_counts.items()):
+                                        with cols[i]:
+                                            if status == 'Fully Reimbursed':
+                                                st.metric(f"✅ {status}", count)
+                                            elif status == 'Partially Reimbursed':
+                                                st.metric(f"⚠️ {status}", count)
+                                            elif status == 'Declined':
+                                                st.metric(f"❌ {status}", count)
+                                            else:
+                                                st.metric(f"ℹ️ {status}", count)
                                     
-                                    # Show generated employee names
-                                    if employee_names_generated:
-                                        st.info(f"👥 **Generated Employee Names:** {', '.join(employee_names_generated)}")
+                                    # Group results by employee name for better organization
+                                    employee_groups = {}
+                                    for result_item in results:
+                                        emp_name = result_item.get('employee_name', 'Unknown')
+                                        if emp_name not in employee_groups:
+                                            employee_groups[emp_name] = []
+                                        employee_groups[emp_name].append(result_item)
                                     
-                                    # Display results in a more organized way
-                                    if results:
-                                        st.subheader("📊 Analysis Results")
-                                        
-                                        # Summary statistics
-                                        status_counts = {}
-                                        for result_item in results:
-                                            status = result_item.get('status', 'Unknown')
-                                            status_counts[status] = status_counts.get(status, 0) + 1
-                                        
-                                        # Display status summary
-                                        cols = st.columns(len(status_counts))
-                                        for i, (status, count) in enumerate(status_counts.items()):
-                                            with cols[i]:
-                                                if status == 'Fully Reimbursed':
-                                                    st.metric(f"✅ {status}", count)
-                                                elif status == 'Partially Reimbursed':
-                                                    st.metric(f"⚠️ {status}", count)
-                                                elif status == 'Declined':
-                                                    st.metric(f"❌ {status}", count)
-                                                else:
-                                                    st.metric(f"ℹ️ {status}", count)
+                                    for emp_name, emp_results in employee_groups.items():
+                                        st.markdown(f"### 👤 {emp_name}")
                                         
-                                        # Group results by employee name for better organization
-                                        employee_groups = {}
-                                        for result_item in results:
-                                            emp_name = result_item.get('employee_name', 'Unknown')
-                                            if emp_name not in employee_groups:
-                                                employee_groups[emp_name] = []
-                                            employee_groups[emp_name].append(result_item)
-                                        
-                                        for emp_name, emp_results in employee_groups.items():
-                                            st.markdown(f"### 👤 {emp_name}")
-                                            
-                                            for i, result_item in enumerate(emp_results, 1):
-                                                with st.expander(f"Invoice {i}: {result_item.get('invoice_id', 'Unknown')} (from {result_item.get('folder_name', 'root')})"):
-                                                    col1, col2 = st.columns(2)
-                                                    with col1:
-                                                        status = result_item.get('status', 'Unknown')
-                                                        if status == 'Fully Reimbursed':
-                                                            st.success(f"Status: {status}")
-                                                        elif status == 'Partially Reimbursed':
-                                                            st.warning(f"Status: {status}")
-                                                        elif status == 'Declined':
-                                                            st.error(f"Status: {status}")
-                                                        else:
-                                                            st.info(f"Status: {status}")
-                                                    with col2:
-                                                        st.write(f"**File Path:** {result_item.get('file_path', 'N/A')}")
-                                                    
-                                                    reason = result_item.get('reason', 'No reason provided')
-                                                    st.write(f"**Reason:** {reason}")
-                                else:
-                                    st.error("Analysis failed. Please check your files and try again.")
+                                        for i, result_item in enumerate(emp_results, 1):
+                                            with st.expander(f"Invoice {i}: {result_item.get('invoice_id', 'Unknown')} (from {result_item.get('folder_name', 'root')})"):
+                                                col1, col2 = st.columns(2)
+                                                with col1:
+                                                    status = result_item.get('status', 'Unknown')
+                                                    if status == 'Fully Reimbursed':
+                                                        st.success(f"Status: {status}")
+                                                    elif status == 'Partially Reimbursed':
+                                                        st.warning(f"Status: {status}")
+                                                    elif status == 'Declined':
+                                                        st.error(f"Status: {status}")
+                                                    else:
+                                                        st.info(f"Status: {status}")
+                                                with col2:
+                                                    st.write(f"**File Path:** {result_item.get('file_path', 'N/A')}")
+                                                
+                                                reason = result_item.get('reason', 'No reason provided')
+                                                st.write(f"**Reason:** {reason}")
                             else:
-                                error_detail = response.json().get('detail', 'Unknown error occurred')
-                                st.error(f"❌ Error {response.status_code}: {error_detail}")
-                                
-                        except requests.exceptions.Timeout:
-                            st.error(f"⏰ Request timed out after {timeout_minutes} minutes. Try reducing the batch size or processing fewer invoices at once.")
-                            st.info("💡 **Suggestions:**\n- Reduce batch size to 1-2\n- Process invoices in smaller ZIP files\n- Increase timeout duration")
-                        except requests.exceptions.ConnectionError:
-                            st.error("🔌 Connection error. Please ensure the API server is running.")
-                        except requests.exceptions.RequestException as e:
-                            st.error(f"🚫 Request failed: {str(e)}")
-                        except Exception as e:
-                            st.error(f"💥 Unexpected error: {str(e)}")
-                        finally:
-                            # Clear progress indicators
-                            progress_bar.empty()
-                            status_text.empty()
+                                st.error("Analysis failed. Please check your files and try again.")
+                        else:
+                            error_detail = payload.get('detail', 'Unknown error occurred')
+                            st.error(f"❌ Error {status_code}: {error_detail}")
+                            
+                    except requests.exceptions.Timeout:
+                        st.error(f"⏰ Request timed out after {timeout_minutes} minutes. Try reducing the batch size or processing fewer invoices at once.")
+                        st.info("💡 **Suggestions:**\n- Reduce batch size to 1-2\n- Process invoices in smaller ZIP files\n- Increase timeout duration")
+                    except requests.exceptions.ConnectionError:
+                        st.error("🔌 Connection error. Please ensure the API server is running.")
+                    except requests.exceptions.RequestException as e:
+                        st.error(f"🚫 Request failed: {str(e)}")
+                    except Exception as e:
+                        st.error(f"💥 Unexpected error: {str(e)}")
+                    finally:
+                        # Clear progress indicators
+                        progress_bar.empty()
+                        status_text.empty()
 
             except Exception as e:
                 st.error(f"💥 File processing error: {str(e)}")
-            finally:
-                # Clean up temporary files
-                try:
-                    if 'temp_policy_path' in locals():
-                        os.unlink(temp_policy_path)
-                    if 'temp_zip_path' in locals():
-                        os.unlink(temp_zip_path)
-                except Exception as cleanup_error:
-                    st.warning(f"⚠️ Could not clean up temporary files: {cleanup_error}")
 
 # --- TAB 2: CHATBOT ---
 with tab2:
@@ -280,9 +313,75 @@ with tab2:
     if filters:
         st.info(f"🏷️ Active filters: {', '.join([f'{k}: {v}' for k, v in filters.items()])}")
 
+    stream_answer = st.checkbox("Stream answer", value=True, help="Show the answer as it is generated.")
+
     if st.button("Ask", disabled=not query.strip()):
         if not query.strip():
             st.error("Please enter a question.")
+        elif stream_answer:
+            payload = {
+                "question": query.strip(),
+                "filters": filters if filters else {}
+            }
+            
+            try:
+                with requests.post(
+                    f"{API_BASE}/chat/stream",
+                    json=payload,
+                    timeout=(10, 120),
+                    stream=True,
+                    headers={"Accept": "text/event-stream"}
+                ) as response:
+                    if response.status_code != 200:
+                        error_detail = response.json().get('detail', 'Unknown error occurred')
+                        st.error(f"❌ Error {response.status_code}: {error_detail}")
+                    else:
+                        sources_container = st.container()
+                        st.markdown("### 🧠 Answer")
+                        answer_placeholder = st.empty()
+                        answer_placeholder.markdown("🤔 Thinking...")
+                        answer = ""
+                        event_name = None
+                        
+                        # Minimal Server-Sent Events parser: "event:" line, "data:" line, blank line
+                        for line in response.iter_lines(decode_unicode=True):
+                            if not line:
+                                event_name = None
+                                continue
+                            if line.startswith("event:"):
+                                event_name = line[len("event:"):].strip()
+                                continue
+                            if not line.startswith("data:"):
+                                continue
+                            data = json.loads(line[len("data:"):].strip())
+                            
+                            if event_name == "sources":
+                                sources = data.get("sources", [])
+                                with sources_container:
+                                    if sources:
+                                        with st.expander(f"🗂 Sources ({len(sources)} found)"):
+                                            for i, source in enumerate(sources, 1):
+                                                st.markdown(f"**Source {i}:**")
+                                                st.json(source)
+                                                st.markdown("---")
+                                    else:
+                                        st.info("ℹ️ No sources found for this query.")
+                            elif event_name == "token":
+                                answer += data.get("text", "")
+                                answer_placeholder.markdown(answer + "▌", unsafe_allow_html=True)
+                            elif event_name == "done":
+                                break
+                        
+                        answer_placeholder.markdown(answer or "No answer provided", unsafe_allow_html=True)
+                        
+            except requests.exceptions.Timeout:
+                st.error("⏰ Request timed out. Please try again.")
+            except requests.exceptions.ConnectionError:
+                st.error("🔌 Connection error. Please ensure the API server is running.")
+            except requests.exceptions.RequestException as e:
+                st.error(f"🚫 Request failed: {str(e)}")
+            except Exception as e:
+                st.error(f"💥 Unexpected error: {str(e)}")
         else:
             payload = {
                 "question": query.strip(),
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Open the on-disk caches and the job store under tmp_path instead of the working directory"""
+    from app.api import jobs
+    from app.core import config, llm_utils, pdf_utils
+
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "JOBS_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(jobs, "_job_store", None)
+    monkeypatch.setattr(llm_utils, "_verdict_cache", None)
+    monkeypatch.setattr(pdf_utils, "_pdf_text_cache", None)
@@ -0,0 +1,67 @@
+import asyncio
+
+from app.api import analyze
+from app.api.analyze import collapse_duplicate_invoices
+
+PLACEHOLDER = "[Empty or unreadable PDF]"
+
+
+def test_identical_files_are_collapsed_by_digest():
+    invoice_data = {"e1/a.pdf": "Taxi 300", "e2/a.pdf": "Taxi 300", "e3/b.pdf": "Taxi 300"}
+    digests = {"e1/a.pdf": "d1", "e2/a.pdf": "d1", "e3/b.pdf": "d2"}
+    unique, copies = collapse_duplicate_invoices(invoice_data, digests)
+    assert list(unique) == ["e1/a.pdf", "e3/b.pdf"]
+    assert copies == {"e1/a.pdf": ["e2/a.pdf"]}
+
+
+def test_scans_with_the_same_placeholder_text_are_not_collapsed():
+    invoice_data = {"e1/scan.pdf": PLACEHOLDER, "e2/scan.pdf": PLACEHOLDER, "e3/broken.pdf": "[Error reading PDF: bad]",
+                    "e4/broken.pdf": "[Error reading PDF: bad]"}
+    digests = {"e1/scan.pdf": "d1", "e2/scan.pdf": "d2"}
+    unique, copies = collapse_duplicate_invoices(invoice_data, digests)
+    assert list(unique) == list(invoice_data)
+    assert copies == {}
+
+
+def test_pipeline_shares_verdicts_only_between_identical_files(monkeypatch):
+    extracted = [
+        ("e1/scan.pdf", PLACEHOLDER, "d1"),
+        ("e2/scan.pdf", PLACEHOLDER, "d2"),
+        ("e1/taxi.pdf", "Taxi 300", "d3"),
+        ("e2/taxi.pdf", "Taxi 300", "d3"),
+        ("e3/broken.pdf", "[Error reading PDF: bad]", None),
+        ("e4/broken.pdf", "[Error reading PDF: bad]", None),
+    ]
+    analyzed = []
+
+    async def analyze_once(file_path, invoice_text, policy_index, employee_name, policy_rules=None, slot=None):
+        analyzed.append(file_path)
+        return analyze.build_result_metadata(file_path, "Declined", "test", employee_name)
+
+    monkeypatch.setattr(analyze, "iter_zip_pdfs", lambda zip_file, stats=None, skip=None: iter(extracted))
+    monkeypatch.setattr(analyze, "analyze_invoice_with_retries", analyze_once)
+    monkeypatch.setattr(analyze, "store_invoice_results", lambda batch: None)
+    results = asyncio.run(analyze.process_invoices_pipeline("upload.zip", None, "employee", None))
+
+    assert sorted(analyzed) == ["e1/scan.pdf", "e1/taxi.pdf", "e2/scan.pdf", "e3/broken.pdf", "e4/broken.pdf"]
+    copies = {r["file_path"]: r.get("duplicate_of") for r in results}
+    assert copies["e2/taxi.pdf"] == "e1/taxi.pdf"
+    assert copies["e2/scan.pdf"] is None
+
+
+def test_failed_analyses_are_not_stored(monkeypatch):
+    stored = []
+
+    class Store:
+        def store_analyses_bulk(self, records):
+            stored.extend(record["filename"] for record in records)
+            return len(records)
+
+    monkeypatch.setattr(analyze, "get_vector_store", lambda: Store())
+    analyze.store_invoice_results([
+        (analyze.build_result_metadata("e/ok.pdf", "Declined", "Alcohol", "e"), "Bar Total: 500"),
+        (analyze.build_result_metadata("e/llm.pdf", "error", "API failure", "e"), "Taxi Total: 300"),
+        (analyze.build_result_metadata("e/empty.pdf", "error", "Invoice text is empty", "e", analyze.TIER_NONE), ""),
+        (analyze.invoice_error_result("e/timeout.pdf", "timed out"), "Hotel Total: 900"),
+    ])
+    assert stored == ["e/ok.pdf"]
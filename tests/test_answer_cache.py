@@ -0,0 +1,63 @@
+import numpy as np
+
+from app.core.answer_cache import SemanticAnswerCache, answer_scope
+
+SCOPE = answer_scope(None, 5)
+
+
+def _vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_similar_question_in_the_same_scope_hits():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.95)
+    cache.set(_vector(1, 0, 0), SCOPE, "Three invoices.", [{"invoice_id": "a"}], ["a"])
+    hit = cache.get(_vector(0.99, 0.05, 0), SCOPE)
+    assert hit is not None and hit.answer == "Three invoices."
+    assert cache.get(_vector(0, 1, 0), SCOPE) is None
+    assert cache.get(_vector(1, 0, 0), answer_scope({"status": "Declined"}, 5)) is None
+
+
+def test_invalidate_drops_answers_built_from_a_changed_document():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.95)
+    cache.set(_vector(1, 0, 0), SCOPE, "From a and b", [], ["a", "b"])
+    cache.set(_vector(0, 1, 0), SCOPE, "From c", [], ["c"])
+    cache.invalidate(["b"])
+    assert cache.get(_vector(1, 0, 0), SCOPE) is None
+    assert cache.get(_vector(0, 1, 0), SCOPE).answer == "From c"
+    assert cache.stats()["invalidations"] == 1
+    # The freed slot is reused
+    cache.set(_vector(0, 0, 1), SCOPE, "From d", [], ["d"])
+    assert len(cache) == 2
+
+
+def test_invalidate_all():
+    cache = SemanticAnswerCache(max_entries=4, threshold=0.95)
+    cache.set(_vector(1, 0, 0), SCOPE, "From a", [], ["a"])
+    cache.set(_vector(0, 1, 0), SCOPE, "From c", [], ["c"])
+    cache.invalidate(None)
+    assert len(cache) == 0
+    assert cache.get(_vector(1, 0, 0), SCOPE) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2, threshold=0.95)
+    cache.set(_vector(1, 0, 0), SCOPE, "first", [], ["a"])
+    cache.set(_vector(0, 1, 0), SCOPE, "second", [], ["b"])
+    assert cache.get(_vector(1, 0, 0), SCOPE) is not None
+    cache.set(_vector(0, 0, 1), SCOPE, "third", [], ["c"])
+    assert cache.get(_vector(0, 1, 0), SCOPE) is None
+    assert cache.get(_vector(1, 0, 0), SCOPE).answer == "first"
+    # The evicted entry no longer answers to its source's invalidation
+    cache.invalidate(["b"])
+    assert len(cache) == 2
+
+
+def test_expired_entries_are_not_returned(monkeypatch):
+    cache = SemanticAnswerCache(max_entries=2, threshold=0.95, ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr("app.core.answer_cache.time.time", lambda: now[0])
+    cache.set(_vector(1, 0, 0), SCOPE, "old", [], ["a"])
+    now[0] += 61
+    assert cache.get(_vector(1, 0, 0), SCOPE) is None
+    assert len(cache) == 0
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+from app.core import config, llm_utils, pdf_utils
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_writes_nothing(tmp_path):
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=tmp_path, check=True,
+                   env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True)
+    assert os.listdir(tmp_path) == []
+
+
+def test_caches_open_under_cache_dir_on_first_use(tmp_path):
+    verdicts = llm_utils.get_verdict_cache()
+    assert verdicts is llm_utils.get_verdict_cache()
+    assert verdicts.path == os.path.join(config.CACHE_DIR, "verdicts.sqlite3")
+    assert pdf_utils.get_pdf_text_cache().path == os.path.join(config.CACHE_DIR, "pdf_text.sqlite3")
+    assert {"pdf_text.sqlite3", "verdicts.sqlite3"} <= set(os.listdir(tmp_path / "cache"))
+
+
+def test_disabled_caches(monkeypatch):
+    monkeypatch.setattr(config, "VERDICT_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "PDF_TEXT_CACHE_ENABLED", False)
+    assert llm_utils.get_verdict_cache() is None
+    assert pdf_utils.get_pdf_text_cache() is None
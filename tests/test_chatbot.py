@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import chatbot
+from app.core.answer_cache import SemanticAnswerCache
+from app.core.rag_utils import AnswerStreamError, ContextPack, CHAT_ERROR_MESSAGE
+
+DOCS = [{"id": "doc-1", "document": "Invoice 1", "metadata": {"invoice_id": "1.pdf"}}]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    cache = SemanticAnswerCache(max_entries=8, threshold=0.9)
+
+    async def no_route(query):
+        return None
+
+    async def cache_miss(query):
+        return [1.0, 0.0], None
+
+    async def context(query, embedding):
+        return ContextPack(text="Invoice 1", docs=DOCS)
+
+    monkeypatch.setattr(chatbot, "answer_cache", cache)
+    monkeypatch.setattr(chatbot, "routed_answer", no_route)
+    monkeypatch.setattr(chatbot, "cached_answer", cache_miss)
+    monkeypatch.setattr(chatbot, "retrieve_context", context)
+    app = FastAPI()
+    app.include_router(chatbot.router, prefix="/api")
+    return TestClient(app), cache
+
+
+def _tokens(response):
+    return [
+        json.loads(line[len("data: "):])["text"]
+        for line in response.text.splitlines()
+        if line.startswith("data: ") and '"text"' in line
+    ]
+
+
+def test_complete_stream_is_cached(client, monkeypatch):
+    test_client, cache = client
+
+    async def stream(question, docs, context):
+        yield "Invoice 1 "
+        yield "was declined."
+
+    monkeypatch.setattr(chatbot, "stream_answer_with_context", stream)
+    response = test_client.post("/api/chat/stream", json={"question": "Why was invoice 1 declined?"})
+    assert _tokens(response) == ["Invoice 1 ", "was declined."]
+    assert len(cache) == 1
+
+
+def test_failed_stream_is_not_cached(client, monkeypatch):
+    test_client, cache = client
+
+    async def stream(question, docs, context):
+        yield "Invoice 1 "
+        raise AnswerStreamError("connection reset")
+
+    monkeypatch.setattr(chatbot, "stream_answer_with_context", stream)
+    response = test_client.post("/api/chat/stream", json={"question": "Why was invoice 1 declined?"})
+    assert _tokens(response) == ["Invoice 1 ", CHAT_ERROR_MESSAGE]
+    assert "event: done" in response.text
+    assert len(cache) == 0
@@ -0,0 +1,77 @@
+
+from app.core.collection_stats import CollectionStats
+
+
+def _meta(status, employee, amount=None, reimbursable=None, timestamp="2024-03-01T10:00:00"):
+    metadata = {"status": status, "employee_name": employee, "timestamp": timestamp}
+    if amount is not None:
+        metadata["amount"] = amount
+    if reimbursable is not None:
+        metadata["reimbursable_amount"] = reimbursable
+    return metadata
+
+
+def _unfiltered_matches_scan(stats):
+    filtered = stats.aggregate(since="0000")  # same documents, computed by a query over the side table
+    assert stats.aggregate() == filtered
+    return filtered
+
+
+def test_known_amount_counts_follow_record_remove_and_clear(tmp_path):
+    stats = CollectionStats(str(tmp_path / "stats.sqlite3"))
+    stats.record({
+        "a": _meta("Declined", "asha", 500, 0),
+        "b": _meta("Fully Reimbursed", "asha", 300, 300),
+        "c": _meta("Partially Reimbursed", "ravi", 1000),
+        "d": _meta("Partially Reimbursed", "ravi"),
+    })
+    assert _unfiltered_matches_scan(stats) == {
+        "documents": 4, "amount_total": 1800.0, "amount_count": 3,
+        "reimbursable_total": 300.0, "reimbursable_count": 2,
+    }
+
+    # Replacing a document moves it between the counts
+    stats.record({"d": _meta("Declined", "ravi", 200, 0)})
+    stats.remove(["b"])
+    assert _unfiltered_matches_scan(stats)["amount_count"] == 3
+    assert stats.aggregate()["reimbursable_count"] == 2
+
+    stats.rebuild([("x", _meta("Declined", "asha", 50, 0))])
+    assert _unfiltered_matches_scan(stats)["amount_count"] == 1
+
+    stats.clear()
+    assert stats.aggregate() == {"documents": 0, "amount_total": 0.0, "amount_count": 0,
+                                 "reimbursable_total": 0.0, "reimbursable_count": 0}
+
+
+def test_unfiltered_aggregate_does_not_scan_documents(tmp_path):
+    stats = CollectionStats(str(tmp_path / "stats.sqlite3"))
+    stats.record({"a": _meta("Declined", "asha", 500, 0)})
+    statements = []
+    stats._conn.set_trace_callback(statements.append)
+    stats.aggregate()
+    assert statements and not any("documents" in statement for statement in statements)
+
+
+def test_counts_are_backfilled_for_existing_tables(tmp_path):
+    path = str(tmp_path / "stats.sqlite3")
+    stats = CollectionStats(path)
+    stats.record({"a": _meta("Declined", "asha", 500, 0), "b": _meta("Declined", "asha")})
+    stats._conn.execute("DELETE FROM counters WHERE key IN ('amount_count', 'reimbursable_count')")
+    stats._conn.close()
+
+    reopened = CollectionStats(path)
+    assert reopened.aggregate()["amount_count"] == 1
+    assert reopened.aggregate()["reimbursable_count"] == 1
+
+
+def test_filtered_aggregate(tmp_path):
+    stats = CollectionStats(str(tmp_path / "stats.sqlite3"))
+    stats.record({
+        "a": _meta("Declined", "asha", 500, 0, "2024-02-10T09:00:00"),
+        "b": _meta("Fully Reimbursed", "asha", 300, 300, "2024-03-05T09:00:00"),
+        "c": _meta("Fully Reimbursed", "ravi", 1200, 1200, "2024-03-20T09:00:00"),
+    })
+    march = stats.aggregate(statuses=["Fully Reimbursed"], since="2024-03-01", until="2024-04-01", min_amount=400)
+    assert (march["documents"], march["amount_total"]) == (1, 1200.0)
+    assert sorted(stats.employees()) == ["asha", "ravi"]
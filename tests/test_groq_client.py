@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.groq_client import ConcurrencyGovernor
+
+
+def test_slot_released_by_a_thread_goes_to_an_async_waiter():
+    governor = ConcurrencyGovernor(1)
+    governor.acquire()
+
+    async def waiter():
+        task = asyncio.create_task(governor.acquire_async())
+        await asyncio.sleep(0.05)
+        assert governor.waiting == 1 and not task.done()
+        threading.Thread(target=governor.release).start()
+        await asyncio.wait_for(task, 5)
+        # The slot was handed over, never freed in between
+        assert governor.in_flight == 1 and governor.waiting == 0
+        governor.release()
+
+    asyncio.run(waiter())
+    assert governor.in_flight == 0
+
+
+def test_slot_released_by_a_coroutine_goes_to_a_blocked_thread():
+    governor = ConcurrencyGovernor(1)
+    acquired = threading.Event()
+
+    def blocking_caller():
+        with governor.slot():
+            acquired.set()
+
+    async def holder():
+        async with governor.slot_async():
+            thread = threading.Thread(target=blocking_caller)
+            thread.start()
+            await asyncio.sleep(0.05)
+            assert not acquired.is_set()
+        return thread
+
+    thread = asyncio.run(holder())
+    assert acquired.wait(5)
+    thread.join(5)
+    assert governor.in_flight == 0
+
+
+def test_async_waiters_are_served_before_new_callers():
+    governor = ConcurrencyGovernor(1)
+    order = []
+
+    async def worker(name):
+        async with governor.slot_async():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        governor.acquire()
+        tasks = [asyncio.create_task(worker(i)) for i in range(3)]
+        await asyncio.sleep(0.05)
+        assert governor.waiting == 3
+        governor.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2]
+    assert governor.in_flight == 0
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    governor = ConcurrencyGovernor(1)
+
+    async def main():
+        governor.acquire()
+        task = asyncio.create_task(governor.acquire_async())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert governor.waiting == 0
+        governor.release()
+
+    asyncio.run(main())
+    assert governor.in_flight == 0
+    # A thread can still take the only slot
+    thread = threading.Thread(target=governor.acquire)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive() and governor.in_flight == 1
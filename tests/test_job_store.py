@@ -0,0 +1,53 @@
+from app.core.job_store import JobStore, JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING
+
+
+def _result(name, status="Fully Reimbursed"):
+    return {"file_path": f"employee_1/{name}", "invoice_id": name, "status": status, "reason": "ok"}
+
+
+def test_results_are_recorded_once_and_in_order(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create("policy", "upload.zip", total=3, employee_name="Asha")
+    store.mark_running(job_id)
+    store.record_results(job_id, [_result("a.pdf"), _result("b.pdf", "error")])
+    store.record_results(job_id, [_result("b.pdf"), _result("c.pdf", "Declined")])
+
+    job = store.get(job_id)
+    assert (job["status"], job["processed"], job["failed"]) == (JOB_RUNNING, 3, 1)
+    assert "policy_text" not in job
+    assert [r["invoice_id"] for r in store.results(job_id)] == ["a.pdf", "b.pdf", "c.pdf"]
+    assert [r["invoice_id"] for r in store.results(job_id, offset=1, limit=1)] == ["b.pdf"]
+    assert store.status_counts(job_id) == {"Fully Reimbursed": 1, "error": 1, "Declined": 1}
+
+
+def test_unfinished_jobs_resume_after_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    running = store.create("policy", "first.zip", total=3)
+    queued = store.create("policy", "second.zip", total=1)
+    done = store.create("policy", "third.zip", total=1)
+    store.mark_running(running)
+    store.record_results(running, [_result("a.pdf")])
+    store.finish(done)
+
+    reopened = JobStore(path)
+    assert reopened.unfinished() == [running, queued]
+    assert reopened.processed_files(running) == {"employee_1/a.pdf"}
+    assert reopened.get(queued)["status"] == JOB_QUEUED
+    assert reopened.get(running, include_policy=True)["policy_text"] == "policy"
+
+    started_at = reopened.get(running)["started_at"]
+    reopened.mark_running(running)
+    assert reopened.get(running)["started_at"] == started_at
+
+
+def test_finish(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    ok = store.create("policy", "a.zip", total=0)
+    broken = store.create("policy", "b.zip", total=2)
+    store.finish(ok)
+    store.finish(broken, "Failed to extract PDFs from ZIP file")
+    assert store.get(ok)["status"] == JOB_COMPLETED
+    assert (store.get(broken)["status"], store.get(broken)["error"]) == (JOB_FAILED, "Failed to extract PDFs from ZIP file")
+    assert store.unfinished() == []
+    assert store.get("missing") is None
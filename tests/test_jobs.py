@@ -0,0 +1,29 @@
+import asyncio
+
+from app.api import jobs
+from app.core.job_store import JobStore, JOB_COMPLETED
+
+
+def test_run_job_skips_invoices_that_already_have_results(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    zip_path = tmp_path / "upload.zip"
+    zip_path.write_bytes(b"zip")
+    job_id = store.create("policy", str(zip_path), total=2)
+    store.mark_running(job_id)
+    store.record_results(job_id, [{"file_path": "e/a.pdf", "status": "Declined"}])
+    calls = []
+
+    async def pipeline(zip_file, policy_index, employee_name, max_invoices, policy_rules, skip=None, on_stored=None):
+        calls.append(skip)
+        on_stored([{"file_path": "e/b.pdf", "status": "Fully Reimbursed"}])
+        return []
+
+    monkeypatch.setattr(jobs, "_job_store", store)
+    monkeypatch.setattr(jobs, "process_invoices_pipeline", pipeline)
+    monkeypatch.setattr(jobs.PolicyIndex, "build", staticmethod(lambda text: object()))
+    asyncio.run(jobs.run_job(job_id))
+
+    assert calls == [{"e/a.pdf"}]
+    job = store.get(job_id)
+    assert (job["status"], job["processed"]) == (JOB_COMPLETED, 2)
+    assert not zip_path.exists()
@@ -0,0 +1,41 @@
+from app.core.llm_utils import parse_packed_response
+
+
+def test_parses_plain_array():
+    content = '[{"invoice_id": "a", "status": "Declined", "reason": "Alcohol"}]'
+    assert parse_packed_response(content, ["a"]) == {"a": ("Declined", "Alcohol")}
+
+
+def test_brackets_in_prose_around_the_array():
+    content = (
+        "Here are the verdicts [see policy section 3]:\n"
+        '[{"invoice_id": "a", "status": "Fully Reimbursed", "reason": "Within the [meals] cap"},\n'
+        ' {"invoice_id": "b", "status": "Declined", "reason": "No receipt"}]\n'
+        "Note [1]: amounts are in INR."
+    )
+    assert parse_packed_response(content, ["a", "b"]) == {
+        "a": ("Fully Reimbursed", "Within the [meals] cap"),
+        "b": ("Declined", "No receipt"),
+    }
+
+
+def test_skips_arrays_that_are_not_objects():
+    content = 'Invoices [1, 2] follow. [{"invoice_id": "1", "status": "Declined", "reason": "Late"}]'
+    assert parse_packed_response(content, ["1"]) == {"1": ("Declined", "Late")}
+
+
+def test_unexpected_duplicate_and_malformed_items_are_left_out():
+    content = (
+        '[{"invoice_id": "a", "status": "Declined", "reason": "Late"},'
+        ' {"invoice_id": "a", "status": "Fully Reimbursed", "reason": "Duplicate"},'
+        ' {"invoice_id": "b", "status": "Maybe", "reason": "Unknown status"},'
+        ' {"invoice_id": "c", "status": "Declined", "reason": ""},'
+        ' {"invoice_id": "z", "status": "Declined", "reason": "Not in the pack"}]'
+    )
+    assert parse_packed_response(content, ["a", "b", "c"]) == {"a": ("Declined", "Late")}
+
+
+def test_no_array():
+    assert parse_packed_response("I could not analyze these invoices.", ["a"]) == {}
+    assert parse_packed_response('[{"invoice_id": "a", "status": ', ["a"]) == {}
+    assert parse_packed_response("", ["a"]) == {}
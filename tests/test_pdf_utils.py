@@ -0,0 +1,60 @@
+import io
+import zipfile
+
+import fitz  # PyMuPDF
+import pytest
+
+from app.core import config
+from app.core.pdf_utils import ExtractionStats, extract_zip_pdfs_parallel, shutdown_process_pool
+
+
+def make_pdf(text: str) -> bytes:
+    doc = fitz.open()
+    doc.new_page().insert_text((40, 40), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_zip(members) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as z:
+        for name, data in members:
+            z.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+    monkeypatch.setattr(config, "PDF_PARALLEL_MIN_FILES", 1)
+    yield
+    shutdown_process_pool()
+
+
+def test_pool_results_follow_zip_order(process_pool):
+    names = [f"invoices/{name}.pdf" for name in ("zeta", "alpha", "mid", "beta", "omega", "gamma")]
+    archive = make_zip((name, make_pdf(f"Invoice {name}")) for name in names)
+
+    texts = extract_zip_pdfs_parallel(archive, max_workers=2, chunk_size=1)
+
+    assert list(texts) == names
+    for name in names:
+        assert f"Invoice {name}" in texts[name]
+
+
+def test_pool_resolves_duplicates_in_flight(process_pool):
+    taxi = make_pdf("Taxi 42.00")
+    members = [("a.pdf", taxi), ("b.pdf", make_pdf("Hotel 120.00")), ("c.pdf", taxi), ("d.pdf", taxi)]
+    stats = ExtractionStats()
+    digests = {}
+
+    texts = extract_zip_pdfs_parallel(make_zip(members), max_workers=2, chunk_size=1, stats=stats, digests=digests)
+
+    assert list(texts) == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+    # The copies were queued behind the first one instead of being parsed again
+    assert stats.duplicate_files == 2
+    assert stats.cache_misses == 2
+    assert texts["a.pdf"] == texts["c.pdf"] == texts["d.pdf"]
+    assert "Taxi 42.00" in texts["a.pdf"]
+    assert digests["a.pdf"] == digests["c.pdf"] == digests["d.pdf"] != digests["b.pdf"]
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.pipeline import run_ingestion_pipeline
+
+
+async def echo(file_path, text):
+    return {"file": file_path, "text": text}
+
+
+def test_results_keep_item_order_with_one_worker():
+    stored = []
+    items = iter([(f"{i}.pdf", f"text {i}") for i in range(20)])
+
+    results = asyncio.run(run_ingestion_pipeline(
+        items, echo, stored.extend, concurrency=1, queue_size=2, store_batch_size=4
+    ))
+
+    assert [r["file"] for r in results] == [f"{i}.pdf" for i in range(20)]
+    assert [(r["file"], text) for r, text in stored] == [(f"{i}.pdf", f"text {i}") for i in range(20)]
+
+
+def test_first_result_arrives_before_extraction_finishes():
+    first_result = threading.Event()
+    extracted_after_first = []
+
+    def items():
+        yield "a.pdf", "text a"
+        # Extraction of the rest waits for the first verdict
+        assert first_result.wait(5)
+        for name in ("b.pdf", "c.pdf"):
+            extracted_after_first.append(name)
+            yield name, "text"
+
+    results = asyncio.run(run_ingestion_pipeline(
+        items(), echo, lambda batch: None, concurrency=2, on_result=lambda result: first_result.set()
+    ))
+
+    assert results[0]["file"] == "a.pdf"
+    assert sorted(r["file"] for r in results) == ["a.pdf", "b.pdf", "c.pdf"]
+    assert extracted_after_first == ["b.pdf", "c.pdf"]
+
+
+def test_extraction_error_surfaces_after_workers_drain():
+    stored = []
+
+    def items():
+        yield "a.pdf", "text a"
+        yield "b.pdf", "text b"
+        raise ValueError("corrupt archive")
+
+    async def slow_echo(file_path, text):
+        await asyncio.sleep(0.05)
+        return await echo(file_path, text)
+
+    with pytest.raises(ValueError, match="corrupt archive"):
+        asyncio.run(run_ingestion_pipeline(items(), slow_echo, stored.extend, concurrency=2))
+
+    # Invoices extracted before the error were still analyzed and stored
+    assert sorted(r["file"] for r, _ in stored) == ["a.pdf", "b.pdf"]
@@ -0,0 +1,90 @@
+from app.core.policy_rules import compile_policy_rules, extract_invoice_fields
+
+POLICY = """
+Travel & Expense Policy
+
+1. Meals: reimbursed up to Rs. 1,500 per day. Alcoholic beverages purchased with meals will not be reimbursed.
+2. Hotel accommodation is limited to Rs 4000 per night.
+3. Claims must be submitted within 30 days of the invoice date.
+4. Entertainment expenses are not reimbursable unless approved by the department head.
+5. All invoices must clearly show the date of purchase, the vendor name and the amount.
+"""
+
+MEAL_INVOICE = """Spice Garden Restaurant
+Date: 12 March
+2 x Lunch thali  900.00
+Total: Rs 900.00
+"""
+
+
+def test_exclusion_applies_to_the_subject_only():
+    rules = compile_policy_rules(POLICY)
+    assert set(rules.excluded) == {"alcohol"}
+    assert rules.caps["meals"].amount == 1500
+    assert rules.caps["meals"].unit == "day"
+
+
+def test_meal_invoice_is_not_declined_by_the_alcohol_exclusion():
+    rules = compile_policy_rules(POLICY)
+    status, reason = rules.evaluate(MEAL_INVOICE)
+    assert status == "Fully Reimbursed"
+    assert "1500.00 per day" in reason
+
+
+def test_alcohol_only_invoice_is_declined():
+    rules = compile_policy_rules(POLICY)
+    verdict = rules.evaluate("The Tap Room\n03/04/2024\nDraught beer x3\nTotal: 750")
+    assert verdict is not None and verdict[0] == "Declined"
+
+
+def test_conditional_exclusion_produces_no_rule():
+    rules = compile_policy_rules(POLICY)
+    assert "entertainment" not in rules.excluded
+    assert rules.evaluate("PVR Cinemas\n5 May 2024\nMovie tickets\nTotal: 600") is None
+
+
+def test_ambiguous_exclusion_subject_produces_no_rule():
+    rules = compile_policy_rules("Personal items bought during hotel stays are not reimbursable.")
+    assert rules.excluded == {}
+
+
+def test_exclusion_phrasings():
+    assert set(compile_policy_rules("No alcohol.").excluded) == {"alcohol"}
+    assert set(compile_policy_rules("No reimbursement will be made for alcohol.").excluded) == {"alcohol"}
+    assert set(compile_policy_rules("Expenses for alcohol are not reimbursed.").excluded) == {"alcohol"}
+    assert set(compile_policy_rules("The company does not cover movie tickets or concerts.").excluded) == {"entertainment"}
+    assert set(compile_policy_rules("Alcohol and entertainment are excluded.").excluded) == {"alcohol", "entertainment"}
+
+
+def test_cap_and_exclusion_in_one_line():
+    rules = compile_policy_rules("Meals up to Rs. 800 per day; no alcohol.")
+    assert rules.caps["meals"].amount == 800
+    assert set(rules.excluded) == {"alcohol"}
+
+
+def test_submission_deadline_is_not_a_date_requirement():
+    rules = compile_policy_rules("Claims must be submitted within 30 days of the invoice date.")
+    assert rules.date_required is None
+
+
+def test_date_requirement_phrasings():
+    for wording in (
+        "All invoices must clearly show the date of purchase.",
+        "Receipts should include the vendor, date and amount.",
+        "Bills must be dated.",
+        "A date is mandatory on every receipt.",
+        "Undated receipts will be rejected.",
+    ):
+        assert compile_policy_rules(wording).date_required, wording
+
+
+def test_missing_date_is_left_to_the_llm():
+    rules = compile_policy_rules(POLICY)
+    assert rules.date_required
+    assert rules.evaluate("Spice Garden Restaurant\nLunch\nTotal: Rs 400") is None
+
+
+def test_dates_without_a_year():
+    for text in ("12 March", "Date: 3rd Feb", "March 12", "Sept 5th, 2024", "12/03/2024", "2024-03-12"):
+        assert extract_invoice_fields(text).has_date, text
+    assert not extract_invoice_fields("Table 12\nCovers 4\nTotal 900").has_date
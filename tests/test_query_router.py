@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from app.core.query_router import (
+    STATUS_DECLINED, STATUS_FULL, STATUS_PARTIAL,
+    INTENT_AVERAGE, INTENT_COUNT, INTENT_SUM,
+    parse_aggregate_query, route_query,
+)
+
+NOW = datetime(2024, 3, 31, 15, 30)
+EMPLOYEES = ["employee_1_sales", "Asha Rao"]
+
+
+class FakeStats:
+    def __init__(self):
+        self.calls = []
+
+    def employees(self):
+        return EMPLOYEES
+
+    def aggregate(self, **kwargs):
+        self.calls.append(kwargs)
+        return {"documents": 3, "amount_total": 4500.0, "amount_count": 3,
+                "reimbursable_total": 3000.0, "reimbursable_count": 2}
+
+
+def test_count_of_declined_invoices_for_an_employee():
+    query = parse_aggregate_query("How many invoices were declined for Asha Rao?", EMPLOYEES, NOW)
+    assert query.intent == INTENT_COUNT
+    assert query.statuses == [STATUS_DECLINED]
+    assert query.employees == ["Asha Rao"]
+
+
+def test_reimbursed_means_fully_or_partially_for_counts():
+    query = parse_aggregate_query("How many invoices were reimbursed?", EMPLOYEES, NOW)
+    assert query.statuses == [STATUS_FULL, STATUS_PARTIAL]
+
+
+def test_total_reimbursed_sums_reimbursable_amounts():
+    query = parse_aggregate_query("What is the total reimbursed amount for employee_1_sales?", EMPLOYEES, NOW)
+    assert query.intent == INTENT_SUM
+    assert query.measure == "reimbursable"
+    assert query.employees == ["employee_1_sales"]
+
+
+def test_average_with_amount_bounds():
+    query = parse_aggregate_query("Average amount of invoices over Rs 1,000 and under 5000", EMPLOYEES, NOW)
+    assert query.intent == INTENT_AVERAGE
+    assert (query.min_amount, query.max_amount) == (1000.0, 5000.0)
+
+
+def test_last_n_months_uses_calendar_months():
+    query = parse_aggregate_query("How many invoices in the last 1 month?", EMPLOYEES, NOW)
+    # 31 March minus one month is 29 February in a leap year, not 1 March
+    assert query.since == datetime(2024, 2, 29)
+    query = parse_aggregate_query("How many invoices in the past 13 months?", EMPLOYEES, datetime(2024, 3, 15))
+    assert query.since == datetime(2023, 2, 15)
+    query = parse_aggregate_query("How many invoices in the last 2 weeks?", EMPLOYEES, NOW)
+    assert query.since == datetime(2024, 3, 17)
+
+
+def test_named_periods():
+    query = parse_aggregate_query("Total amount last month", EMPLOYEES, NOW)
+    assert (query.since, query.until) == (datetime(2024, 2, 1), datetime(2024, 3, 1))
+    query = parse_aggregate_query("How many invoices in December?", EMPLOYEES, NOW)
+    assert (query.since, query.until) == (datetime(2023, 12, 1), datetime(2024, 1, 1))
+    query = parse_aggregate_query("Total amount in 2023", EMPLOYEES, NOW)
+    assert (query.since, query.until) == (datetime(2023, 1, 1), datetime(2024, 1, 1))
+
+
+def test_questions_with_other_conditions_go_to_rag():
+    assert parse_aggregate_query("How many hotel invoices were declined?", EMPLOYEES, NOW) is None
+    assert parse_aggregate_query("Why was invoice 12 declined?", EMPLOYEES, NOW) is None
+
+
+def test_route_query_answers_from_statistics():
+    stats = FakeStats()
+    routed = route_query("How many invoices were declined?", None, stats)
+    assert routed["answer"].startswith("**3** invoices match")
+    assert stats.calls[0]["statuses"] == [STATUS_DECLINED]
+
+
+def test_route_query_applies_equality_filters():
+    stats = FakeStats()
+    route_query("How many invoices?", {"employee_name": "Asha Rao", "status": ""}, stats)
+    assert stats.calls[0]["employees"] == ["Asha Rao"]
+
+
+def test_route_query_falls_through():
+    stats = FakeStats()
+    assert route_query("How many invoices?", {"amount": {"$gte": 100}}, stats) is None
+    assert route_query("How many invoices were declined?", {"status": STATUS_FULL}, stats) is None
+    assert stats.calls == []
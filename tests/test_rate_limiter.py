@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from app.core.rate_limiter import RateLimiter, parse_reset_duration
+
+
+def test_takes_capacity_only_when_available():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+    assert limiter.try_acquire(5000) == 0
+    wait = limiter.try_acquire(5000)
+    assert wait == pytest.approx(40, abs=0.5)  # 4000 missing tokens at 100 tokens/s
+    assert limiter.stats()["tokens_available"] == pytest.approx(1000, abs=5)
+
+
+def test_cancelled_waiters_leave_the_bucket_untouched():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=6000)
+    limiter.try_acquire(6000)
+
+    async def time_out_waiters():
+        for _ in range(7):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(limiter.acquire_async(2000), 0.01)
+
+    asyncio.run(time_out_waiters())
+    assert limiter.stats()["tokens_available"] >= 0
+    # The next caller only waits for its own tokens, not for the abandoned ones
+    assert limiter.try_acquire(100) < 1.5
+
+
+def test_retry_reuses_the_reservation():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+    limiter.try_acquire(4000)
+    assert limiter.try_acquire(4000, reserved=True) == 0
+    stats = limiter.stats()
+    assert stats["tokens_available"] == pytest.approx(2000, abs=5)
+    assert stats["requests_available"] == pytest.approx(59, abs=0.1)
+
+
+def test_rate_limited_pause_applies_to_retries():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+    limiter.try_acquire(100)
+    delay = limiter.on_rate_limited(retry_after=5)
+    assert delay >= 5
+    assert limiter.try_acquire(100, reserved=True) == pytest.approx(delay, abs=0.5)
+    assert limiter.try_acquire(100) >= delay - 0.5
+
+
+def test_record_usage_corrects_the_estimate():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=6000)
+    limiter.try_acquire(1000)
+    limiter.record_usage(1000, 1500)
+    assert limiter.stats()["tokens_available"] == pytest.approx(4500, abs=5)
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("7.66s") == pytest.approx(7.66)
+    assert parse_reset_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_reset_duration("120ms") == pytest.approx(0.12)
+    assert parse_reset_duration("3") == 3.0
+    assert parse_reset_duration("") is None
+    assert parse_reset_duration("soon") is None
@@ -0,0 +1,52 @@
+import asyncio
+
+from app.core.scheduler import call_with_retries, run_scheduled
+
+
+def test_run_scheduled_caps_attempts_in_flight():
+    running = peak = 0
+
+    async def attempt():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"ok": True}
+
+    async def work(key, value, slot):
+        return await call_with_retries(attempt, lambda reason: {"error": reason}, slot=slot, label=key)
+
+    results = asyncio.run(run_scheduled([(str(i), i) for i in range(10)], work, concurrency=3))
+    assert len(results) == 10
+    assert peak == 3
+
+
+def test_retries_after_timeout_and_retryable_result():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        if len(calls) == 2:
+            return {"status": "error", "reason": "429"}
+        return {"status": "ok"}
+
+    result = asyncio.run(call_with_retries(
+        flaky, lambda reason: {"status": "failed", "reason": reason},
+        timeout=0.05, retries=2, backoff_seconds=0.001,
+        should_retry=lambda r: r["status"] == "error",
+    ))
+    assert result == {"status": "ok"}
+    assert len(calls) == 3
+
+
+def test_on_failure_after_all_attempts_time_out():
+    async def slow():
+        await asyncio.sleep(1)
+
+    result = asyncio.run(call_with_retries(
+        slow, lambda reason: {"status": "error", "reason": reason}, timeout=0.01, retries=1, backoff_seconds=0.001,
+    ))
+    assert result == {"status": "error", "reason": "timed out after 0.01s"}
@@ -0,0 +1,93 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.core import vector_store
+from app.core.vector_store import build_where_clause
+
+
+def test_empty_filters():
+    assert build_where_clause(None) is None
+    assert build_where_clause({"status": None, "employee_name": ""}) is None
+
+
+def test_equality_and_lists():
+    assert build_where_clause({"status": "Declined"}) == {"status": "Declined"}
+    assert build_where_clause({"status": ["Declined", "Partially Reimbursed"]}) == {
+        "status": {"$in": ["Declined", "Partially Reimbursed"]}
+    }
+    assert build_where_clause({"status": []}) is None
+
+
+def test_zero_and_false_are_conditions():
+    assert build_where_clause({"amount": 0}) == {"amount": 0.0}
+    assert build_where_clause({"flagged": False}) == {"flagged": False}
+
+
+def test_several_fields_are_combined_with_and():
+    assert build_where_clause({"status": "Declined", "employee_name": "employee_1_sales"}) == {
+        "$and": [{"status": "Declined"}, {"employee_name": "employee_1_sales"}]
+    }
+
+
+def test_amount_ranges_are_numeric():
+    assert build_where_clause({"amount": {"$gte": "1,000", "$lt": 5000}}) == {
+        "$and": [{"amount": {"$gte": 1000.0}}, {"amount": {"$lt": 5000.0}}]
+    }
+
+
+def test_timestamp_ranges_run_on_the_epoch_field():
+    clause = build_where_clause({"timestamp": {"$gte": "2024-03-01"}})
+    assert clause == {"timestamp_epoch": {"$gte": datetime(2024, 3, 1).timestamp()}}
+    # Equality stays on the stored ISO string
+    assert build_where_clause({"timestamp": "2024-03-01T10:00:00"}) == {"timestamp": "2024-03-01T10:00:00"}
+
+
+def test_nested_and_or():
+    clause = build_where_clause({"$or": [{"status": "Declined"}, {"amount": {"$gt": 100}}, {"status": None}]})
+    assert clause == {"$or": [{"status": "Declined"}, {"amount": {"$gt": 100.0}}]}
+    assert build_where_clause({"$and": [{"status": "Declined"}, {}]}) == {"status": "Declined"}
+
+
+@pytest.mark.parametrize("filters", [
+    {"amount": {"$between": [1, 2]}},
+    {"$not": {"status": "Declined"}},
+    {"amount": {"$gte": "a lot"}},
+    {"status": {"$in": "Declined"}},
+    {"$or": {"status": "Declined"}},
+])
+def test_invalid_filters_raise(filters):
+    with pytest.raises(ValueError):
+        build_where_clause(filters)
+
+
+def test_store_is_ready_only_after_the_warm_up_finishes(monkeypatch):
+    indexing = threading.Event()
+    release = threading.Event()
+
+    class FakeModel:
+        def encode(self, texts):
+            return [[0.0] for _ in texts]
+
+    class FakeStore:
+        embedding_cache = None
+
+        def __init__(self):
+            self.model = FakeModel()
+
+        def build_lexical_index(self):
+            indexing.set()
+            release.wait(5)
+
+    monkeypatch.setattr(vector_store, "VectorStore", FakeStore)
+    vector_store.close_vector_store()
+    thread = vector_store.start_vector_store_warmup()
+    assert indexing.wait(5)
+    # The store exists, but the lexical index is still being built
+    assert vector_store.vector_store_status()["ready"] is False
+    release.set()
+    thread.join(5)
+    assert vector_store.vector_store_status() == {"ready": True, "warming_up": False, "error": None}
+    vector_store.close_vector_store()
+    assert vector_store.vector_store_status()["ready"] is False